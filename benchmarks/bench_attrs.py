@@ -0,0 +1,50 @@
+"""Attributes rendering microbenchmarks.
+
+    PYTHONPATH=. python benchmarks/bench_attrs.py
+"""
+import timeit
+
+from upytl import UPYTL
+from upytl.helpers import ValueGetter, ValueGettersDict
+import upytl.bulma as bm
+
+
+def format_map_render(vgd: ValueGettersDict, ctx: dict):
+    """`ValueGettersDict.render` formatting every key on every render (as before precompiling)."""
+    return {
+        k.format_map(ctx): v.get(ctx) if isinstance(v, ValueGetter) else v
+        for k, v in vgd.items()
+    }
+
+
+def bench(name: str, fun, number: int):
+    t = min(timeit.repeat(fun, number=number, repeat=5))
+    print(f'{name:<45} {t / number * 1e6:8.2f} us')
+
+
+def main():
+    # Class of bulma `Icon` span
+    icon_class = ValueGettersDict([
+        ('icon', ValueGetter(True)), ('is-{size}', ValueGetter('size', force_compile=True))
+    ])
+    ctx = {'size': 'small'}
+    assert icon_class.render(ctx) == format_map_render(icon_class, ctx)
+    bench('Icon Class: format_map keys', lambda: format_map_render(icon_class, ctx), 100_000)
+    bench('Icon Class: precompiled keys', lambda: icon_class.render(ctx), 100_000)
+
+    static_class = ValueGettersDict([
+        ('button', ValueGetter(True)),
+        ('is-large', ValueGetter('is_large', force_compile=True)),
+        ('is-primary', ValueGetter(True)),
+    ])
+    ctx = {'is_large': True}
+    bench('static keys: format_map keys', lambda: format_map_render(static_class, ctx), 100_000)
+    bench('static keys: precompiled keys', lambda: static_class.render(ctx), 100_000)
+
+    u = UPYTL()
+    t = {bm.Icon(For='i in range(100)', icon='home', size='small', text='{i}'): None}
+    bench('render 100 bulma Icons', lambda: u.render(t, {}), 200)
+
+
+if __name__ == '__main__':
+    main()
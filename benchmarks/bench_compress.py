@@ -0,0 +1,58 @@
+"""Incremental compression (`UPYTL.render_compressed`) vs render-then-compress.
+
+Throughput and peak memory (`tracemalloc`) of a large page.
+
+    PYTHONPATH=. python benchmarks/bench_compress.py [rows]
+"""
+import gzip
+import sys
+import time
+import tracemalloc
+
+from upytl import UPYTL, html as h
+
+TEMPLATE = {
+    h.Table(Class='table'): {
+        h.TR(For='row in rows', Class={'is-odd': 'row["i"] % 2'}): {
+            h.TD(Class='name'): '[[ row["name"] ]]',
+            h.TD(Class='num'): '[[ row["i"] ]]',
+            h.TD(): {h.A(href='/rows/{row[i]}'): 'Show'},
+        }
+    }
+}
+
+
+def render_then_compress(u: UPYTL, ctx: dict) -> bytes:
+    return gzip.compress(u.render(TEMPLATE, ctx).encode(), 6)
+
+
+def render_compressed(u: UPYTL, ctx: dict) -> bytes:
+    return u.render_compressed(TEMPLATE, ctx, level=6)
+
+
+def measure(name: str, fun, u: UPYTL, ctx: dict):
+    t = min(timeit(fun, u, ctx) for _ in range(7))
+    tracemalloc.start()
+    data = fun(u, ctx)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{name:<22} {t * 1e3:8.1f} ms, peak {peak / 1024:8.0f} KiB, {len(data) / 1024:6.0f} KiB compressed')
+
+
+def timeit(fun, u: UPYTL, ctx: dict) -> float:
+    t = time.perf_counter()
+    fun(u, ctx)
+    return time.perf_counter() - t
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    ctx = {'rows': [{'name': f'row-{i}', 'i': i} for i in range(rows)]}
+    u = UPYTL()
+    assert gzip.decompress(render_compressed(u, ctx)) == u.render(TEMPLATE, ctx).encode()
+    measure('render then compress', render_then_compress, u, ctx)
+    measure('render_compressed', render_compressed, u, ctx)
+
+
+if __name__ == '__main__':
+    main()
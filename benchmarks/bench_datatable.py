@@ -0,0 +1,63 @@
+"""`html.DataTable` vs the generic `For`-based table on columnar data.
+
+    PYTHONPATH=. python benchmarks/bench_datatable.py [rows] [columns]
+"""
+import array
+import sys
+import time
+
+from upytl import UPYTL, html as h
+
+
+def make_data(rows: int, columns: int) -> dict:
+    data = {}
+    for j in range(columns):
+        if j % 3 == 0:
+            data[f'c{j}'] = [f'name <{i}>' for i in range(rows)]
+        elif j % 3 == 1:
+            data[f'c{j}'] = array.array('d', [i * 1.5 for i in range(rows)])
+        else:
+            data[f'c{j}'] = list(range(rows))
+    return data
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    data = make_data(rows, columns)
+    specs = [
+        {'name': name, 'format': '{:.2f}', 'Class': 'num'} if isinstance(col, array.array) else {'name': name}
+        for name, col in data.items()
+    ]
+    u = UPYTL()
+
+    data_table = {h.DataTable(data={'data'}, columns={'columns'}): None}
+    ctx = {'data': data, 'columns': specs}
+
+    # the generic table iterates rows, so transpose the columns
+    generic = {
+        h.Table(): {
+            h.THead(): {
+                h.TR(): {h.TH(For='col in columns'): '[[ col["name"] ]]'},
+            },
+            h.TBody(): {
+                h.TR(For='row in rows'): {
+                    h.Template(For='col, v in zip(columns, row)'): {
+                        h.TD(If='"format" in col', Class='num'): {h.Text(): '[[ col["format"].format(v) ]]'},
+                        h.TD(Else=''): {h.Text(): '[[ v ]]'},
+                    }
+                }
+            }
+        }
+    }
+    generic_ctx = {'columns': specs, 'rows': [*map(list, zip(*data.values()))]}
+
+    for name, template, ctx_ in [('For-based table', generic, generic_ctx), ('DataTable', data_table, ctx)]:
+        start = time.perf_counter()
+        html = u.render(template, ctx_, indent=0)
+        t = time.perf_counter() - start
+        print(f'{name:<16} {rows} x {columns}: {t * 1e3:8.1f} ms, {len(html) / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
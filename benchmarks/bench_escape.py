@@ -0,0 +1,51 @@
+"""Built-in escaping (`html.Text`, `upytl.escape`) vs per-call `html.escape` of the whole text body.
+
+    PYTHONPATH=. python benchmarks/bench_escape.py
+"""
+import html
+import timeit
+
+from upytl import UPYTL, MetaTag, html as h
+from upytl.escape import escape_value
+
+
+class PerCallText(MetaTag):
+    """`html.Text` escaping the whole rendered body per call."""
+
+    def format_text_body(self, body: str) -> str:
+        return html.escape(body, quote=True)
+
+
+def make_template(text_tag) -> dict:
+    return {
+        h.UL(): {
+            h.LI(For='row in rows', title='{row[title]}'): {
+                text_tag(): 'Name: [[ row["name"] ]], comment: [[ row["comment"] ]]',
+                h.B(): {text_tag(): 'static & <safe>'},
+            }
+        }
+    }
+
+
+def main():
+    values = ['john', 'some longer text without anything to escape', 'a & b <i>', 'x' * 200]
+    number = 100_000
+    for v in values:
+        t1 = min(timeit.repeat(lambda: html.escape(v), number=number, repeat=5))
+        t2 = min(timeit.repeat(lambda: escape_value(v), number=number, repeat=5))
+        print(f'{v[:20]!r:<24} html.escape {t1 / number * 1e9:6.0f} ns, escape_value {t2 / number * 1e9:6.0f} ns')
+
+    u = UPYTL()
+    ctx = {'rows': [
+        {'name': f'user-{i}', 'comment': values[i % len(values)], 'title': f'Row "{i}"'} for i in range(1000)
+    ]}
+    number = 20
+    for name, text_tag in [('per-call html.escape', PerCallText), ('built-in escaping', h.Text)]:
+        t = make_template(text_tag)
+        u.render(t, ctx)
+        elapsed = min(timeit.repeat(lambda: u.render(t, ctx), number=number, repeat=5))
+        print(f'{name:<22} {elapsed / number * 1e3:.2f} ms/render')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Render events allocations and throughput on the `example.py`-like page.
+
+    PYTHONPATH=. python benchmarks/bench_events.py
+"""
+import timeit
+import tracemalloc
+
+from upytl import UPYTL, Component, Slot, html as h
+from upytl.core import HTMLPrinter
+
+
+class Field(Component):
+    props = dict(name='', value='')
+    template = {
+        h.Label(Class='label'): {
+            h.Text(): '[[ name ]]',
+            h.Input(Class='input', value='{value}'): '',
+        }
+    }
+
+
+class Page(Component):
+    props = dict(title='')
+    template = {
+        h.Html(): {
+            h.Head(): {
+                h.Title(): '[[ title ]]',
+                h.Meta(charset=b'utf-8'): '',
+            },
+            h.Body(): {
+                Slot(): '',
+            }
+        }
+    }
+
+
+TEMPLATE = {
+    Page(title={'title'}): {
+        h.Div(For='row in rows', Class='row'): {
+            h.Span(Class='cell', Style={'width': '10em'}): '[[ row["name"] ]]',
+            h.Span(Class={'cell': True, 'is-odd': 'row["i"] % 2'}): '[[ row["i"] ]]',
+            Field(name={'row["name"]'}, value={'row["i"]'}): None,
+        }
+    }
+}
+
+CTX = {
+    'title': 'Events',
+    'rows': [{'name': f'row-{i}', 'i': i} for i in range(200)],
+}
+
+
+class RetainingPrinter(HTMLPrinter):
+    """Keep all events, so every allocated event object stays alive and can be counted."""
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.events = []
+
+    def print(self, it):
+        self.events.append(it)
+        super().print(it)
+
+
+def main():
+    u = UPYTL()
+    u.render(TEMPLATE, CTX)  # warm up
+
+    out = RetainingPrinter(2)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    u._render(TEMPLATE, CTX, out)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    tag_events = [it for it in out.events if not isinstance(it, str)]
+    nodes = len(tag_events)
+    allocated = len({id(it) for it in tag_events})
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    print(f'tag events: {nodes}, allocated event objects: {allocated} ({allocated / nodes:.2f} per node)')
+    print(f'retained memory blocks per node: {blocks / nodes:.2f}')
+
+    number = 20
+    t = min(timeit.repeat(lambda: u.render(TEMPLATE, CTX), number=number, repeat=5))
+    print(f'render: {t / number * 1e3:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Expression evaluation throughput: trivial expressions fast getters vs `eval`.
+
+    PYTHONPATH=. python benchmarks/bench_expr.py
+"""
+import timeit
+
+from upytl.helpers import compile_expr
+
+EXPRESSIONS = [
+    'text',
+    'not allow_submit',
+    'it["name"]',
+    'it.get("icon")',
+    'opt["value"] == value',
+    '"nodes" in it',
+    'depth + 1',  # not trivial, evaluated by `eval`
+]
+
+CTX = {
+    'text': 'Hello', 'allow_submit': False, 'value': 'v', 'depth': 1,
+    'it': {'name': 'Users', 'icon': 'users'}, 'opt': {'value': 'v'},
+}
+
+
+def main():
+    number = 200_000
+    for src in EXPRESSIONS:
+        code_obj = compile(src, '<string>', 'eval')
+        get = compile_expr(src)
+        assert get(CTX) == eval(code_obj, None, CTX)
+        t_eval = min(timeit.repeat(lambda: eval(code_obj, None, CTX), number=number, repeat=5))
+        t_get = min(timeit.repeat(lambda: get(CTX), number=number, repeat=5))
+        print(
+            f'{src:<25} eval: {t_eval / number * 1e9:6.0f} ns'
+            f'  compiled: {t_get / number * 1e9:6.0f} ns  x{t_eval / t_get:.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Post-processing by `UPYTL.render` filters vs re-parsing the rendered html with `html.parser`.
+
+The post-processing adds CSP nonces to scripts, rewrites asset URLs and collects the links.
+
+    PYTHONPATH=. python benchmarks/bench_filters.py
+"""
+import html
+import timeit
+from html.parser import HTMLParser
+
+from upytl import UPYTL, html as h
+from upytl.events import StartTag
+from upytl.helpers import attrs_to_str
+
+TEMPLATE = {
+    h.Html(): {
+        h.Head(): {
+            h.Script(For='i in range(5)', src='/js/app-{i}.js'): '',
+            h.Link(rel='stylesheet', href='/css/app.css'): '',
+        },
+        h.Body(): {
+            h.Div(For='row in rows', Class='row'): {
+                h.A(href='/rows/{row[i]}'): '[[ row["name"] ]]',
+                h.Img(src='/img/{row[i]}.png', alt='{row[name]}'): '',
+                h.Span(Class='cell'): '[[ row["i"] ]]',
+            }
+        }
+    }
+}
+
+CTX = {'rows': [{'name': f'row-{i}', 'i': i} for i in range(500)]}
+
+
+def make_filter(links: list):
+    def post_process(events):
+        for ev in events:
+            if ev.__class__ is StartTag:
+                attrs = ev.attrs
+                if 'href' in attrs:
+                    links.append(attrs['href'])
+                if 'src' in attrs:
+                    attrs['src'] = f'https://cdn.example.com{attrs["src"]}'
+                if ev.name == 'script':
+                    attrs['nonce'] = 'abc'
+            yield ev
+    return post_process
+
+
+class PostProcessor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.out = []
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if 'href' in attrs:
+            self.links.append(attrs['href'])
+        if 'src' in attrs:
+            attrs['src'] = f'https://cdn.example.com{attrs["src"]}'
+        if tag == 'script':
+            attrs['nonce'] = 'abc'
+        self.out.append(f'<{tag}{attrs_to_str({k: True if v is None else v for k, v in attrs.items()})}>')
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.out[-1] = self.out[-1][:-1] + ' />'
+
+    def handle_endtag(self, tag):
+        self.out.append(f'</{tag}>')
+
+    def handle_data(self, data):
+        self.out.append(data)
+
+    def handle_entityref(self, name):
+        self.out.append(f'&{name};')
+
+    def handle_decl(self, decl):
+        self.out.append(f'<!{decl}>')
+
+
+def render_then_parse(u: UPYTL) -> str:
+    parser = PostProcessor()
+    parser.feed(u.render(TEMPLATE, CTX, indent=0))
+    parser.close()
+    return ''.join(parser.out)
+
+
+def render_filtered(u: UPYTL) -> str:
+    return u.render(TEMPLATE, CTX, indent=0, filters=[make_filter([])])
+
+
+def main():
+    u = UPYTL()
+    assert html.unescape(render_then_parse(u)) == html.unescape(render_filtered(u))
+    number = 20
+    for name, fun in [
+        ('render', lambda: u.render(TEMPLATE, CTX, indent=0)),
+        ('render + html.parser', lambda: render_then_parse(u)),
+        ('render with filters', lambda: render_filtered(u)),
+    ]:
+        t = min(timeit.repeat(fun, number=number, repeat=5))
+        print(f'{name:<22} {t / number * 1e3:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
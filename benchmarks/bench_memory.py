@@ -0,0 +1,55 @@
+"""Memory taken by template nodes, measured by `tracemalloc`.
+
+    PYTHONPATH=. python benchmarks/bench_memory.py
+"""
+import gc
+import tracemalloc
+
+import upytl  # noqa F401
+
+
+def make_library(n: int) -> list:
+    """Return `n` small templates typical for component libraries."""
+    from upytl import Component, Slot, html as h
+
+    templates = []
+    for i in range(n):
+        class Card(Component):
+            props = dict(title='', items=[], size='normal')
+            template = {
+                h.Div(Class=[b'card', ('is-{size}', 'size')], id=f'card-{i}'): {
+                    h.Header(Class='card-header'): {
+                        h.P(Class='card-header-title'): '[[ title ]]',
+                    },
+                    h.UL(If='items'): {
+                        h.LI(For='it in items', Class={'is-active': 'it.get("active")'}): '[[ it["name"] ]]',
+                    },
+                    h.Div(Else=''): 'No items',
+                    Slot(): '',
+                }
+            }
+        templates.append(Card)
+    return templates
+
+
+def measure(name: str, fun):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    ret = fun()
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    print(f'{name:<40} {size / 1024:10.1f} KiB')
+    return ret
+
+
+def main():
+    measure('import upytl.bulma', lambda: __import__('upytl.bulma'))
+    library = measure('1000 components (8 nodes each)', lambda: make_library(1000))
+    assert len(library) == 1000
+
+
+if __name__ == '__main__':
+    main()
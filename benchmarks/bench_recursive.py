@@ -0,0 +1,76 @@
+"""Recursive component over a category tree: plain vs `Component.recursive` (memoized, iterative walk).
+
+The tree has about 20k nodes, the leaf subtrees are shared objects (e.g. the same brands under every category).
+
+    PYTHONPATH=. python benchmarks/bench_recursive.py
+"""
+import timeit
+
+from upytl import UPYTL, Component, html as h
+from upytl.core import RenderError
+
+
+def make_tree(recursive: bool, memo_shared: bool = False):
+    class Tree(Component):
+        props = dict(node={}, depth=0)
+
+        @staticmethod
+        def template_factory(cls):
+            return {
+                h.LI(For='it in node["children"]', Class='level-{depth}'): {
+                    h.A(href='/c/{it[id]}'): '[[ it["name"] ]]',
+                    h.UL(If='it["children"]'): {
+                        cls(node={'it'}, depth={'depth + 1'}): None,
+                    }
+                }
+            }
+
+        def memo_key(self, props: dict):
+            return (props['node']['id'], props['node']['version'], props['depth']) if memo_shared else None
+
+    Tree.recursive = recursive
+    Tree.memo_shared = memo_shared
+    return Tree
+
+
+def node(id, children=()):
+    return {'id': id, 'name': f'Category {id}', 'version': 1, 'children': list(children)}
+
+
+def main():
+    brands = node('brands', [node(f'b{i}', [node(f'b{i}-{j}') for j in range(9)]) for i in range(10)])  # 100 nodes
+    root = node('root', [
+        node(f'c{i}', [node(f'c{i}-{j}', [brands]) for j in range(10)]) for i in range(20)
+    ])
+    ctx = {'root': root}
+    number = 5
+
+    results = []
+    for title, tree in [
+        ('plain', make_tree(False)),
+        ('recursive', make_tree(True)),
+        ('recursive, memo_shared', make_tree(True, True)),
+    ]:
+        u = UPYTL()
+        t = {h.UL(): {tree(node={'root'}): None}}
+        results.append(u.render(t, ctx))
+        t = min(timeit.repeat(lambda: u.render(t, ctx), number=number, repeat=5))
+        print(f'{title + ":":24} {t / number * 1e3:.2f} ms')
+    assert results[0] == results[1] == results[2]
+    print(f'nodes: {results[0].count("<li")}')
+
+    deep = chain = node('deep')
+    for i in range(5000):
+        chain['children'].append(node(i))
+        chain = chain['children'][0]
+    for title, tree in [('plain', make_tree(False)), ('recursive', make_tree(True))]:
+        try:
+            UPYTL().render({h.UL(): {tree(node={'deep'}): None}}, {'deep': deep}, indent=0)
+        except RenderError as exc:
+            print(f'depth 5000, {title}: {type(exc.orig_exc).__name__}')
+        else:
+            print(f'depth 5000, {title}: ok')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Startup time with eagerly imported vs lazily registered components (`UPYTL.register`).
+
+A package of generated component modules is registered in a fresh interpreter,
+then one component is rendered by name.
+
+    PYTHONPATH=. python benchmarks/bench_registry.py [modules] [components per module]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+MODULE = """\
+from upytl import Component, html as h
+{classes}
+"""
+
+COMPONENT = """
+class Card{i}(Component):
+    props = dict(title='', items=[])
+    template = {{
+        h.Div(Class='card card-{i}'): {{
+            h.Header(Class='card-header'): '[[ title ]]',
+            h.UL(If='items'): {{
+                h.LI(For='it in items', Class={{'is-active': 'it.get("active")'}}): '[[ it["name"] ]]',
+            }},
+            h.Div(Else=''): 'No items',
+        }}
+    }}
+"""
+
+SCRIPT = """\
+import time
+t0 = time.perf_counter()
+import importlib
+from upytl import UPYTL
+from upytl.core import GenericComponent
+u = UPYTL()
+t1 = time.perf_counter()
+{register}
+t2 = time.perf_counter()
+u.render({{GenericComponent(Is='Card0', title='x'): None}}, {{}})
+t3 = time.perf_counter()
+print(
+    f'{{(t2 - t1) * 1e3:8.1f}} ms register, {{(t3 - t2) * 1e3:6.1f}} ms first render,'
+    f' {{(t3 - t0) * 1e3:8.1f}} ms total'
+)
+"""
+
+EAGER = """\
+for name in sorted(os.listdir(os.path.dirname(importlib.import_module('components').__file__))):
+    if name.endswith('.py') and name != '__init__.py':
+        module = importlib.import_module(f'components.{name[:-3]}')
+        for attr, value in vars(module).items():
+            if attr.startswith('Card'):
+                u.registered_components[attr] = value
+"""
+
+
+def main():
+    modules = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    per_module = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        pkg = os.path.join(tmp, 'components')
+        os.mkdir(pkg)
+        open(os.path.join(pkg, '__init__.py'), 'w').close()
+        for m in range(modules):
+            classes = ''.join(COMPONENT.format(i=m * per_module + i) for i in range(per_module))
+            with open(os.path.join(pkg, f'mod{m}.py'), 'w') as f:
+                f.write(MODULE.format(classes=classes))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([tmp, os.getcwd()]), PYTHONDONTWRITEBYTECODE='')
+        print(f'{modules} modules, {modules * per_module} components')
+        for name, register in [
+            ('eager import', 'import os\n' + EAGER),
+            ('register_package', "u.register_package('components')"),
+            ('register by path', f"for i in range({modules * per_module}):\n"
+                                 f"    u.register(f'Card{{i}}', f'components.mod{{i // {per_module}}}:Card{{i}}')"),
+        ]:
+            script = SCRIPT.format(register=register)
+            # the first run compiles the bytecode cache
+            subprocess.run([sys.executable, '-c', script], env=env, check=True, capture_output=True)
+            out = subprocess.run([sys.executable, '-c', script], env=env, check=True, capture_output=True, text=True)
+            print(f'{name:<18} {out.stdout.strip()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Incremental re-render (`UPYTL.rerender`) vs full render on the `example.py`-like page.
+
+    PYTHONPATH=. python benchmarks/bench_rerender.py
+"""
+import timeit
+
+from upytl import UPYTL, Component, Slot, SlotTemplate, html as h
+
+
+class Page(Component):
+    props = dict(title='')
+    template = {
+        h.Html(): {
+            h.Head(): {
+                h.Title(): '[[ title ]]',
+                h.Meta(charset=b'utf-8'): '',
+            },
+            h.Body(): {
+                Slot(SlotName=b'nav'): {h.Div(): '[there is no default nav]'},
+                Slot(SlotName=b'content'): '',
+            }
+        }
+    }
+
+
+class Field(Component):
+    props = dict(name='', value='')
+    template = {
+        h.Label(Class='label'): {
+            h.Text(): '[[ name ]]',
+            h.Input(Class='input', value='{value}'): '',
+        }
+    }
+
+
+TEMPLATE = {
+    Page(title={'title'}): {
+        SlotTemplate(Slot='nav'): {
+            h.Div(Class='counter'): 'Unread: [[ counter ]]',
+            h.Div(Class='user'): 'Hey [[ user_name.title() ]]!',
+        },
+        SlotTemplate(Slot='content'): {
+            h.Form(): {
+                h.Div(For='fld in fields'): {
+                    Field(name={'fld["name"]'}, value={'fld["value"]'}): None,
+                }
+            },
+            h.Div(Class='rows'): {
+                h.Div(For='row in rows', Class='row'): {
+                    h.Span(Class='cell'): '[[ row["name"] ]]',
+                    h.Span(Class={'cell': True, 'is-odd': 'row["i"] % 2'}): '[[ row["i"] ]]',
+                }
+            }
+        }
+    }
+}
+
+CTX = {
+    'title': 'Rerender',
+    'counter': 0,
+    'user_name': 'john',
+    'fields': [{'name': f'field-{i}', 'value': i} for i in range(10)],
+    'rows': [{'name': f'row-{i}', 'i': i} for i in range(100)],
+}
+
+
+def main():
+    u = UPYTL()
+    number = 50
+
+    t = min(timeit.repeat(lambda: u.render(TEMPLATE, CTX), number=number, repeat=5))
+    print(f'full render:     {t / number * 1e3:.3f} ms')
+
+    t = min(timeit.repeat(lambda: u.render_tracked(TEMPLATE, CTX), number=number, repeat=5))
+    print(f'tracked render:  {t / number * 1e3:.3f} ms')
+
+    result = u.render_tracked(TEMPLATE, CTX)
+    u.rerender(result, {'counter': 1})  # analyze the template dependencies
+    for changed in [{'counter': 1}, {'user_name': 'tom'}, {'fields': CTX['fields'][:5]}]:
+        t = min(timeit.repeat(lambda: u.rerender(result, changed).html, number=number, repeat=5))
+        fragments = u.rerender(result, changed).fragments
+        size = sum(len(html) for _, html in fragments)
+        print(f'rerender {", ".join(changed)}: {t / number * 1e3:.3f} ms, {len(fragments)} fragment(s), {size} chars')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""Throughput of one shared `UPYTL` instance rendering from a thread pool.
+
+    PYTHONPATH=. python benchmarks/bench_threads.py [renders]
+
+With the GIL the throughput stays flat as threads are added (the point is that
+the shared instance renders correctly and doesn't degrade), free-threaded builds scale.
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from upytl import UPYTL
+
+from bench_rerender import CTX, TEMPLATE
+
+
+def main():
+    renders = int(sys.argv[1]) if len(sys.argv) > 1 else 800
+    u = UPYTL()
+    expected = u.render(TEMPLATE, CTX)
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f'GIL enabled: {gil}')
+    for threads in [1, 2, 4, 8, 16]:
+        with ThreadPoolExecutor(threads) as pool:
+            start = time.perf_counter()
+            results = list(pool.map(lambda _: u.render(TEMPLATE, CTX), range(renders)))
+            t = time.perf_counter() - start
+        assert all(html == expected for html in results)
+        print(f'{threads:>2} threads: {renders / t:8.0f} renders/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Private memory of pre-forked workers with and without `UPYTL.warmup`, measured via `/proc/self/smaps`.
+
+    PYTHONPATH=. python benchmarks/bench_warmup.py [workers]
+
+Linux only. Each mode runs in a fresh master process which builds the components library,
+optionally warms it up, forks the workers and lets each one render all components.
+"""
+import os
+import subprocess
+import sys
+
+from bench_memory import make_library
+
+
+def private_dirty_kib() -> int:
+    """Return `Private_Dirty` memory of the process, i.e. the memory not shared with the master."""
+    total = 0
+    with open('/proc/self/smaps') as f:
+        for line in f:
+            if line.startswith('Private_Dirty:'):
+                total += int(line.split()[1])
+    return total
+
+
+def worker(u, library: list, ctx: dict) -> int:
+    before = private_dirty_kib()
+    for component in library:
+        u.render({component(title={'title'}, items={'items'}): {}}, ctx)
+    import gc
+    gc.collect()
+    return private_dirty_kib() - before
+
+
+def master(mode: str, workers: int):
+    from upytl import UPYTL
+
+    library = make_library(1000)
+    u = UPYTL()
+    if mode != 'cold':
+        u.warmup(components=library, freeze=mode == 'warmup+freeze')
+    ctx = {'title': 'Card', 'items': [{'name': 'a', 'active': True}, {'name': 'b'}]}
+    pipes = []
+    for _ in range(workers):
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            os.write(w, str(worker(u, library, ctx)).encode())
+            os._exit(0)
+        os.close(w)
+        pipes.append((pid, r))
+    sizes = []
+    for pid, r in pipes:
+        sizes.append(int(os.read(r, 64)))
+        os.close(r)
+        os.waitpid(pid, 0)
+    print(f'{mode:<15} private memory per worker: {sum(sizes) / len(sizes):8.0f} KiB')
+
+
+def main():
+    if len(sys.argv) > 2:
+        master(sys.argv[1], int(sys.argv[2]))
+        return
+    workers = sys.argv[1] if len(sys.argv) > 1 else '4'
+    for mode in ['cold', 'warmup', 'warmup+freeze']:
+        subprocess.run([sys.executable, __file__, mode, workers], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,807 @@
+import array
+import asyncio
+import datetime
+import gc
+import gzip
+import hashlib
+import re
+import sys
+import threading
+import zlib
+from concurrent.futures import Future
+from itertools import zip_longest
+
+import pytest
+
+from upytl import UPYTL, Component, Deferred, Markup, Slot, SlotTemplate, ViewCache, XTemplate, html as h
+from upytl import xtemplate
+from upytl.caching import NotModified
+from upytl.core import GenericComponent, HTMLPrinter, RenderLimitError, TextBody
+from upytl.deferred import SWAP_SCRIPT
+from upytl.escape import escape
+from upytl.events import StartTag
+import upytl.bulma as bm
+
+upytl = UPYTL()
+
+
+def test_extendable_attrs():
+    t = {
+        h.Div(
+            Class={'a': True, 'b-{x}': 'flag', 'c': 'not flag'}, xClass={'d': True},
+            Style={'color': '{x}', 'width': ''}, Data={'k': '{x}', 'n': None},
+            id='i', hidden={'flag'}
+        ): '',
+        bm.NavbarItem(Tag='div', Class='has-dropdown'): '',
+        bm.Container(Style={'margin': '0'}): '',
+    }
+    rendered = upytl.render(t, {'x': 'X', 'flag': True}, indent=0, doctype=None)
+    assert rendered == (
+        '<div id="i" hidden class="a b-X d" style="color:X" data-k="X"></div>'
+        '<div class="navbar-item has-dropdown"></div>'
+        '<div style="margin:0" class="container"></div>'
+    )
+
+    # the keys rendered at merge aren't kept in the template
+    row = h.Div(For='i in range(3)', Class={'row': True}, xClass={'row-{i}': True})
+    assert upytl.render({row: ''}, {}, indent=0, doctype=None) == (
+        '<div class="row row-0"></div><div class="row row-1"></div><div class="row row-2"></div>'
+    )
+    assert [*row.attrs['Class']._keys] == ['row']
+
+
+def test_passed_attrs_extend_plan():
+    class Box(Component):
+        props = dict(size='normal')
+        template = {
+            h.Div(Class='box', xClass={'is-{size}': True}): ''
+        }
+
+    t = {
+        Box(): '',
+        Box(Class='panel', xClass={'is-active': 'active'}): '',
+    }
+    rendered = upytl.render(t, {'active': True}, indent=0, doctype=None)
+    assert rendered == '<div class="box is-normal"></div><div class="panel is-normal is-active"></div>'
+
+
+def test_trivial_expressions():
+    t = {
+        h.Template(For='it in items'): {
+            h.Div(If='it.get("show")', Class={'active': 'it["name"] == current'}): '[[ it["name"] ]]',
+            h.Div(Elif='not len(it)'): 'empty',
+        },
+        h.Span(For='(k, v) in pairs', title={'k'}): '[[ v ]]',
+    }
+    ctx = {
+        'items': [{'name': 'a', 'show': True}, {'name': 'b', 'show': True}, {}],
+        'current': 'b',
+        'pairs': [(1, 'one')],
+    }
+    rendered = upytl.render(t, ctx, indent=0, doctype=None)
+    assert rendered == (
+        '<div class="">a</div><div class="active">b</div><div>empty</div>'
+        '<span title="1">one</span>'
+    )
+
+    # `len` isn't in the context, so the expression is evaluated by `eval`, the call is made once
+    calls = []
+    upytl.render({h.Div(title={'calls.append(1) == len'}): ''}, {'calls': calls})
+    assert calls == [1]
+
+
+def test_code_cache_shares_compiled_expressions():
+    from upytl.helpers import code_cache
+
+    hits = code_cache.stats()['hits']
+    a = h.Div(If='cached_cond and 1', For='it in cached_items')
+    b = h.Span(If='cached_cond and 1', For='it in cached_items')
+    assert a.if_cond[1].get is b.if_cond[1].get
+    assert a.for_loop is b.for_loop
+    assert code_cache.stats()['hits'] == hits + 2
+
+    # the code of text bodies is shared and bounded as well
+    code = UPYTL.compile_template('cached [[ x ]]')
+    assert UPYTL.compile_template(TextBody('cached [[ x ]]')) is code
+    assert UPYTL.compile_template('cached [[ x ]]', escape=True) is not code
+    assert code_cache.stats()['hits'] == hits + 3
+    size = code_cache.stats()['size']
+    maxsize, code_cache.maxsize = code_cache.maxsize, size
+    try:
+        UPYTL.compile_template('generated [[ x ]]')
+        assert code_cache.stats()['size'] == size
+    finally:
+        code_cache.maxsize = maxsize
+
+
+def test_text_body_delimiters():
+    t = {
+        h.Div(): 'Hello [[ name ]] {% name %}!',
+    }
+    ctx = {'name': 'world'}
+    u = UPYTL(delimiters=('{%', '%}'))
+    assert u.render(t, ctx, indent=0, doctype=None) == '<div>Hello [[ name ]] world!</div>'
+    assert upytl.render(t, ctx, indent=0, doctype=None) == '<div>Hello world {% name %}!</div>'
+    # the body is parsed once and stored in the template
+    assert type(t[next(iter(t))]).__name__ == 'TextBody'
+
+
+def test_tag_class_default_attrs():
+    class Button(h.Button):
+        attrs = {'type': 'button', 'Class': 'btn'}
+
+    t = {Button(): 'OK', Button(type='submit'): 'Save'}
+    rendered = upytl.render(t, {}, indent=0, doctype=None)
+    assert rendered == '<button type="button" class="btn">OK</button><button type="submit" class="btn">Save</button>'
+    # the library tags have no instance dict, derived classes without `__slots__` have it
+    assert not any(hasattr(tag, '__dict__') for tag in [h.Div(), bm.Container(), h.DataTable(data={}, columns=[])])
+    assert hasattr(Button(), '__dict__')
+
+
+def test_dependencies():
+    class Item(Component):
+        props = dict(name='', suffix='')
+        template = {h.LI(Class='{kind}'): '[[ name ]][[ suffix ]]'}
+
+    li = [*Item.template][0]
+    item = Item(For='it in items', name={'it["name"]'}, suffix='{sep}')
+    first = h.P(If='flag')
+    other = h.P(Else='')
+    t = {
+        h.UL(): {item: None},
+        first: '[[ len(title) ]]',
+        other: 'static',
+    }
+    deps = upytl.dependencies(t)
+    assert deps[item] == {'items', 'sep'}
+    assert deps[[*t][0]] == {'items', 'sep'}
+    assert deps[first] == {'flag', 'title', 'len'}
+    assert deps[other] == {'flag'}
+    # component template depends on its context (props and global_ctx)
+    assert deps[li] == {'kind', 'name', 'suffix'}
+
+    upytl_g = UPYTL(global_ctx={'sep': '!', 'kind': 'k'})
+    rendered = upytl_g.render(t, {'items': [{'name': 'a'}], 'flag': False}, indent=0, doctype=None)
+    assert rendered == '<ul><li class="k">a!</li></ul><p>static</p>'
+
+
+def test_rerender():
+    class Card(Component):
+        props = dict(title='')
+        template = {h.Div(Class='card'): {h.H1(): '[[ title ]]', Slot(): ''}}
+
+    t = {
+        h.P(If='flag'): 'on',
+        h.P(Else=''): 'off',
+        h.Span(id='counter'): '[[ counter ]]',
+        Card(title={'title'}): {h.Div(): '[[ user ]]'},
+    }
+    ctx = {'flag': True, 'counter': 1, 'title': 'T', 'user': 'john'}
+    result = upytl.render_tracked(t, ctx, indent=0, doctype=None)
+    assert result.html == upytl.render(t, ctx, indent=0, doctype=None)
+
+    for changed in [{'counter': 2}, {'user': 'tom'}, {'flag': False}, {'title': 'X', 'counter': 3}]:
+        new = upytl.rerender(result, changed)
+        assert new.html == upytl.render(t, {**ctx, **changed}, indent=0, doctype=None)
+
+    new = upytl.rerender(result, {'counter': 2})
+    assert new.fragments == [('counter', '<span id="counter">2</span>')]
+    new = upytl.rerender(new, {'user': 'tom'})
+    assert new.fragments == [((2, 0), '<div>tom</div>')]
+    assert new.html == '<p>on</p><span id="counter">2</span><div class="card"><h1>T</h1><div>tom</div></div>'
+
+
+def test_render_fragment():
+    class Item(Component):
+        props = dict(name='')
+        template = {h.LI(): '[[ name ]]'}
+
+    class Card(Component):
+        props = dict(title='')
+        template = {h.Div(Class='card'): {h.H1(): '[[ title ]]', Slot(): ''}}
+
+    t = {
+        h.Div(id='header'): '[[ title ]]',
+        Card(title={'title'}): {
+            h.UL(If='items'): {
+                Item(For='it in items', name={'it'}): None,
+                h.LI({'data-fragment': 'last'}, id='last'): 'count: [[ len(items) ]]',
+            },
+            h.P(Else=''): 'no items',
+        },
+    }
+    ctx = {'title': 'T', 'items': ['a', 'b']}
+    assert upytl.render_fragment(t, ctx, 'header', indent=0) == '<div id="header">T</div>'
+    assert upytl.render_fragment(t, ctx, 'last', indent=0) == '<li data-fragment="last" id="last">count: 2</li>'
+    assert upytl.render_fragment(t, ctx, ('data-fragment', 'last'), indent=0) == (
+        '<li data-fragment="last" id="last">count: 2</li>'
+    )
+    assert upytl.render_fragment(t, ctx, Item, indent=0) == '<li>a</li>'
+    assert upytl.render_fragment(t, {**ctx, 'items': []}, h.P, indent=0) == '<p>no items</p>'
+    try:
+        upytl.render_fragment(t, {**ctx, 'items': []}, Item)
+    except LookupError:
+        pass
+    else:
+        assert False, 'LookupError expected'
+
+
+def test_for_window():
+    t = {
+        h.UL(): {
+            h.LI({'data-rows': 'items'}, For='it in items', Window={'offset': 'page * 2', 'limit': 2}): '[[ it ]]',
+        },
+        h.P(For='it in iter(items)', Limit=1): '[[ it ]]',
+    }
+    ctx = {'items': [0, 1, 2, 3, 4], 'page': 1}
+    assert upytl.render(t, ctx, indent=0, doctype=None) == (
+        '<ul><li data-rows="items">2</li><li data-rows="items">3</li></ul><p>0</p>'
+    )
+    assert upytl.render_rows(t, ctx, ('data-rows', 'items'), indent=0) == (
+        '<li data-rows="items">2</li><li data-rows="items">3</li>'
+    )
+    assert upytl.render_rows(t, ctx, ('data-rows', 'items'), offset=3, limit=5, indent=0) == (
+        '<li data-rows="items">3</li><li data-rows="items">4</li>'
+    )
+    assert upytl.render_rows(t, ctx, ('data-rows', 'items'), offset=5, indent=0) == ''
+    # the other one is of the node `Window`
+    assert upytl.render_rows(t, ctx, ('data-rows', 'items'), offset=1, indent=0) == (
+        '<li data-rows="items">1</li><li data-rows="items">2</li>'
+    )
+    assert upytl.render_rows(t, ctx, ('data-rows', 'items'), limit=1, indent=0) == '<li data-rows="items">2</li>'
+    try:
+        h.Div(Limit=1)
+    except ValueError:
+        pass
+    else:
+        assert False, 'ValueError expected'
+
+
+def test_data_table():
+    t = {
+        h.DataTable(data={'data'}, Class='table', batch_size=2, columns=[
+            {'name': 'name', 'title': 'Name <i>'},
+            {'name': 'price', 'format': '{:.1f}', 'Class': 'num'},
+            {'name': 'delta', 'Class': lambda v: 'neg' if v < 0 else None, 'escape': False},
+            # the static attrs are kept along with the hooked ones
+            {'name': 'qty', 'Class': 'num', 'Style': lambda v: 'color:red' if v < 0 else None},
+        ]): None,
+    }
+    data = {
+        'name': ['a&b', Markup('<b>c</b>'), '"d"'], 'price': array.array('d', [1, 2, 3]), 'delta': [1, -2, 3],
+        'qty': [1, 2, -3],
+    }
+    assert upytl.render(t, {'data': data}, indent=0, doctype=None) == (
+        '<table class="table"><thead><tr><th>Name &lt;i&gt;</th><th class="num">price</th><th>delta</th>'
+        '<th class="num">qty</th></tr></thead>'
+        '<tbody><tr><td>a&amp;b</td><td class="num">1.0</td><td>1</td><td class="num">1</td></tr>'
+        '<tr><td><b>c</b></td><td class="num">2.0</td><td class="neg">-2</td><td class="num">2</td></tr>'
+        '<tr><td>&quot;d&quot;</td><td class="num">3.0</td><td>3</td>'
+        '<td class="num" style="color:red">-3</td></tr></tbody></table>'
+    )
+
+
+def test_render_limits():
+    t = {h.Div(): {h.P(For='i in range(n)'): '[[ i ]]'}}
+    assert upytl.render(t, {'n': 3}, indent=0, doctype=None, limits={'max_nodes': 5, 'max_output': 100}) == (
+        '<div><p>0</p><p>1</p><p>2</p></div>'
+    )
+    for limits in [{'max_nodes': 5}, {'max_output': 30}, {'max_depth': 1}, {'timeout': 0}]:
+        try:
+            upytl.render(t, {'n': 10 ** 6}, indent=0, doctype=None, limits=limits)
+        except RenderLimitError as exc:
+            assert exc.limit == next(iter(limits))
+            assert isinstance(exc.component, (h.Div, h.P))
+            assert exc.html_dump.startswith('<div>')
+        else:
+            assert False, f'RenderLimitError expected for {limits}'
+
+
+def test_warmup():
+    class Card(Component):
+        props = dict(title='')
+        template = {h.Div(): '[[ title ]]!'}
+
+    u = UPYTL()
+    u.registered_components['card'] = Card
+    t = {h.P(): 'Hi [[ name ]]'}
+    assert u.warmup([t]) is u
+    assert all(isinstance(body, TextBody) and body.code is not None for body in [*t.values(), *Card.template.values()])
+    assert u.render(t, {'name': 'Tom'}, indent=0, doctype=None) == '<p>Hi Tom</p>'
+
+
+def test_interleaved_streams():
+    class Card(Component):
+        props = dict(title='')
+        template = {
+            h.Div(): {
+                h.H1(): '[[ title ]]',
+                Slot(): '',
+                h.Div(For='i in range(3)'): {Slot(SlotName='footer'): ''},
+            }
+        }
+
+    t = {
+        Card(title={'title'}): {
+            SlotTemplate(): {h.P(): '[[ text ]]'},
+            SlotTemplate(Slot='footer'): {h.I(): '[[ text ]]!'},
+        }
+    }
+    contexts = [{'title': 'A', 'text': 'a'}, {'title': 'B', 'text': 'b'}]
+    # the same instance renders both streams, their slots scopes must not interfere
+    streams = [upytl.stream(t, ctx, chunk_size=1) for ctx in contexts]
+    outputs = ['', '']
+    for chunks in zip_longest(*streams, fillvalue=''):
+        for i, chunk in enumerate(chunks):
+            outputs[i] += chunk
+    assert outputs == [upytl.render(t, ctx) for ctx in contexts]
+
+
+def test_xtemplate():
+    t = {h.Div(For='i in range(2)'): {XTemplate(data={'data'}): {h.B(): 'x'}}}
+    html = upytl.render(t, {'data': {'a': 1}}, indent=0, doctype=None)
+    ids = re.findall(r'id="([^"]+)"', html)
+    # deterministic and unique within the render
+    assert html == upytl.render(t, {'data': {'a': 1}}, indent=0, doctype=None)
+    assert len(set(ids)) == 2 and ids[1] == f'{ids[0]}-2'
+    assert 'upytl.mount_component("{}", {{"a":1}})'.format(ids[0]) in html
+
+    class MyXTemplate(XTemplate):
+        serializer = staticmethod(lambda data: 'DATA')
+
+    html = upytl.render({MyXTemplate(data={'data'}, id='x'): ''}, {'data': {}}, indent=0, doctype=None)
+    assert html.endswith('<script>upytl.mount_component("x", DATA)</script>')
+
+    # not serialized data
+    html = upytl.render({XTemplate(data=None): ''}, {}, indent=0, doctype=None)
+    assert html.endswith(', None)</script>')
+
+
+def test_json_dumps(monkeypatch):
+    data = {
+        'dt': datetime.datetime(2020, 1, 2, 3, 4, 5), 'big': 2 ** 70, 'keys': {1: 'x', None: 'é'},
+        'set': {1}, 'rows': [(1, 2.5)],
+    }
+    dumped = xtemplate.json_dumps(data)
+    monkeypatch.setattr(xtemplate, 'orjson', None)
+    assert xtemplate.json_dumps(data) == dumped == (
+        '{"dt":"2020-01-02 03:04:05","big":1180591620717411303424,"keys":{"1":"x","null":"é"},'
+        '"set":"{1}","rows":[[1,2.5]]}'
+    )
+
+
+def test_view_cache():
+    cache = ViewCache(maxsize=1)
+    renders = []
+
+    class Counted(Component):
+        props = dict(name='')
+        template = {h.B(): '[[ name ]]'}
+
+        def make_context(self, u, props_rendered):
+            renders.append(props_rendered['name'])
+            return super().make_context(u, props_rendered)
+
+    @upytl.view({Counted(name={'name'}): None}, cache=cache)
+    def page(name):
+        return {'name': name}
+
+    first = page('a')
+    assert first == page('a') and renders == ['a']
+    assert isinstance(page('a', if_none_match=f'W/{first.etag}, "x"'), NotModified)
+    assert page('b').etag != first.etag and renders == ['a', 'b']
+    page('a')  # evicted
+    assert renders == ['a', 'b', 'a']
+    assert cache.stats() == {'size': 1, 'maxsize': 1, 'hits': 1, 'misses': 3, 'not_modified': 1, 'uncacheable': 0}
+
+    # user-supplied version key
+    cache = ViewCache(version=lambda ctx: ctx['rev'])
+    page = upytl.view({h.B(): '[[ name ]]'}, cache=cache)(lambda name, rev: locals())
+    assert page('a', 1) == page('b', 1) != page('b', 2)
+    assert '>b<' in page('b', 2).replace(' ', '').replace('\n', '')
+
+    # views of the same name (e.g. made by a factory) with different templates
+    def make_view(title):
+        return upytl.view({h.B(): title}, cache=cache)(lambda: {'rev': 1})
+
+    assert '>A<' in make_view('A')().replace('\n', '').replace(' ', '')
+    assert '>B<' in make_view('B')().replace('\n', '').replace(' ', '')
+    # the whole view key is fingerprinted
+    prefix = 'x' * 64
+    assert ViewCache().etag(f'{prefix}.a', {}) != ViewCache().etag(f'{prefix}.b', {})
+
+    # the instance-wide context is fingerprinted too
+    u = UPYTL(global_ctx={'site': 'A', 'helper': lambda: None})
+    page = u.view({h.B(): '[[ site ]]'}, cache=ViewCache())(lambda: {})
+    first = page()
+    assert '>A<' in first.replace('\n', '').replace(' ', '')
+    u.global_ctx['site'] = 'B'
+    assert not isinstance(page(if_none_match=first.etag), NotModified)
+    assert '>B<' in page().replace('\n', '').replace(' ', '')
+
+
+def test_compressed_output():
+    t = {h.Div(For='i in range(300)'): '[[ i ]]'}
+    html = upytl.render(t, {})
+    assert gzip.decompress(upytl.render_compressed(t, {}, chunk_size=100)) == html.encode()
+    # each flushed chunk is decodable as is
+    d = zlib.decompressobj()
+    chunks = [d.decompress(c) for c in upytl.stream_compressed(t, {}, chunk_size=100, format='zlib')]
+    assert all(chunks[:-1]) and b''.join(chunks) == html.encode()
+
+    t = {h.Div(): {Deferred(value={'value'}): {h.I(): '[[ value ]]'}}}
+    future = Future()
+    chunks = upytl.stream_compressed(t, {'value': future}, indent=0, doctype=None, format='raw', flush='wait')
+    d = zlib.decompressobj(-zlib.MAX_WBITS)
+    # the shell is flushed before waiting
+    assert d.decompress(next(chunks)).startswith(b'<div><div id=')
+    future.set_result('V')
+    assert b'<i>V</i>' in b''.join(map(d.decompress, chunks))
+
+    # the shell is flushed even if its last chunk has been taken already
+    future = Future()
+    timer = threading.Timer(0.2, future.set_result, ['V'])
+    timer.start()
+    chunks = upytl.stream_compressed(t, {'value': future}, indent=0, chunk_size=1, format='raw', flush='wait')
+    d = zlib.decompressobj(-zlib.MAX_WBITS)
+    assert b'<i>V</i>' not in d.decompress(next(chunks))
+    assert b'<i>V</i>' in b''.join(map(d.decompress, chunks))
+    timer.cancel()
+
+
+def test_extract_styles():
+    class Badge(Component):
+        props = []
+        template = {h.Span(Style={'color': 'red'}): 'b'}
+
+    t = {
+        h.Head(): {h.ExtractedStyles(): None},
+        h.Div(For='i in range(2)', Class='row', Style={'padding': '1px'}): {Badge(): None},
+        h.P(Style={'color': '{color}'}): 'dynamic',
+    }
+    u = UPYTL(extract_styles=True)
+    html = u.render(t, {'color': 'blue'}, indent=0, doctype=None)
+    row, badge = [f's-{hashlib.blake2b(css, digest_size=4).hexdigest()}' for css in (b'padding:1px', b'color:red')]
+    css = ''.join(sorted([f'.{row}{{padding:1px}}', f'.{badge}{{color:red}}']))
+    assert u.stylesheet(t) == css
+    assert html == (
+        f'<head><style>{css}</style></head>'
+        + f'<div class="{row} row"><span class="{badge}">b</span></div>' * 2
+        + '<p style="color:blue">dynamic</p>'
+    )
+    # the stylesheet is of the rendered template only
+    other = {h.Head(): {h.ExtractedStyles(): None}, h.I(Style={'margin': '0'}): ''}
+    margin = f's-{hashlib.blake2b(b"margin:0", digest_size=4).hexdigest()}'
+    assert u.render(other, {}, indent=0, doctype=None) == (
+        f'<head><style>.{margin}{{margin:0}}</style></head><i class="{margin}"></i>'
+    )
+    assert u.render(t, {'color': 'blue'}, indent=0, doctype=None) == html
+    assert u.render_tracked(t, {'color': 'blue'}, indent=0, doctype=None).html == html
+    # the inline styles are kept in the events mode, so there is no stylesheet
+    assert u.render(other, {}, indent=0, doctype=None, filters=[iter]) == '<head></head><i style="margin:0"></i>'
+    # off by default
+    html = upytl.render(t, {'color': 'blue'})
+    assert 'style="padding:1px"' in html and '<style>' not in html
+
+    # per-render templates aren't kept
+    u.STYLED_TEMPLATES_CACHE_SIZE = 1
+    styled = len(u.styled_tags)
+    for i in range(3):
+        u.render({h.B(Style={'margin': f'{i}px'}): ''}, {})
+    gc.collect()
+    assert len(u._styled_templates) == 1 and len(u.styled_tags) == styled + 1
+
+
+def test_escaping():
+    t = {
+        h.Div(title='{x}', Class=[b'a&b']): {
+            h.Text(): '1 < 2: [[ x ]] [[ safe ]]',
+            h.B(): '[[ x ]]',  # trusted
+            h.I(): {h.Text(): 'static <br>'},
+        },
+        h.A(href=Markup('?a=1&amp;b=2')): '',
+    }
+    ctx = {'x': '<"x">', 'safe': Markup('<br>')}
+    assert upytl.render(t, ctx, indent=0, doctype=None) == (
+        '<div title="&lt;&quot;x&quot;&gt;" class="a&amp;b">'
+        '1 &lt; 2: &lt;&quot;x&quot;&gt; <br><b><"x"></b><i>static &lt;br&gt;</i></div><a href="?a=1&amp;b=2"></a>'
+    )
+    assert escape('<') + '<' == '&lt;&lt;' and escape(escape('<')) == '&lt;'
+
+
+def test_events():
+    t = {
+        h.Div(Class='a'): {
+            h.A(href='/x', For='i in range(2)'): '[[ i ]]',
+            h.Input(value='{value}'): '',
+            h.Script(src='/app.js'): '',
+        }
+    }
+    events = [*upytl.events(t, {'value': '<v>'})]
+    assert [type(ev).__name__ if not isinstance(ev, str) else ev for ev in events] == [
+        'StartTag', 'StartTag', '0', 'EndTag', 'StartTag', '1', 'EndTag', 'StartTag', 'StartTag', 'EndTag', 'EndTag'
+    ]
+    assert events[-4].void and events[-4].attrs == {'value': '<v>'}
+
+    links = []
+
+    def rewrite(events):
+        for ev in events:
+            if ev.__class__ is StartTag:
+                if 'href' in ev.attrs:
+                    links.append(ev.attrs['href'])
+                if 'src' in ev.attrs:
+                    ev.attrs['src'] = f'/static{ev.attrs["src"]}'
+                if ev.name == 'script':
+                    ev.attrs['nonce'] = 'n'
+            yield ev
+
+    for indent in (0, 2):
+        expected = upytl.render(t, {'value': '<v>'}, indent=indent).replace(
+            '<script src="/app.js">', '<script src="/static/app.js" nonce="n">'
+        )
+        assert upytl.render(t, {'value': '<v>'}, indent=indent, filters=[rewrite]) == expected
+    assert links == ['/x'] * 4
+
+
+def test_printer_tag_tuples():
+    t = {
+        h.Div(Class='a'): {
+            h.P(): {h.B(): 'x', h.Img(src='/i.png'): '', h.I(): ''},
+            h.Input(value='{v}'): '',
+            h.Span(): {},
+        }
+    }
+    events = [*upytl._session()._iter_raw_events(t, {'v': '<'})]
+    tags = [ev for ev in events if ev.__class__ is tuple]
+    assert tags == [
+        ('<div class="a">', '</div>'), ('<p>', '</p>'), ('<b>', '</b>'), ('<img src="/i.png" />', ''),
+        ('<i>', '</i>'), ('<input value="&lt;" />', ''), ('<span>', '</span>'),
+    ]
+    expected = {
+        0: '<div class="a"><p><b>x</b><img src="/i.png" /><i></i></p><input value="&lt;" /><span></span></div>',
+        2: (
+            '\n<div class="a">\n  <p>\n    <b>\n      x\n    </b>\n    <img src="/i.png" />\n    <i></i>\n  </p>'
+            '\n  <input value="&lt;" />\n  <span></span>\n</div>'
+        ),
+    }
+    for indent, html in expected.items():
+        assert upytl.render(t, {'v': '<'}, indent=indent, doctype=None) == html
+        # the structured events are printed the same way
+        assert upytl.render(t, {'v': '<'}, indent=indent, doctype=None, filters=[iter]) == html
+
+    # fixed self-closing markup (e.g. of a component) closes nothing, the next tuple is its sibling
+    out = HTMLPrinter(indent=2, doctype=None)
+    out.print(('<svg>', '</svg>'))
+    out.start_body()
+    out.print(('<use href="#i" />', ''))
+    out.print(('<use href="#j" />', ''))
+    out.end_body()
+    out.print(('<hr />', ''))
+    out.close_pending()
+    assert out.take_output() == '\n<svg>\n  <use href="#i" />\n  <use href="#j" />\n</svg>\n<hr />'
+
+
+def test_lazy_registry(tmp_path, monkeypatch):
+    pkg = tmp_path / 'lazy_components'
+    (pkg / 'sub').mkdir(parents=True)
+    (pkg / '__init__.py').write_text('')
+    (pkg / 'sub' / '__init__.py').write_text('')
+    (pkg / 'sub' / 'cards.py').write_text(
+        'from upytl import Component, html as h\n'
+        'class Card(Component):\n'
+        '    props = ["title"]\n'
+        '    template = {h.B(): "[[ title ]]"}\n'
+        'class _Private(object): ...\n'
+        'class Helper(dict): ...\n'
+        'class WideCard(\n    Card, metaclass=type\n): ...\n'
+    )
+    (pkg / 'other.py').write_text('class Helper(object): ...\nclass Badge(h.Span): ...\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    u = UPYTL()
+    u.register_package('lazy_components')
+    u.register('Alias', 'lazy_components.sub.cards:Card')
+    assert u.registered_components == {
+        'Card': 'lazy_components.sub.cards:Card', 'WideCard': 'lazy_components.sub.cards:WideCard',
+        'Alias': 'lazy_components.sub.cards:Card',
+    }
+    # the same package again is fine, a component of the same name from another module isn't
+    u.register_package('lazy_components')
+    (pkg / 'other.py').write_text('from upytl import Component\nclass Card(Component): ...\n')
+    with pytest.raises(ValueError, match="'Card' is ambiguous"):
+        UPYTL().register_package('lazy_components')
+    with pytest.raises(ValueError, match="'Card' is already registered"):
+        u.register_package('lazy_components.other')
+    assert 'lazy_components.sub.cards' not in sys.modules
+    t = {GenericComponent(Is='{name}', title='x'): None}
+    assert u.render(t, {'name': 'Card'}, indent=0, doctype=None) == '<b>x</b>'
+    # resolved class is cached
+    assert u.registered_components['Card'] is sys.modules['lazy_components.sub.cards'].Card
+    assert u.render(t, {'name': 'Alias'}, indent=0, doctype=None) == '<b>x</b>'
+
+
+def test_if_chains():
+    calls = []
+
+    def cond(name, value):
+        calls.append(name)
+        return value
+
+    t = {
+        h.Div(): {
+            h.B(If='cond("a", x == 1)'): 'a',
+            h.B(Elif='cond("b", x == 2)'): 'b',
+            h.B(Elif='cond("c", x == 3)'): 'c',
+            h.B(Else=''): 'else',
+            h.I(If='cond("d", x)', For='i in range(2)'): '[[ i ]]',
+            h.Span(): 'end',
+        }
+    }
+    u = UPYTL()
+    u.prepare(t)
+    assert u.render(t, {'x': 2, 'cond': cond}, indent=0, doctype=None) == (
+        '<div><b>b</b><i>0</i><i>1</i><span>end</span></div>'
+    )
+    # the rest of the chain isn't evaluated
+    assert calls == ['a', 'b', 'd']
+    calls.clear()
+    assert u.render(t, {'x': 0, 'cond': cond}, indent=0, doctype=None) == '<div><b>else</b><span>end</span></div>'
+    assert calls == ['a', 'b', 'c', 'd']
+
+    # misplaced Elif/Else is reported by `prepare`
+    for bad in [
+        {h.Div(): {h.B(): '', h.I(Elif='x'): ''}},
+        {h.Div(): {h.B(If='x'): '', h.I(Else=''): '', h.I(Else=''): ''}},
+    ]:
+        with pytest.raises(RuntimeError, match='out of If-block'):
+            UPYTL().prepare(bad)
+
+    # the plan is cached at render, the changed body is planned again
+    u = UPYTL()
+    body = {h.B(If='x'): 'b', h.I(): 'i'}
+    t = {h.Div(): body}
+    assert u.render(t, {'x': 1}, indent=0, doctype=None) == '<div><b>b</b><i>i</i></div>'
+    assert id(body) in u._body_plans
+    body[h.Span()] = 's'
+    del body[next(iter(body))]
+    assert u.render(t, {'x': 1}, indent=0, doctype=None) == '<div><i>i</i><span>s</span></div>'
+    body[next(iter(body))] = 'new'
+    assert u.render(t, {'x': 1}, indent=0, doctype=None) == '<div><i>new</i><span>s</span></div>'
+    body[h.Em()] = 'em'
+    assert u.render(t, {'x': 1}, indent=0, doctype=None) == '<div><i>new</i><span>s</span><em>em</em></div>'
+
+
+def test_recursive_component():
+    calls = []
+
+    class Tree(Component):
+        props = dict(node={})
+        recursive = True
+
+        @staticmethod
+        def template_factory(cls):
+            return {
+                h.LI(For='name, child in node.items()'): {
+                    h.Text(): '[[ name ]]',
+                    h.UL(If='child'): {cls(node={'child'}): None},
+                }
+            }
+
+        def get_context(self, props: dict) -> dict:
+            calls.append(props['node'])
+            return props
+
+    shared = {'a': {}, 'b': {'c': {}}}
+    tree = {'x': shared, 'y': {'z': shared}, 'w': shared}
+    t = {h.UL(): {Tree(node={'tree'}): None}}
+    html = '<ul><li>a</li><li>b<ul><li>c</li></ul></li></ul>'
+    assert upytl.render(t, {'tree': tree}, indent=0, doctype=None) == (
+        f'<ul><li>x{html}</li><li>y<ul><li>z{html}</li></ul></li><li>w{html}</li></ul>'
+    )
+    # the template of the shared subtree is rendered once
+    assert sum(it is shared for it in calls) == 3
+    assert sum(it is shared['b'] for it in calls) == 1
+
+    # the output isn't memoized for the events filters, so each node is filtered once
+    def mark(events):
+        for ev in events:
+            if ev.__class__ is StartTag:
+                ev.attrs['data-n'] = ev.attrs.get('data-n', '') + '1'
+            yield ev
+
+    html = upytl.render(t, {'tree': tree}, indent=0, doctype=None, filters=[mark])
+    plain = upytl.render(t, {'tree': tree}, indent=0, doctype=None)
+    assert html == re.sub(r'<(\w+)', r'<\1 data-n="1"', plain)
+
+    # nor the output of the subtree changing the render state, e.g. by `make_id`
+    class Name(Component):
+        props = dict(name='')
+        template = {h.A(id='{uid}'): '[[ name ]]'}
+
+        def make_context(self, u: UPYTL, props: dict) -> dict:
+            return {**props, 'uid': u.make_id(props['name'])}
+
+    class IdTree(Component):
+        props = dict(node={})
+        recursive = True
+
+        @staticmethod
+        def template_factory(cls):
+            return {
+                h.LI(For='name, child in node.items()'): {
+                    Name(name={'name'}): None,
+                    h.UL(If='child'): {cls(node={'child'}): None},
+                }
+            }
+
+    html = upytl.render({IdTree(node={'tree'}): None}, {'tree': tree}, indent=0, doctype=None)
+    ids = re.findall(r'id="([^"]+)"', html)
+    assert len(ids) == len(set(ids)) == 13
+
+    # deep data doesn't hit the recursion limit
+    deep = node = {}
+    for _ in range(sys.getrecursionlimit()):
+        node['n'] = node = {}
+    html = upytl.render(t, {'tree': deep}, indent=0, doctype=None)
+    assert html.count('<li>n') == sys.getrecursionlimit()
+
+    # memoized by the key across renders
+    class VersionedTree(Tree):
+        props = dict(node={}, version=0)
+        memo_shared = True
+
+        def memo_key(self, props: dict):
+            return props['version']
+
+    t = {VersionedTree(node={'tree'}, version={'version'}): None}
+    u = UPYTL()
+    assert u.render(t, {'tree': {'a': {}}, 'version': 1}, indent=0, doctype=None) == '<li>a</li>'
+    assert u.render(t, {'tree': {'b': {}}, 'version': 1}, indent=0, doctype=None) == '<li>a</li>'
+    assert u.render(t, {'tree': {'b': {}}, 'version': 2}, indent=0, doctype=None) == '<li>b</li>'
+
+
+def test_deferred_stream():
+    t = {
+        h.Div(): {
+            Deferred(value={'slow'}, name='user', id='d1'): {
+                SlotTemplate(Slot='placeholder'): 'Loading...',
+                SlotTemplate(): {h.B(): '[[ user ]]'},
+            },
+            Deferred(value={'fast'}, id='d2'): {h.I(): '[[ value ]]'},
+            h.P(): 'end',
+        }
+    }
+    slow, fast = Future(), Future()
+    chunks = upytl.stream(t, {'slow': slow, 'fast': fast}, indent=0, doctype=None)
+    # the shell is flushed before the values are resolved
+    assert next(chunks) == '<div><div id="d1">Loading...</div><div id="d2"></div><p>end</p></div>'
+    fast.set_result('F')
+    slow.set_result('S')
+    # both are completed, so these are flushed in order of the template
+    assert [*chunks] == [
+        f'<script>{SWAP_SCRIPT}</script><template id="d1-content"><b>S</b></template><script>upytl.swap("d1")</script>',
+        '<template id="d2-content"><i>F</i></template><script>upytl.swap("d2")</script>',
+    ]
+
+    async def get_user():
+        return 'A'
+
+    async def render():
+        ctx = {'slow': asyncio.ensure_future(get_user()), 'fast': lambda: 'L'}
+        return ''.join([chunk async for chunk in upytl.astream(t, ctx, indent=0, doctype=None)])
+
+    rendered = asyncio.run(render())
+    assert '<template id="d1-content"><b>A</b></template>' in rendered
+    assert '<template id="d2-content"><i>L</i></template>' in rendered
+
+    # rendered in place if deferring isn't supported
+    assert upytl.render_fragment(t, {'slow': 'S', 'fast': 'F'}, Deferred, indent=0) == (
+        f'<div id="d1">Loading...</div><script>{SWAP_SCRIPT}</script>'
+        '<template id="d1-content"><b>S</b></template><script>upytl.swap("d1")</script>'
+    )
+
+    # the placeholder ids are numbered in order of the render, so the markup is deterministic
+    t = {Deferred(value={'value'}): '', Deferred(value={'value'}, Class='x'): ''}
+    chunks = [next(upytl.stream(t, {'value': Future()}, indent=0, doctype=None)) for _ in range(2)]
+    ids = re.findall(r'id="([^"]+)"', chunks[0])
+    assert chunks[0] == chunks[1] and len(set(ids)) == 2 and ids[1] == f'{ids[0]}-2'
@@ -1,8 +1,9 @@
-upytl = {}
+// `upytl.swap` of the streamed pages is defined inline, see `upytl.deferred.SWAP_SCRIPT`
+upytl = window.upytl || {}
 
 upytl.mount_component = function(id, data){
     data = data || {}
     var id = `#${id}`
     var c = Vue.extend({template: id, data: ()=>data})
     new c().$mount(id)
-}
\ No newline at end of file
+}
@@ -1,6 +1,9 @@
 from . import html
 from .core import Tag, MetaTag, Component, Slot, SlotTemplate, UHelper, UPYTL, Template, gtag, SlotsEnum
 from .xtemplate import XTemplate
+from .deferred import Deferred
+from .caching import ViewCache
+from .escape import Markup
 
 
 __all__ = (
@@ -14,6 +17,9 @@ __all__ = (
     'UPYTL',
     'Template',
     'XTemplate',
+    'Deferred',
+    'ViewCache',
+    'Markup',
     'gtag',
     'SlotsEnum',
 )
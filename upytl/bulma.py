@@ -13,10 +13,12 @@ class ModifierTypeEnum(str, Enum):
 
 
 class BulmaBase(UTag):
+    __slots__ = ()
     tag_name = 'div'
 
 
 class Container(BulmaBase):
+    __slots__ = ()
 
     class ContainerTypes(ModifierTypeEnum):
         widescreen = auto()
@@ -29,80 +31,98 @@ class Container(BulmaBase):
 
 # level
 class Level(BulmaBase):
+    __slots__ = ()
     ident_class = 'level'
 
 
 class LevelLeft(BulmaBase):
+    __slots__ = ()
     ident_class = 'level-left'
 
 
 class LevelRight(BulmaBase):
+    __slots__ = ()
     ident_class = 'level-right'
 
 
 class LevelItem(BulmaBase):
+    __slots__ = ()
     ident_class = 'level-item'
 
 
 # media
 class Media(BulmaBase):
+    __slots__ = ()
     ident_class = 'media'
 
 
 class MediaLeft(BulmaBase):
+    __slots__ = ()
     ident_class = 'media-left'
 
 
 class MediaRight(BulmaBase):
+    __slots__ = ()
     ident_class = 'media-right'
 
 
 class MediaContent(BulmaBase):
+    __slots__ = ()
     ident_class = 'media-item'
 
 
 # hero
 class Hero(BulmaBase):
+    __slots__ = ()
     ident_class = 'hero'
 
 
 class HeroHead(BulmaBase):
+    __slots__ = ()
     ident_class = 'hero-head'
 
 
 class HeroBody(BulmaBase):
+    __slots__ = ()
     ident_class = 'hero-body'
 
 
 class HeroFoot(BulmaBase):
+    __slots__ = ()
     ident_class = 'hero-foot'
 
 
 # section
 class Section(BulmaBase):
+    __slots__ = ()
     ident_class = 'section'
 
 
 # footer
 class Footer(BulmaBase):
+    __slots__ = ()
     ident_class = 'footer'
 
 
 # elements
 class Box(BulmaBase):
+    __slots__ = ()
     ident_class = 'box'
 
 
 class Button(BulmaBase):
+    __slots__ = ()
     ident_class = 'button'
     tag_name = 'button'
 
 
 class Content(BulmaBase):
+    __slots__ = ()
     ident_class = 'Content'
 
 
 class DelButton(BulmaBase):
+    __slots__ = ()
     ident_class = 'delete'
     tag_name = 'button'
 
@@ -124,6 +144,7 @@ class Icon(Component):
 
 
 class IconText(BulmaBase):
+    __slots__ = ()
     ident_class = 'icon-text'
     tag_name = 'span'
 
@@ -142,34 +163,41 @@ class Image(Component):
 
 
 class Tag(BulmaBase):
+    __slots__ = ()
     ident_class = 'tag'
 
 
 class Title(BulmaBase):
+    __slots__ = ()
     ident_class = 'title'
     tag_name = 'p'
 
 
 class SubTitle(BulmaBase):
+    __slots__ = ()
     ident_class = 'subtitle'
     tag_name = 'p'
 
 
 # notification
 class Notification(BulmaBase):
+    __slots__ = ()
     ident_class = 'notification'
 
 
 # Nav
 class Navbar(BulmaBase):
+    __slots__ = ()
     ident_class = 'navbar'
 
 
 class NavbarBrand(BulmaBase):
+    __slots__ = ()
     ident_class = 'navbar-brand'
 
 
 class NavbarItem(BulmaBase):
+    __slots__ = ()
     ident_class = 'navbar-item'
     tag_name = 'a'
 
@@ -185,27 +213,33 @@ class NavbarBurger(Component):
 
 
 class NavbarMenu(BulmaBase):
+    __slots__ = ()
     ident_class = 'navbar-menu'
 
 
 class NavbarStart(BulmaBase):
+    __slots__ = ()
     ident_class = 'navbar-start'
 
 
 class NavbarEnd(BulmaBase):
+    __slots__ = ()
     ident_class = 'navbar-end'
 
 
 class NavbarLink(BulmaBase):
+    __slots__ = ()
     ident_class = 'navbar-link'
     tag_name = 'a'
 
 
 class NavbarDropdown(BulmaBase):
+    __slots__ = ()
     ident_class = 'navbar-dropdown'
 
 
 class NavbarHR(BulmaBase):
+    __slots__ = ()
     ident_class = 'navbar-divider'
     tag_name = 'hr'
 
@@ -304,11 +338,13 @@ class MenuItem(BreadcrumbItem):
 
 
 class MenuTag(BulmaBase):
+    __slots__ = ()
     ident_class = 'menu'
     tag_name = 'aside'
 
 
 class MenuLabelTag(BulmaBase):
+    __slots__ = ()
     ident_class = 'menu-label'
     tag_name = 'p'
 
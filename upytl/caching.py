@@ -0,0 +1,203 @@
+import hashlib
+import os
+import pickle
+import threading
+from typing import Any, Callable, Dict, Optional, Union
+
+from upytl.helpers import ValueGetter
+
+
+class Rendered(str):
+    """Page rendered by `UPYTL.view` with a cache, `etag` is the value of the `ETag` header."""
+    etag: str
+
+
+class NotModified:
+    """Returned by `UPYTL.view` with a cache instead of the page if the client has its current version."""
+    __slots__ = ('etag',)
+
+    def __init__(self, etag: str):
+        self.etag = etag
+
+    def __repr__(self):
+        return f'NotModified({self.etag})'
+
+
+class ViewCache:
+    """Bounded cache of pages rendered by `UPYTL.view`, keyed by ETag.
+
+    The ETag is a fingerprint of the view (see `view_key`) and the context it returns (pickled, sets are sorted),
+    or of `version(ctx)` if passed, e.g. `ViewCache(version=lambda ctx: ctx['post'].updated_at)`.
+    The pages with unpicklable context are rendered as usual, without ETag.
+    `global_ctx`/`default_ctx` of the instance are fingerprinted as well (see `etag`).
+    """
+
+    def __init__(self, maxsize: int = 128, version: Callable[[dict], Any] = None):
+        self.maxsize = maxsize
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.uncacheable = 0
+        self._data: Dict[str, Rendered] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def view_key(name: str, template: dict) -> str:
+        """Return the key of the view named e.g. by the function qualname, see `template_fingerprint`."""
+        return f'{name}:{template_fingerprint(template)}'
+
+    def etag(self, view_key: str, ctx: dict, u=None) -> Optional[str]:
+        """Return ETag of the page (quoted), `None` if the context can't be fingerprinted.
+
+        If the rendering `UPYTL` instance is passed, its `global_ctx`/`default_ctx` are fingerprinted too,
+        their unpicklable values (e.g. functions defined in a function) by the qualified name.
+        """
+        try:
+            state = ctx if self.version is None else self.version(ctx)
+            if u is not None:
+                state = (state, _env_state(u.global_ctx), _env_state(u.default_ctx))
+            state = pickle.dumps(_canonical(state), pickle.HIGHEST_PROTOCOL)
+        except _PICKLE_ERRORS:
+            return None
+        key = view_key.encode()
+        h = hashlib.blake2b(len(key).to_bytes(8, 'big'), digest_size=16)
+        h.update(key)
+        h.update(state)
+        return f'"{h.hexdigest()}"'
+
+    def render(
+            self, u, template: dict, ctx: dict, view_key: str, if_none_match: str = None
+    ) -> Union[Rendered, NotModified, str]:
+        """Return the page from the cache or render it, `NotModified` if `if_none_match` has its ETag."""
+        etag = self.etag(view_key, ctx, u)
+        if etag is None:
+            self.uncacheable += 1
+            return u.render(template, ctx)
+        if if_none_match is not None and _etag_matches(etag, if_none_match):
+            self.not_modified += 1
+            return NotModified(etag)
+        data = self._data
+        with self._lock:
+            page = data.pop(etag, None)
+            if page is not None:
+                self.hits += 1
+                data[etag] = page
+                return page
+        page = Rendered(u.render(template, ctx))
+        page.etag = etag
+        with self._lock:
+            self.misses += 1
+            data[etag] = page
+            while len(data) > self.maxsize:
+                del data[next(iter(data))]
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.not_modified = self.uncacheable = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'uncacheable': self.uncacheable,
+        }
+
+
+def template_fingerprint(template: dict) -> str:
+    """Return digest of the template, it is the same in the processes running the same code.
+
+    It covers the nodes classes and positions in the source files, the attrs and the text bodies,
+    `For` loops are covered by the variables and the context names they read.
+    """
+    h = hashlib.blake2b(digest_size=16)
+
+    def walk(body):
+        if not isinstance(body, dict):
+            h.update(repr(body).encode())
+            return
+        h.update(b'{')
+        for node, node_body in body.items():
+            h.update(_node_repr(node).encode())
+            walk(node_body)
+        h.update(b'}')
+
+    walk(template)
+    return h.hexdigest()
+
+
+def _node_repr(node) -> str:
+    if isinstance(node, str):
+        # a branch of `Template(Is=...)`
+        return repr(node)
+    cls = type(node)
+    created_at = getattr(node, '_created_at', None)
+    if created_at is not None:
+        created_at = (os.path.basename(created_at[0]), created_at[1])
+    for_loop = node.for_loop and (node.for_loop[0], sorted(node.for_loop[2]))
+    if_cond = node.if_cond and (node.if_cond[0], _value_repr(node.if_cond[1]))
+    attrs = _value_repr(node.attrs)
+    return f'{cls.__module__}.{cls.__qualname__}{created_at}{for_loop}{if_cond}{attrs}'
+
+
+def _value_repr(v) -> str:
+    if isinstance(v, ValueGetter):
+        if v._src is not None:
+            return repr(v._src)
+        if v.is_static:
+            return repr(v.get(None))
+        f = v.get
+        return f'{getattr(f, "__module__", None)}.{getattr(f, "__qualname__", type(f).__qualname__)}'
+    if isinstance(v, dict):
+        return '{' + ','.join([f'{k!r}:{_value_repr(it)}' for k, it in v.items()]) + '}'
+    return repr(v)
+
+
+def _canonical(obj):
+    """Return the object with sets (in dicts, lists and tuples) replaced by sorted pickles of the items,
+    so the pickle of the result doesn't depend on the hash randomization of the process.
+    """
+    cls = obj.__class__
+    if cls is dict:
+        items = [(k, _canonical(v)) for k, v in obj.items()]
+        if any(v is not obj[k] for k, v in items):
+            return dict(items)
+    elif cls is list or cls is tuple:
+        items = [_canonical(it) for it in obj]
+        if any(a is not b for a, b in zip(items, obj)):
+            return cls(items)
+    elif cls is set or cls is frozenset:
+        return (cls.__name__, sorted([pickle.dumps(_canonical(it), pickle.HIGHEST_PROTOCOL) for it in obj]))
+    return obj
+
+
+def _env_state(ctx: dict) -> list:
+    """Return `[(name, pickled value | qualified name)]` of the instance-wide context."""
+    ret = []
+    for k, v in ctx.items():
+        try:
+            v = pickle.dumps(_canonical(v), pickle.HIGHEST_PROTOCOL)
+        except _PICKLE_ERRORS:
+            cls = type(v)
+            name = f'{getattr(v, "__module__", None)}.{getattr(v, "__qualname__", None)}'
+            v = f'{cls.__module__}.{cls.__qualname__}:{name}'
+        ret.append((k, v))
+    return ret
+
+
+_PICKLE_ERRORS = (pickle.PicklingError, TypeError, AttributeError)
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    """Check `If-None-Match` header value (weak comparison)."""
+    if if_none_match.strip() == '*':
+        return True
+    return any(
+        (tag[2:] if tag.startswith('W/') else tag) == etag
+        for tag in (t.strip() for t in if_none_match.split(','))
+    )
@@ -0,0 +1,34 @@
+import zlib
+
+# `wbits` of the formats
+FORMATS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'zlib': zlib.MAX_WBITS,  # `Content-Encoding: deflate`
+    'raw': -zlib.MAX_WBITS,
+}
+
+
+class Compressor:
+    """Incremental compressor of the rendered output.
+
+    The chunks are compressed as they are rendered, `flush` makes the output
+    so far decodable by the client (e.g. before waiting for `Deferred` values).
+    """
+
+    def __init__(self, format: str = 'gzip', level: int = 6, encoding: str = 'utf-8'):
+        try:
+            wbits = FORMATS[format]
+        except KeyError:
+            raise ValueError(f'Unknown compression format: {format!r}, expected one of {", ".join(FORMATS)}')
+        self.format = format
+        self.encoding = encoding
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, chunk: str) -> bytes:
+        return self._obj.compress(chunk.encode(self.encoding))
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
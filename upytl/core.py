@@ -1,17 +1,36 @@
+import copy
+import importlib
+import importlib.util
 import io
+import os
 import re
 import functools
+import hashlib
 from enum import Enum
-from types import SimpleNamespace, CodeType
+from types import CodeType
 import inspect
+import sys
 import threading
+import time
+import weakref
 
-from typing import Union, Callable, Tuple, List, Iterable, overload, Type, Dict, TypeVar, Optional
+from typing import (
+    Union, Callable, Tuple, List, Iterable, Iterator, AsyncIterator, overload, Type, Dict, TypeVar, Optional,
+    FrozenSet, Any, Hashable
+)
 
-from upytl.helpers import AttrsDict, ValueGetter, ValueGettersDict
+from upytl.caching import ViewCache
+from upytl.compress import Compressor
+from upytl.escape import escape_str, escape_value as _upytl_escape
+from upytl.events import EndTag, StartTag, parse_attrs_str
+from upytl.helpers import (
+    AttrsDict, AttrsPlan, ValueGetter, ValueGettersDict, attrs_to_str, code_cache, compile_simple_expr,
+    expr_names, islice_window, union_names
+)
 
 
 AUTO_TAG_NAME = object()
+NO_ASSIGN_ATTRS = ValueGetter({})
 
 
 class RenderError(Exception):
@@ -38,6 +57,17 @@ class RenderError(Exception):
         )
 
 
+class RenderLimitError(RenderError):
+    """Raised if a render budget is exceeded, see `UPYTL.render`.
+
+    The `component` is the node being rendered when the budget ran out.
+    """
+
+    def __init__(self, component: Optional['Tag'], limit: str, value):
+        super().__init__(component, f'render limit {limit}={value} is exceeded')
+        self.limit = limit
+
+
 def catch_errors(fun):
 
     @functools.wraps(fun)
@@ -51,21 +81,26 @@ def catch_errors(fun):
     return inner
 
 
-class RenderedTag(SimpleNamespace):
+class RenderedTag:
+    __slots__ = ('tag_class', 'attrs', 'tag', 'attrs_str')
+
     tag_class: Type['Tag']
-    attrs: dict
+    attrs: Optional[dict]  # None if attrs are rendered straight to `attrs_str`
     tag: Union[str, None]
+    attrs_str: Optional[str]
+
+    def __init__(self, tag_class: Type['Tag'], attrs: Optional[dict], tag, attrs_str: str = None):
+        self.tag_class = tag_class
+        self.attrs = attrs
+        self.tag = tag
+        self.attrs_str = attrs_str
+
+    def __repr__(self):
+        return f'RenderedTag(tag_class={self.tag_class!r}, attrs={self.attrs!r}, tag={self.tag!r})'
 
     @property
     def tag_name(self) -> str:
-        name = self.tag
-        if name and isinstance(name, str):
-            return name
-
-        class_name = self.tag_class.__name__
-        if name is AUTO_TAG_NAME:
-            class_name = class_name.lower()
-        return class_name
+        return resolve_tag_name(self.tag_class, self.tag)
 
     @property
     def is_body_allowed(self) -> bool:
@@ -76,38 +111,100 @@ class RenderedTag(SimpleNamespace):
         return self.tag_class.is_meta_tag
 
 
+def resolve_tag_name(tag_class: Type['Tag'], name) -> str:
+    if name and isinstance(name, str):
+        return name
+
+    class_name = tag_class.__name__
+    if name is AUTO_TAG_NAME:
+        class_name = class_name.lower()
+    return class_name
+
+
+def format_tag(tag_name: str, attrs_str: str, is_body_allowed: bool) -> Tuple[str, str]:
+    """Return (open-tag, close-tag)."""
+    if is_body_allowed:
+        return (f'<{tag_name}{attrs_str}>', f'</{tag_name}>')
+    return (f'<{tag_name}{attrs_str} />', '')
+
+
 def set_info(init):
 
     @functools.wraps(init)
     def inner(self: 'Tag', *args, **kw):
-        if self._info is None:
+        if getattr(self, '_created_at', None) is None:
             frm = inspect.currentframe().f_back
-            self._info = {'created_at': f'{frm.f_code.co_filename}:{frm.f_lineno}'}
+            self._created_at = (frm.f_code.co_filename, frm.f_lineno)
             del frm
         init(self, *args, **kw)
 
     return inner
 
 
+def _compile_for_loop(s: str) -> Tuple[Tuple[str, ...], Callable[[dict], Iterable], FrozenSet[str]]:
+    """s = 'a, b in some'
+
+    Return (var_names, iterable_factory, names the iterable reads from the context).
+    """
+    # get vars-in part
+    vars_s, _, iterable_s = s.partition(' in ')
+    vars_s = vars_s.strip()
+    # remove parens
+    vars_s = re.sub(r'[\(\[\]\)]', '', vars_s)
+    var_names = [k.strip() for k in vars_s.split(',') if k.strip()]
+    var_names_s = ", ".join(var_names)
+    if len(var_names) > 1:
+        var_names_s = f'({var_names_s})'
+    # generator - the loop is iterated lazily, e.g. up to `Window` end or render limits
+    lst_src = f'({var_names_s} for {s})'
+    code_obj = compile(lst_src, '<string>', 'eval')
+
+    def iterable_factory(ctx: dict):
+        return eval(code_obj, None, ctx)
+
+    if var_names == [vars_s]:
+        # `(it for it in items)` - just iterate over `items` if it is trivial
+        iterable_factory = compile_simple_expr(iterable_s.strip(), iterable_factory) or iterable_factory
+    return tuple(var_names), iterable_factory, expr_names(lst_src)
+
+
 class Tag:
+    # a derived class without `__slots__` has `__dict__` (e.g. `Component` as its `props` shadow the class attribute)
+    __slots__ = (
+        'attrs', 'for_loop', 'for_window', 'if_cond', 'assign_attrs', 'attrs_plan', 'static_event', '_created_at',
+        '__weakref__'
+    )
 
     tag_name: Union[str, object] = AUTO_TAG_NAME
 
     is_body_allowed = True  # no body - no closing tag
     is_meta_tag = False  # if True expose only body, e.g. Text, Template, MyComponent, Slot
+    escape_body = False  # if True the text body is escaped except `Markup` values, see `upytl.escape`
     ident_class = None  # identity non-overridable class
+    # default attrs of the tag class, a class attribute `attrs` of a derived class is moved here
+    default_attrs: Optional[dict] = None
 
     # instance attributes
-    attrs: Dict[str, Union[ValueGetter, Dict[str, ValueGetter]]] = None
-    for_loop: tuple  # (var_names, iterable_factory)
+    attrs: Dict[str, Union[ValueGetter, Dict[str, ValueGetter]]]
+    for_loop: tuple  # (var_names, iterable_factory, iterable names)
+    for_window: Optional[Tuple[ValueGetter, ValueGetter]]  # (offset, limit) of `For` loop
     if_cond: Tuple[str, ValueGetter]   # (kword:['If' | 'Elif' | 'Else'] , value:[callable | castable to bool])
     assign_attrs: ValueGetter
-    _info: Optional[dict] = None
+    attrs_plan: Optional[AttrsPlan]
+    static_event: Union[Tuple[str, str], RenderedTag, None]  # render event if the tag is fully static
+    _created_at: Optional[Tuple[str, int]]  # (filename, lineno)
+
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        # class attribute would shadow the slot
+        if 'attrs' in cls.__dict__:
+            cls.default_attrs = cls.__dict__['attrs']
+            delattr(cls, 'attrs')
 
     @overload
     def __init__(
         self, _: dict = None, *,
-        For=None, If=None, Elif=None, Else=None,
+        For=None, Window=None, Limit=None, If=None, Elif=None, Else=None,
         Class=None, xClass=None,
         Style=None, xStyle=None,
         Data=None, xData=None,
@@ -121,30 +218,70 @@ class Tag:
     def __init__(self, _: dict = None, **attrs):
         """
         xClass, xStyle, xData mean eXtend Class or Style or Data
+        Window={'offset': ..., 'limit': ...} or Limit=... render only a window of `For` loop
         """
         if _ is not None:
             _.update(attrs)
             attrs = _
 
-        if self.attrs is not None:
-            attrs = dict(self.attrs, **attrs)
+        if self.default_attrs is not None:
+            attrs = dict(self.default_attrs, **attrs)
 
         self.attrs, self.for_loop, self.if_cond = self._process_attrs(attrs)
-        self.assign_attrs = self.attrs.pop('Attrs', ValueGetter({}))
+        self.assign_attrs = self.attrs.pop('Attrs', NO_ASSIGN_ATTRS)
+        self.attrs_plan = self._make_attrs_plan()
+        self.static_event = self._make_static_event()
+
+    @property
+    def _info(self) -> Optional[dict]:
+        created_at = getattr(self, '_created_at', None)
+        if created_at is None:
+            return None
+        return {'created_at': '{}:{}'.format(*created_at)}
+
+    def _make_attrs_plan(self) -> Optional[AttrsPlan]:
+        """Return precompiled attrs if the tag attrs rendering isn't customized."""
+        cls = type(self)
+        if (
+            cls._render_attrs.__func__ is not Tag._render_attrs.__func__
+            or cls._make_self_rendered.__func__ is not Tag._make_self_rendered.__func__
+            or cls._render_dict_body is not Tag._render_dict_body
+            or not self.assign_attrs.is_static
+            or self.assign_attrs.get(None)
+        ):
+            return None
+        return AttrsPlan.build(self.attrs, self.ident_class)
+
+    def _make_static_event(self) -> Union[Tuple[str, str], RenderedTag, None]:
+        plan = self.attrs_plan
+        if plan is not None and plan.is_static and (plan.tag is None or plan.tag.is_static):
+            tag = self.tag_name if plan.tag is None else plan.tag.get(None)
+            return self._make_event(tag, plan.static_str)
+        return None
+
+    def with_extracted_style(self, class_name: str) -> Optional['Tag']:
+        """Return a copy of the tag rendering `class_name` instead of the static `Style`, see `UPYTL.extract_styles`.
+
+        Return `None` if the style can't be extracted (e.g. it is dynamic or the attrs aren't precompiled).
+        """
+        style = self.attrs.get('Style')
+        if style is None or 'xStyle' in self.attrs or not style.is_static or self.attrs_plan is None:
+            return None
+        attrs = {k: v for k, v in self.attrs.items() if k != 'Style'}
+        ident_class = class_name if self.ident_class is None else f'{self.ident_class} {class_name}'
+        plan = AttrsPlan.build(attrs, ident_class)
+        if plan is None:
+            return None
+        ret = copy.copy(self)
+        ret.attrs = attrs
+        ret.attrs_plan = plan
+        ret.static_event = ret._make_static_event()
+        return ret
 
     @staticmethod
-    def _compile_for(s: str) -> Tuple[str, CodeType]:
+    def _compile_for(s: str) -> Tuple[Tuple[str, ...], Callable[[dict], Iterable], FrozenSet[str]]:
         """s = 'a, b in some'"""
-        # get vars-in part
-        vars_s = s.split(' in ')[0].strip()
-        # remove parens
-        vars_s = re.sub(r'[\(\[\]\)]', '', vars_s)
-        var_names = [k.strip() for k in vars_s.split(',') if k.strip()]
-        var_names_s = ", ".join(var_names)
-        if len(var_names) > 1:
-            var_names_s = f'({var_names_s})'
-        lst_src = f'[{var_names_s} for {s}]'
-        return tuple(var_names), compile(lst_src, '<string>', 'eval')
+        return code_cache.get('for', s, _compile_for_loop)
 
     def _process_attrs(self, attrs: dict):
         attrs, for_loop, if_cond = self._parse_attrs(attrs)
@@ -152,7 +289,10 @@ class Tag:
         return attrs, for_loop, if_cond
 
     def _wrap_in_getters(self, attrs: dict):
-        for k, v in attrs.items():
+        items = [*attrs.items()]
+        attrs.clear()
+        for k, v in items:
+            k = sys.intern(k)
             if isinstance(v, (list, tuple)):
                 # [b'button', 'is_large', ('is-{size}', 'size')] =>
                 #       {'button': True, 'is-large': 'is_large', 'is-{size}': 'size'}
@@ -176,6 +316,7 @@ class Tag:
         for_loop = attrs.pop('For', None)
         if for_loop is not None:
             for_loop = self._compile_for(for_loop)
+        self.for_window = self._parse_window(attrs.pop('Window', None), attrs.pop('Limit', None), for_loop)
 
         if_cond = None
         for kword in ['If', 'Elif', 'Else']:
@@ -195,6 +336,43 @@ class Tag:
 
         return attrs, for_loop, if_cond
 
+    @staticmethod
+    def _parse_window(window: Optional[dict], limit, for_loop) -> Optional[Tuple[ValueGetter, ValueGetter]]:
+        """Window={'offset': 'page * 20', 'limit': 20}, Limit='n' overrides the window limit"""
+        window = dict(window or {})
+        if limit is not None:
+            window['limit'] = limit
+        if not window:
+            return None
+        if for_loop is None:
+            raise ValueError('`Window`/`Limit` requires `For`')
+        unexpected = set(window).difference(['offset', 'limit'])
+        if unexpected:
+            raise ValueError(f'Unexpected `Window` keys: {", ".join(sorted(unexpected))}')
+        return tuple(
+            ValueGetter(v, force_compile=isinstance(v, str))
+            for v in [window.get('offset'), window.get('limit')]
+        )
+
+    def attrs_names(self) -> Optional[FrozenSet[str]]:
+        """Return context names read by rendering the tag attrs, `None` if unknown."""
+        return union_names([v.names for v in self.attrs.values()] + [self.assign_attrs.names])
+
+    def context_names(self) -> Optional[FrozenSet[str]]:
+        """Return context names the tag itself (not its body) depends on, `None` if unknown.
+
+        `For` loop variables are not included as they are defined by the tag.
+        """
+        names = self.attrs_names()
+        if names is not None and self.for_loop is not None:
+            var_names, _, iterable_names = self.for_loop
+            names = names.difference(var_names) | iterable_names
+        if self.for_window is not None:
+            names = union_names([names, *[v.names for v in self.for_window]])
+        if self.if_cond is not None:
+            names = union_names([names, self.if_cond[1].names])
+        return names
+
     def resolve_cond(self, ctx):
         if self.if_cond is None:
             return
@@ -224,6 +402,24 @@ class Tag:
         )
         return ret
 
+    def _make_self_rendered_by_plan(self, ctx: dict) -> Union[Tuple[str, str], RenderedTag]:
+        """Return render event of the tag, see `HTMLPrinter.print`."""
+        event = self.static_event
+        if event is not None:
+            return event
+        plan = self.attrs_plan
+        return self._make_event(
+            self.tag_name if plan.tag is None else plan.tag.get(ctx),
+            plan.render(ctx)
+        )
+
+    def _make_event(self, tag, attrs_str: str) -> Union[Tuple[str, str], RenderedTag]:
+        cls = type(self)
+        if cls.is_meta_tag:
+            # meta tag is printed only in debug mode
+            return RenderedTag(cls, None, tag, attrs_str)
+        return format_tag(resolve_tag_name(cls, tag), attrs_str, cls.is_body_allowed)
+
     def _merge_attrs(self, ctx: dict, passed_attrs: AttrsDict = None, passed_defaults: AttrsDict = None):
         if passed_defaults is not None:
             attrs = passed_defaults.copy()
@@ -237,12 +433,21 @@ class Tag:
         return attrs
 
     def _render_text_body(self, u: 'UPYTL', body: str, ctx: dict):
-        code = u.compile_template(body)
+        delimiters = getattr(body, 'delimiters', None)
+        if (
+            (delimiters is u.delimiters or delimiters is not None and delimiters == u.delimiters)
+            and body.escape is self.escape_body
+        ):
+            code = body.code
+        else:
+            code = u.compile_template(body, u.delimiters, self.escape_body)
         if code is not None:
             body = eval(code, None, ctx)
         return self.format_text_body(body)
 
-    def _render_dict_body(self, u: 'UPYTL', body: dict, self_ctx: dict, ctx: dict, self_rendered: RenderedTag):
+    def _render_dict_body(
+            self, u: 'UPYTL', body: dict, self_ctx: dict, ctx: dict, self_rendered: Union[RenderedTag, tuple]
+    ):
         yield u.START_BODY
         for ch, ch_body, loop_vars in u.iter_body(body, self_ctx):
             ch_ctx = ctx if loop_vars is None else dict(ctx, **loop_vars)
@@ -256,8 +461,15 @@ class Tag:
     ):
         self_ctx = dict(u.global_ctx, **ctx)
 
-        attrs = self._merge_attrs(self_ctx, passed_attrs, passed_defaults)
-        self_rendered = self._make_self_rendered(self_ctx, attrs)
+        if self.attrs_plan is not None and u.plan_attrs and not passed_attrs and not passed_defaults:
+            styled_tags = u.styled_tags
+            if styled_tags is None:
+                self_rendered = self._make_self_rendered_by_plan(self_ctx)
+            else:
+                self_rendered = styled_tags.get(self, self)._make_self_rendered_by_plan(self_ctx)
+        else:
+            attrs = self._merge_attrs(self_ctx, passed_attrs, passed_defaults)
+            self_rendered = self._make_self_rendered(self_ctx, attrs)
 
         yield self_rendered
         if not body:
@@ -280,15 +492,18 @@ class Tag:
 
 
 class VoidTag(Tag):
+    __slots__ = ()
     is_body_allowed = False
 
 
 class MetaTag(Tag):
+    __slots__ = ()
     tag_name = None
     is_meta_tag = True
 
 
 class Template(MetaTag):
+    __slots__ = ()
 
     @classmethod
     def _render_attrs(cls, ctx: dict, attrs: AttrsDict):
@@ -307,6 +522,7 @@ class Template(MetaTag):
 
 
 class Slot(MetaTag):
+    __slots__ = ()
 
     @overload
     def __init__(
@@ -357,6 +573,7 @@ class Slot(MetaTag):
 
 
 class SlotTemplate(MetaTag):
+    __slots__ = ('Slot', 'SlotProps')
 
     Slot: ValueGetter
     SlotProps: Union[ValueGetter, None]
@@ -369,6 +586,10 @@ class SlotTemplate(MetaTag):
         self.SlotProps = attrs.pop('SlotProps', None)
         return [attrs, *extra]
 
+    def attrs_names(self) -> Optional[FrozenSet[str]]:
+        special = [v.names for v in (self.Slot, self.SlotProps) if v is not None]
+        return union_names([super().attrs_names(), *special])
+
     def render_special(self, spec_attr: str, u: 'UPYTL', ctx: dict):
         assert spec_attr in self.special_attrs
         v: Union[None, ValueGetter] = getattr(self, spec_attr)
@@ -407,6 +628,11 @@ class Component(MetaTag, metaclass=ComponentMeta):
     template_factory: Callable
     _template_processed = False
 
+    # render nested instances iteratively and memoize the template output, see `UPYTL.render_recursive`
+    recursive = False
+    # keep the output memoized by `memo_key` across renders
+    memo_shared = False
+
     # instance attrs
     props: Union[list, Dict[str, ValueGetter]]
 
@@ -430,6 +656,8 @@ class Component(MetaTag, metaclass=ComponentMeta):
         self.props_set = set()
         super().__init__(**attrs)
         self.slots = set()
+        # the component context is built of only these names, see `render`
+        self.render_names = self._make_render_names()
 
     def _parse_attrs(self, attrs: dict):
         attrs, for_loop, if_cond = super()._parse_attrs(attrs)
@@ -453,13 +681,38 @@ class Component(MetaTag, metaclass=ComponentMeta):
     def _render_attrs(cls, ctx: dict, attrs: AttrsDict):
         return attrs
 
+    def attrs_names(self) -> Optional[FrozenSet[str]]:
+        return union_names([super().attrs_names(), *[v.names for v in self.props.values()]])
+
+    def _make_render_names(self) -> Optional[FrozenSet[str]]:
+        """Return names of the outer context used to render props and attrs, `None` if unknown."""
+        cls = type(self)
+        if (
+            cls._render_attrs.__func__ is not Component._render_attrs.__func__
+            or cls._make_self_rendered.__func__ is not Tag._make_self_rendered.__func__
+        ):
+            return None
+        names = self.attrs_names()
+        if names is not None and self.for_loop is not None:
+            names = names.union(self.for_loop[0])
+        return names
+
     @catch_errors
     def render(
             self, u: 'UPYTL', ctx: dict, body: Union[dict, str, None],
             passed_attrs: AttrsDict = None, passed_defaults: AttrsDict = None
     ):
-        self_ctx = u.global_ctx.copy()
-        self_ctx.update(ctx)
+        names = self.render_names
+        if names is None:
+            self_ctx = u.global_ctx.copy()
+            self_ctx.update(ctx)
+        else:
+            # don't copy the whole context, take only the names used by props and attrs
+            global_ctx = u.global_ctx
+            self_ctx = {
+                k: ctx[k] if k in ctx else global_ctx[k]
+                for k in names if k in ctx or k in global_ctx
+            }
 
         passed_attrs, passed_defaults = [
             dct.copy() if dct is not None else AttrsDict() for dct in (passed_attrs, passed_defaults)
@@ -514,7 +767,18 @@ class Component(MetaTag, metaclass=ComponentMeta):
                 slots_content_map[st.render_special('Slot', u, st_ctx)] = (st_ctx, st, st_body)
         u.push_scope(slots_content_map)
         # component template context is defined by only component's props
-        template_context = self.get_context(props_rendered)
+        template_context = self.make_context(u, props_rendered)
+        if self.recursive:
+            # the output depends on the slots content and the passed attrs which aren't in the memo key
+            memoize = not passed_attrs and not any(it[2] for it in slots_content_map.values())
+            yield from u.render_recursive(self, template_context, passed_attrs, memoize)
+        else:
+            yield from self.render_template(u, template_context, passed_attrs)
+
+        yield u.END_BODY
+        u.pop_scope()
+
+    def render_template(self, u: 'UPYTL', template_context: dict, passed_attrs: AttrsDict):
         for ch, ch_body, loop_vars in u.iter_body(self.template, {**u.global_ctx, **template_context}):
             ch_ctx = (
                 template_context if loop_vars is None
@@ -523,9 +787,6 @@ class Component(MetaTag, metaclass=ComponentMeta):
             gen = ch.render(u, ch_ctx, ch_body, passed_attrs)
             yield from gen
 
-        yield u.END_BODY
-        u.pop_scope()
-
     def get_context(self, props_rendered: dict) -> dict:
         """Return context for own template.
 
@@ -534,10 +795,25 @@ class Component(MetaTag, metaclass=ComponentMeta):
         """
         return props_rendered
 
+    def make_context(self, u: 'UPYTL', props_rendered: dict) -> dict:
+        """Return context for own template, same as `get_context` but with access to the render session.
+
+        E.g. to make ids by `UPYTL.make_id`.
+        """
+        return self.get_context(props_rendered)
+
+    def memo_key(self, template_context: dict) -> Optional[Hashable]:
+        """Return the key of the template output of the `recursive` component, e.g. `(node['id'], node['version'])`.
+
+        `None` means the identity of the context values (scalars by value), such output is memoized
+        within a render only, the keyed output is kept across renders if `memo_shared` is `True`.
+        """
+        return None
+
 
 class _GenTag:
     def __getattr__(self, name: str) -> Type[Tag]:
-        cls = type(name, (Tag,), {'tag_name': name.replace('_', '-')})
+        cls = type(name, (Tag,), {'tag_name': name.replace('_', '-'), '__slots__': ()})
         return cls
 
 
@@ -565,24 +841,51 @@ class SlotsEnum(Enum):
 
 
 class GenericComponent(Tag):
+    """Component chosen at render time by `Is`: a component class or a registered name (see `UPYTL.register`)."""
+    __slots__ = ('component_factory', 'component_attrs', 'components')
+
+    # attrs of the tag itself, the others are passed to the component
+    own_attrs = ('Is', 'For', 'Window', 'Limit', 'If', 'Elif', 'Else')
 
     component_factory: ValueGetter
+    component_attrs: dict
+    components: Dict[Type[Tag], Tag]  # {factory: component made of `component_attrs`}
 
     def _process_attrs(self, attrs: dict):
+        self.component_attrs = {k: v for k, v in attrs.items() if k not in self.own_attrs}
+        self.components = {}
         # attrs, *extra = super()._process_attrs(attrs)
         tmp = super()._process_attrs(attrs)
         attrs, extra = tmp[0], tmp[1:]
         self.component_factory = attrs.pop('Is')
         return [attrs, *extra]
 
-    def render(self, u: 'UPYTL', ctx: dict, body: Union[dict, str, None]):
+    def attrs_names(self) -> Optional[FrozenSet[str]]:
+        return union_names([super().attrs_names(), self.component_factory.names])
+
+    def render(
+            self, u: 'UPYTL', ctx: dict, body: Union[dict, str, None],
+            passed_attrs: AttrsDict = None, passed_defaults: AttrsDict = None
+    ):
         self_ctx = {**u.global_ctx, **ctx}
         component_factory = self.component_factory.get(self_ctx)
         if isinstance(component_factory, str):
             component_factory = u.get_component_factory(component_factory)
         assert issubclass(component_factory, Tag)
-        component = component_factory(**self.attrs)
-        return component.render(u, ctx, body)
+        component = self.components.get(component_factory)
+        if component is None:
+            component = self.components.setdefault(component_factory, component_factory(**self.component_attrs))
+        return component.render(u, ctx, body, passed_attrs, passed_defaults)
+
+
+class TextBody(str):
+    """Text body of a tag with precompiled `[[ ]]` code.
+
+    `UPYTL` replaces string bodies of the template with this, so the text is parsed only once.
+    """
+    delimiters: Tuple[str, str]
+    escape: bool  # if the code escapes the text, see `Tag.escape_body`
+    code: Optional[CodeType]  # None if the text is rendered as is
 
 
 class Punc(Enum):
@@ -590,135 +893,1107 @@ class Punc(Enum):
     END = 'end'
 
 
+class _Anchor:
+    """Rendered node that can be re-rendered alone, see `UPYTL.render_tracked`.
+
+    It is a node rendered in the root context outside of slot scopes,
+    so its output depends only on the root context.
+    """
+    __slots__ = ('tag', 'body', 'indent', 'start', 'end', 'children', 'parts')
+
+    tag: Optional[Tag]  # `None` for the whole document
+    indent: str  # indent of the node output
+    parts: List[Union[str, '_Anchor']]  # output, nested anchors are kept as is
+
+    def __init__(self, tag: Optional[Tag], body, indent: str = ''):
+        self.tag = tag
+        self.body = body
+        self.indent = indent
+        self.start = self.end = 0
+        self.children = []
+
+    def split(self, html: str):
+        """Split the output of the anchor and its nested anchors into parts (start/end are offsets in html)."""
+        parts = []
+        pos = self.start
+        for ch in self.children:
+            parts.append(html[pos:ch.start])
+            ch.split(html)
+            parts.append(ch)
+            pos = ch.end
+        parts.append(html[pos:self.end])
+        self.parts = parts
+        self.children = None
+
+    def anchors(self) -> List['_Anchor']:
+        return [p for p in self.parts if p.__class__ is _Anchor]
+
+    def join(self, out: List[str]):
+        for p in self.parts:
+            if p.__class__ is str:
+                out.append(p)
+            else:
+                p.join(out)
+
+    def html(self) -> str:
+        out = []
+        self.join(out)
+        return ''.join(out)
+
+
+_ANCHOR_END = object()
+
+
+class _TrackedTag:
+    """Proxy of the tag yielded by `_TrackingUPYTL.iter_body`, marks the tag output as an anchor if possible."""
+    __slots__ = ('tag',)
+
+    def __init__(self, tag: Tag):
+        self.tag = tag
+
+    def __getattr__(self, name: str):
+        return getattr(self.tag, name)
+
+    def render(self, u: '_TrackingUPYTL', ctx: dict, body, *args, **kw):
+        if ctx is not u.root_ctx or any(args) or any(kw.values()) or u.scope:
+            yield from self.tag.render(u, ctx, body, *args, **kw)
+            return
+        yield _Anchor(self.tag, body)
+        yield from self.tag.render(u, ctx, body)
+        yield _ANCHOR_END
+
+
+class RenderResult:
+    """Result of `UPYTL.render_tracked` to be passed to `UPYTL.rerender`."""
+    __slots__ = ('template', 'ctx', 'options', 'root', 'fragments', '_html', '_dependencies')
+
+    template: dict
+    ctx: dict
+    options: dict  # render options: indent, debug, doctype
+    root: _Anchor
+    fragments: List[Tuple[Union[str, Tuple[int, ...]], str]]  # see `UPYTL.rerender`
+
+    def __init__(self, template: dict, ctx: dict, options: dict, root: _Anchor, dependencies: dict = None):
+        self.template = template
+        self.ctx = ctx
+        self.options = options
+        self.root = root
+        self.fragments = []
+        self._html = None
+        self._dependencies = dependencies
+
+    @property
+    def html(self) -> str:
+        if self._html is None:
+            self._html = self.root.html()
+        return self._html
+
+    def __str__(self):
+        return self.html
+
+
 class UPYTL:
     START_BODY = Punc.START
     END_BODY = Punc.END
 
-    compiled_templates_cache = {}
+    DEFAULT_DELIMITERS = ('[[', ']]')
+
+    # {name: component class or 'package.module:ClassName' to be imported on the first lookup}, see `register`
+    registered_components: Dict[str, Union[Type[Tag], str]]
+
+    # tags to be skipped by `iter_body`, their conditions are still resolved to keep If-blocks
+    skip_tags: Optional[set] = None
 
-    registered_components: Dict[str, Tag]
+    FRAGMENT_PATHS_CACHE_SIZE = 128
+    BODY_PLANS_CACHE_SIZE = 4096
+    STYLED_TEMPLATES_CACHE_SIZE = 1024  # templates prepared by `extract_styles`
+    MEMO_CACHE_SIZE = 1024  # memoized output of `Component.memo_shared` components
 
-    def __init__(self, *, global_ctx: dict = None, default_ctx: dict = None):
-        self._local = threading.local()
+    # if the output of recursive components is memoized, the walkers are off as they need every node,
+    # so are the events filters as they may change the events
+    memo_subtrees = True
+
+    max_output: Optional[int] = None  # see `render` limits
+
+    # {tag: its copy with `Style` extracted to a class} (weak keys), `None` if the extraction is off,
+    # see `extract_styles`
+    styled_tags: Optional['weakref.WeakKeyDictionary[Tag, Tag]'] = None
+
+    # if the tags are rendered by the precompiled attrs, otherwise the events have attrs dicts (see `events`)
+    plan_attrs = True
+
+    # the state of a render, it is set on the render session only (see `_session`)
+    scope: List[Dict[str, Tuple[dict, Tag, Dict[Tag, dict]]]]  # slots content stack
+    deferred: Optional[list] = None  # deferred content jobs, `None` if deferring isn't supported by the render
+    render_cache: dict  # cache of the render, e.g. `make_id` counters, keys are `(owner, key)`
+    render_effects = 0  # number of the render state changes by `make_id`/`defer`, see `_walk_recursive`
+    render_memo: dict  # memoized output of recursive components of the render, see `render_recursive`
+    recursive_walk: Optional[list] = None  # the frames of the walk of recursive components, see `render_recursive`
+    render_stylesheet = ''  # CSS of the extracted styles of the rendered template, see `stylesheet`
+
+    def __init__(
+            self, *, global_ctx: dict = None, default_ctx: dict = None, delimiters: Tuple[str, str] = None,
+            extract_styles: bool = False
+    ):
         self.global_ctx = global_ctx or {}
         self.default_ctx = default_ctx or {}
         self.registered_components = {}
+        self.delimiters = self.DEFAULT_DELIMITERS if delimiters is None else tuple(delimiters)
+        self._fragment_paths = {}  # {(id(template), target): (template, off-path nodes)}
+        self._fragment_paths_lock = threading.Lock()
+        self._body_plans = {}  # {id(body): (body, keys, values, children plan)}, see `_body_plan`
+        self._body_plans_lock = threading.Lock()
+        self._memo = {}  # {key: (None, events)}, see `render_recursive`
+        self._memo_lock = threading.Lock()
+        if extract_styles:
+            self.styled_tags = weakref.WeakKeyDictionary()
+            # {tag: (class name, css declarations)} of the extracted styles (weak keys)
+            self._style_rules: 'weakref.WeakKeyDictionary[Tag, Tuple[str, str]]' = weakref.WeakKeyDictionary()
+            self._styled_templates = {}  # {id(template): (template, its stylesheet)} of the last prepared templates
+            self._styles_lock = threading.Lock()
+
+    def _session(self, limits: dict = None) -> 'UPYTL':
+        """Return a shallow copy of the instance to hold the state of a render.
+
+        The instance itself isn't changed by renders, so it can be shared by threads,
+        asyncio tasks and interleaved streams.
+        """
+        if limits is not None:
+            return _LimitedUPYTL(self, **limits)
+        session = object.__new__(type(self))
+        session.__dict__.update(self.__dict__)
+        return session
 
-    @property
-    def scope(self) -> list:
-        return self._local.scope
+    def make_id(self, key: str, prefix: str = '_') -> str:
+        """Return html id derived from the key (e.g. serialized data), so the same input gives the same html.
 
-    @scope.setter
-    def scope(self, scope: list):
-        self._local.scope = scope
+        Repeated keys of the render get `-2`, `-3`, ... suffixes to keep the ids unique.
+        """
+        digest = hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+        cache = self.render_cache
+        cache_key = ('make_id', digest)
+        n = cache[cache_key] = cache.get(cache_key, 0) + 1
+        self.render_effects += 1
+        return f'{prefix}{digest}' if n == 1 else f'{prefix}{digest}-{n}'
+
+    def defer(self, job) -> bool:
+        """Defer rendering of the job to the end of the stream, see `upytl.deferred`.
+
+        Return `False` if deferring isn't supported by the current render, so the job should be rendered in place.
+        """
+        jobs = self.deferred
+        if jobs is None:
+            return False
+        jobs.append(job)
+        self.render_effects += 1
+        return True
+
+    def register(self, name: str, component: Union[Type[Tag], str]):
+        """Register the component by name (e.g. for `Is` of `GenericComponent`).
+
+        The component is a class or its import path `'package.module:ClassName'`,
+        the path is imported on the first lookup only, see `get_component_factory`.
+        """
+        if isinstance(component, str) and ':' not in component:
+            raise ValueError(f"Expected 'package.module:ClassName', got: {component!r}")
+        self.registered_components[name] = component
+
+    def register_entry_points(self, group: str):
+        """Register the components of the entry points group (name = 'package.module:ClassName') lazily."""
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:  # Python 3.7
+            from importlib_metadata import entry_points
+        eps = entry_points()
+        eps = eps.select(group=group) if hasattr(eps, 'select') else eps.get(group, ())
+        for ep in eps:
+            self.register(ep.name, ep.value)
+
+    def register_package(self, package: str):
+        """Register the public components of the package (including subpackages) by their class names lazily.
+
+        The modules sources are scanned for top-level `class Name(Base...)` definitions, the modules aren't imported,
+        so the components are recognized by the base names: `Component`, a component class of the package
+        or an imported `Component` subclass. Raise `ValueError` if the name is taken by another component.
+        """
+        classes = {}  # {name: [(path, base names)]}
+        self._scan_package(package, classes)
+        components = {'Component'}
+        stack = [Component]
+        while stack:
+            for cls in stack.pop().__subclasses__():
+                components.add(cls.__name__)
+                stack.append(cls)
+        found = True
+        while found:
+            found = False
+            for name, defs in classes.items():
+                if name not in components and any(components.intersection(bases) for _, bases in defs):
+                    components.add(name)
+                    found = True
+        registrations = {}
+        for name, defs in classes.items():
+            paths = [path for path, bases in defs if components.intersection(bases)]
+            if len(paths) > 1:
+                raise ValueError(f'Component name {name!r} is ambiguous: {", ".join(paths)}')
+            if not paths:
+                continue
+            registered = self.registered_components.get(name)
+            if registered is not None:
+                if registered.__class__ is not str:
+                    registered = f'{registered.__module__}:{registered.__qualname__}'
+                if registered != paths[0]:
+                    raise ValueError(f'Component name {name!r} is already registered: {registered}')
+            registrations[name] = paths[0]
+        for name, path in registrations.items():
+            self.register(name, path)
+
+    def _scan_package(self, package: str, classes: Dict[str, list]):
+        spec = importlib.util.find_spec(package)
+        if spec is None:
+            raise ModuleNotFoundError(f'No module named {package!r}')
+        self._scan_module(package, spec.origin, classes)
+        for path in spec.submodule_search_locations or ():
+            for entry in sorted(os.listdir(path)):
+                full_path = os.path.join(path, entry)
+                if entry.endswith('.py') and entry != '__init__.py':
+                    self._scan_module(f'{package}.{entry[:-3]}', full_path, classes)
+                elif os.path.isfile(os.path.join(full_path, '__init__.py')):
+                    self._scan_package(f'{package}.{entry}', classes)
+
+    @staticmethod
+    def _scan_module(module: str, path: Optional[str], classes: Dict[str, list]):
+        if not path or not path.endswith('.py'):
+            return
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+        for name, bases in _CLASS_DEF_RE.findall(source):
+            # `pkg.Base`, `Base[T]`, `metaclass=M` -> `Base`
+            bases = {
+                base.split('[')[0].strip().rpartition('.')[2]
+                for base in bases.split(',') if '=' not in base
+            }
+            classes.setdefault(name, []).append((f'{module}:{name}', bases))
 
     def get_component_factory(self, name: str) -> Type[Tag]:
-        return self.registered_components[name]
+        component = self.registered_components[name]
+        if component.__class__ is str:
+            module, _, qualname = component.partition(':')
+            component = importlib.import_module(module)
+            for attr in qualname.split('.'):
+                component = getattr(component, attr)
+            # the dict is shared by the render sessions, so it is imported once
+            self.registered_components[name] = component
+        return component
 
     @classmethod
-    def compile_template(cls, body: str, delimiters: List[str] = None):
+    def compile_template(cls, body: str, delimiters: List[str] = None, escape: bool = False):
+        """Return code of the text body, `None` if the text is rendered as is.
+
+        With `escape` the static text is escaped at once, the `[[ ]]` values are escaped by the code.
+        The code is shared via `code_cache`.
+        """
         if delimiters is None:
-            delimiters = ['[[', ']]']
-
-        cache_key = (tuple(delimiters), body)
-        ret = cls.compiled_templates_cache.get(cache_key)
-        if ret is not None:
-            return ret
-
-        dleft, dright = delimiters
-        dleft, dright = [re.escape(d) for d in [dleft, dright]]
-        split_re = re.compile(f'({dleft}.*?{dright})')
-        body_split = split_re.split(body)
-        if len(body_split) == 1:
-            # no code
-            cls.compiled_templates_cache[cache_key] = None
+            delimiters = cls.DEFAULT_DELIMITERS
+        start, end = delimiters
+
+        def compile_body(src: str):
+            fstr = _text_body_source(src, delimiters, escape)
+            # None if there is no code
+            return None if fstr is None else compile(fstr, '<string>', 'eval')
+
+        return code_cache.get(f'text{escape:d}:{start!r}{end!r}', str(body), compile_body)
+
+    def text_names(self, body: str) -> FrozenSet[str]:
+        """Return context names `[[ ]]` code of the text body reads."""
+        delimiters = getattr(body, 'delimiters', self.delimiters)
+        fstr = _text_body_source(body, delimiters)
+        return frozenset() if fstr is None else expr_names(fstr)
+
+    def make_text_body(self, body: str, escape: bool = False) -> TextBody:
+        ret = TextBody(body)
+        ret.delimiters = self.delimiters
+        ret.escape = escape
+        ret.code = self.compile_template(body, self.delimiters, escape)
+        return ret
+
+    def prepare(self, template: dict) -> dict:
+        """Precompile text bodies of the template including templates of used components.
+
+        Normally it is done on the fly during the first render.
+        If/Elif/Else chains are validated here (see `iter_body`).
+        Static styles are extracted here if `extract_styles` is on.
+        """
+        prepared = set()
+        extract_styles = self.styled_tags is not None
+        rules = {}  # {class name: css} of the template
+
+        def walk(body: dict):
+            if all(isinstance(tag, Tag) for tag in body):
+                self._body_plan(body)
+            for tag, tag_body in body.items():
+                if extract_styles and isinstance(tag, Tag):
+                    rule = self._extract_style(tag)
+                    if rule is not None:
+                        rules[rule[0]] = rule[1]
+                if isinstance(tag, Component):
+                    component_template = type(tag).template
+                    if id(component_template) not in prepared:
+                        prepared.add(id(component_template))
+                        walk(component_template)
+                if tag_body.__class__ is str and isinstance(tag, Tag):
+                    body[tag] = self.make_text_body(tag_body, tag.escape_body)
+                elif isinstance(tag_body, dict):
+                    walk(tag_body)
+
+        walk(template)
+        if extract_styles:
+            stylesheet = ''.join([f'.{name}{{{css}}}' for name, css in sorted(rules.items())])
+            cache = self._styled_templates
+            with self._styles_lock:
+                cache[id(template)] = (template, stylesheet)
+                while len(cache) > self.STYLED_TEMPLATES_CACHE_SIZE:
+                    del cache[next(iter(cache))]
+        return template
+
+    def _extract_style(self, tag: Tag) -> Optional[Tuple[str, str]]:
+        """Return `(class name, css)` of the extracted static style of the tag, `None` if there is none."""
+        styled_tags = self.styled_tags
+        if tag in styled_tags:
+            return self._style_rules[tag]
+        if tag.is_meta_tag:
+            return None
+        style = tag.attrs.get('Style')
+        if style is None or not style.is_static:
+            return None
+        if isinstance(style, ValueGetter):
+            style = style.get(None)
+        css = AttrsDict.merge_extendable('Style', style, None, {})
+        if not css:
+            return None
+        class_name = f's-{hashlib.blake2b(css.encode(), digest_size=4).hexdigest()}'
+        styled = tag.with_extracted_style(class_name)
+        if styled is None:
             return None
+        with self._styles_lock:
+            rule = self._style_rules[tag] = (class_name, css)
+            styled_tags[tag] = styled
+        return rule
+
+    def extract_styles(self, template: dict) -> str:
+        """Replace static `Style` attrs of the template tags with generated classes (once per template).
+
+        Return CSS of the classes of the template (including the templates of the used components).
+        The mode is enabled by `UPYTL(extract_styles=True)`, the templates are processed
+        by `prepare`/`warmup` or on the first render. The CSS of the rendered template is returned by `stylesheet`
+        and rendered by `html.ExtractedStyles` (e.g. in the page head).
+        NOTE: the extracted style has the class specificity, not the inline one.
+        """
+        if self.styled_tags is None:
+            return ''
+        cached = self._styled_templates.get(id(template))
+        if cached is None:
+            self.prepare(template)
+            cached = self._styled_templates[id(template)]
+        return cached[1]
+
+    def stylesheet(self, template: dict = None) -> str:
+        """Return CSS of the classes extracted from static `Style` attrs of the template, see `extract_styles`.
+
+        The template is the one being rendered by default, nothing is returned in the events mode
+        (see `events`) as the styles aren't extracted there.
+        """
+        if template is None:
+            return self.render_stylesheet
+        return self.extract_styles(template)
+
+    def warmup(
+            self, templates: Iterable[dict] = (), components: Iterable[Type['Component']] = (), *, freeze=False
+    ) -> 'UPYTL':
+        """Precompile the templates and the templates of the components including registered ones.
+
+        Intended to be called in a pre-fork server master process, so the workers share
+        the compiled state copy-on-write instead of compiling it on the first render.
+        Expressions of the tags attributes are compiled at the tags creation,
+        so there are only text bodies left to be compiled.
+        If `freeze` is set, `gc.freeze()` is called, so the garbage collector of the workers
+        doesn't touch (and copy) the memory of the objects created so far.
+        The lazily registered components are imported (see `register`).
+        """
+        for template in templates:
+            self.prepare(template)
+        registered = [self.get_component_factory(name) for name in [*self.registered_components]]
+        for component in [*components, *registered]:
+            template = getattr(component, 'template', None)
+            if isinstance(template, dict):
+                self.prepare(template)
+        if freeze:
+            import gc
+            gc.collect()
+            gc.freeze()
+        return self
+
+    def dependencies(self, template: dict) -> Dict[Tag, Optional[FrozenSet[str]]]:
+        """Return {node: context names the node and its body depend on} for each node of the template.
+
+        The names are `None` if they can't be determined, e.g. a custom callable is used as attribute value.
+        Nodes of the templates of used components are included too, their names refer to
+        the component context (props and `global_ctx`), while a component node itself depends
+        on the names read by its props/attrs and slots content.
+        `Elif`/`Else` nodes also depend on the conditions of the preceding nodes of the If-block.
+        """
+        ret: Dict[Tag, Optional[FrozenSet[str]]] = {}
+        analyzed = set()
+
+        def body_names(body) -> Optional[FrozenSet[str]]:
+            if isinstance(body, str):
+                return self.text_names(body)
+            if not isinstance(body, dict):
+                return frozenset()
+            names = []
+            if_block_names = frozenset()
+            for tag, tag_body in body.items():
+                tag_names = node_names(tag, tag_body)
+                kword, cond = tag.if_cond or (None, None)
+                if kword == 'If':
+                    if_block_names = cond.names
+                elif kword is not None:
+                    tag_names = union_names([tag_names, if_block_names])
+                    if_block_names = union_names([if_block_names, cond.names])
+                ret[tag] = tag_names
+                names.append(tag_names)
+            return union_names(names)
+
+        def node_names(tag: Tag, body) -> Optional[FrozenSet[str]]:
+            if isinstance(tag, Template) and 'Is' in tag.attrs and isinstance(body, dict):
+                # {'text': {...}, 'select': {...}}
+                inner = union_names([body_names(it) for it in body.values()])
+            else:
+                inner = body_names(body)
 
-        iter_body = iter(body_split)
-        fstr = []
-        while True:
-            s = next(iter_body, None)
-            if s:
-                s = s.replace('{', '{{').replace('}', '}}')
-                fstr.append(s)
-            code = next(iter_body, None)
-            if code is None:
-                break
-            # remove delimiters [2:-2]
-            fstr.append(f'{{ {code[2:-2]} }}')
-        fstr = ''.join(fstr)
-        fstr = f"f'''{fstr}'''"
-        ret = compile(fstr, '<string>', 'eval')
-        cls.compiled_templates_cache[cache_key] = ret
+            if inner is not None:
+                if isinstance(tag, SlotTemplate) and tag.SlotProps is not None and tag.SlotProps.is_static:
+                    inner = inner.difference([tag.SlotProps.get(None)])
+                if tag.for_loop is not None:
+                    inner = inner.difference(tag.for_loop[0])
+
+            if isinstance(tag, Component):
+                component_template = type(tag).template
+                if id(component_template) not in analyzed:
+                    analyzed.add(id(component_template))
+                    body_names(component_template)
+            return union_names([tag.context_names(), inner])
+
+        body_names(template)
         return ret
 
-    @classmethod
-    def iter_body(cls, body: Dict[Tag, dict], ctx: dict) -> Iterable[Tuple[Tag, dict, dict]]:
-        in_if_block = False
-        skip_rest = None
+    def iter_body(self, body: Dict[Tag, dict], ctx: dict) -> Iterable[Tuple[Tag, dict, dict]]:
+        cached = self._body_plans.get(id(body))
+        if (
+            cached is not None and len(cached[1]) == len(body)
+            and cached[1] == tuple(body) and cached[2] == tuple(body.values())
+        ):
+            entries = cached[3]
+        else:
+            entries = self._body_plan(body)
+        skip_tags = self.skip_tags
+        for tag, tag_body, chain in entries:
+            if chain is not None:
+                # the first node of If/Elif/Else chain with true condition
+                for tag, tag_body, get_cond in chain:
+                    if get_cond is None or get_cond(ctx):
+                        break
+                else:
+                    continue
+            if skip_tags is not None and tag in skip_tags:
+                continue
+            if tag.for_loop is not None:
+                for loop_vars in self._iter_for_loop(tag, ctx):
+                    yield (tag, tag_body, loop_vars)
+            else:
+                yield (tag, tag_body, None)
+
+    def _body_plan(self, body: Dict[Tag, dict]) -> Tuple[tuple, ...]:
+        """Return the children of the body as `(tag, tag_body, chain)`, validate If/Elif/Else chains.
+
+        `chain` is `None` for unconditional child, otherwise `(tag, tag_body, condition getter)`
+        of If/Elif/Else nodes (the getter is `None` for Else) and the tag/body of the entry are `None`.
+        The plans are cached by the body (except trivial ones), the cached plan is used while the body
+        has the same keys and values (see `iter_body`).
+        """
+        entries = []
+        chain = None
         for tag, tag_body in body.items():
-            collect = False
-            cond = tag.resolve_cond(ctx)
-            if cond is None:
-                collect = True
-                in_if_block = False
+            if tag_body.__class__ is str:
+                # parse text body once, see `_render_text_body`
+                tag_body = body[tag] = self.make_text_body(tag_body, tag.escape_body)
+            if tag.if_cond is None:
+                chain = None
+                entries.append((tag, tag_body, None))
+                continue
+            kword, cond = tag.if_cond
+            if kword == 'If':
+                chain = [(tag, tag_body, cond.get)]
+                entries.append((None, None, chain))
+            elif chain is None:
+                raise RuntimeError(f'{kword} out of If-block')
+            elif kword == 'Elif':
+                chain.append((tag, tag_body, cond.get))
             else:
-                kw, v = cond
-                if kw == 'If':
-                    in_if_block = True
-                    if v:
-                        collect = True
-                        skip_rest = True
-                    else:
-                        skip_rest = False
-                elif kw == 'Elif':
-                    if not in_if_block:
-                        raise RuntimeError('Elif out of If-block')
-                    if not skip_rest and v:
-                        collect = True
-                        skip_rest = True
-                elif kw == 'Else':
-                    if not in_if_block:
-                        raise RuntimeError('Else out of If-block')
-                    if not skip_rest:
-                        collect = True
-            if collect:
-                if tag.for_loop is not None:
-                    for loop_vars in cls._iter_for_loop(tag.for_loop, ctx):
-                        yield (tag, tag_body, loop_vars)
-                else:
-                    yield (tag, tag_body, None)
+                chain.append((tag, tag_body, None))
+                chain = None
+        ret = tuple([(tag, tag_body, chain and tuple(chain)) for tag, tag_body, chain in entries])
+        if len(body) > 1:
+            # skip trivial bodies as they may be made per render, e.g. slots content of a component
+            cache = self._body_plans
+            with self._body_plans_lock:
+                cache[id(body)] = (body, tuple(body), tuple(body.values()), ret)
+                while len(cache) > self.BODY_PLANS_CACHE_SIZE:
+                    del cache[next(iter(cache))]
+        return ret
 
-    @classmethod
-    def _iter_for_loop(cls, for_loop: Tuple, ctx) -> dict:
-        var_names, code_obj = for_loop
-        lst = eval(code_obj, None, ctx)
+    def _iter_for_loop(self, tag: Tag, ctx, window: Optional[Tuple[ValueGetter, ValueGetter]] = None) -> Iterator[dict]:
+        """Yield loop variables of the tag `For` loop, `window` overrides the tag `Window`."""
+        var_names, iterable_factory, _ = tag.for_loop
+        lst = iterable_factory(ctx)
+        if window is None:
+            window = tag.for_window
+        if window is not None:
+            lst = islice_window(lst, *[None if v is None else v.get(ctx) for v in window])
         for var_values in lst:
             if not isinstance(var_values, tuple):
                 var_values = [var_values]
             yield dict(zip(var_names, var_values))
 
+    def render_tracked(self, template: Dict[Tag, dict], ctx, *, indent=2, debug=False, doctype='html') -> RenderResult:
+        """Render the template as `render` does, but keep the output split by nodes for `rerender`."""
+        ctx = {**self.default_ctx, **ctx}
+        options = dict(indent=indent, debug=debug, doctype=doctype)
+        root = self._render_anchor(None, template, ctx, options, stylesheet=self.extract_styles(template))
+        result = RenderResult(template, ctx, options, root)
+        result.fragments.append(((), result.html))
+        return result
+
+    def rerender(self, previous: RenderResult, changed: dict) -> RenderResult:
+        """Re-render only the nodes which depend on the changed context keys.
+
+        `changed` is a dict of the new context values, the other values are taken from `previous`.
+        Return new result, its `fragments` is a list of `(id | path, html)` of the re-rendered nodes,
+        where `id` is the `id` attribute of the node and `path` is a tuple of the node indexes
+        among the re-renderable nodes (`()` means the whole document).
+        """
+        ctx = {**previous.ctx, **changed}
+        changed = frozenset(changed)
+        deps = previous._dependencies
+        if deps is None:
+            deps = previous._dependencies = self.dependencies(previous.template)
+
+        def is_affected(names: Optional[FrozenSet[str]]) -> bool:
+            return names is None or not changed.isdisjoint(names)
+
+        fragments = []
+
+        def visit(anchor: _Anchor, path: Tuple[int, ...]) -> _Anchor:
+            children = _anchor_children(anchor, deps)
+            if self._is_anchor_affected(anchor, children, deps, is_affected):
+                new = self._render_anchor(
+                    anchor.tag, anchor.body, ctx, previous.options, anchor.indent,
+                    stylesheet=self.extract_styles(previous.template)
+                )
+                fragments.append((self._anchor_key(new, ctx, path), new.html()))
+                return new
+
+            replaced = {}
+            for i, ch in enumerate(children):
+                if is_affected(deps.get(ch.tag)):
+                    new_ch = visit(ch, (*path, i))
+                    if new_ch is not ch:
+                        replaced[ch] = new_ch
+            if not replaced:
+                return anchor
+            new = _Anchor(anchor.tag, anchor.body, anchor.indent)
+            new.parts = [_replace_anchor(p, replaced, deps) for p in anchor.parts]
+            return new
+
+        root = visit(previous.root, ())
+        result = RenderResult(previous.template, ctx, previous.options, root, deps)
+        result.fragments = fragments
+        return result
+
+    def _is_anchor_affected(self, anchor: _Anchor, children: List[_Anchor], deps: dict, is_affected) -> bool:
+        """Return `True` if the anchor can't be patched by re-rendering of its nested anchors."""
+        tag, body = anchor.tag, anchor.body
+        if tag is not None:
+            if is_affected(tag.attrs_names()):
+                return True
+            if isinstance(body, str):
+                return is_affected(self.text_names(body))
+
+        if not isinstance(body, dict):
+            return False
+        rendered = {ch.tag for ch in children}
+        if isinstance(tag, Template) and 'Is' in tag.attrs:
+            # `Is` isn't changed, so only the rendered branch matters
+            branches = [it for it in body.values() if isinstance(it, dict)]
+            nodes = next(
+                (it for it in branches if not rendered.isdisjoint(it)),
+                [ch for it in branches for ch in it]
+            )
+        else:
+            nodes = [*body]
+
+        if_block_names = frozenset()
+        for node in nodes:
+            if node not in rendered:
+                if is_affected(deps.get(node)):
+                    return True
+                continue
+            # the node is rendered, but it may disappear if its condition changes
+            kword, cond = node.if_cond or (None, None)
+            if kword == 'If':
+                if_block_names = cond.names
+            elif kword is not None:
+                if_block_names = union_names([if_block_names, cond.names])
+            if kword is not None and is_affected(if_block_names):
+                return True
+        return False
+
+    def _anchor_key(self, anchor: _Anchor, ctx: dict, path: Tuple[int, ...]) -> Union[str, Tuple[int, ...]]:
+        tag_id = anchor.tag.attrs.get('id') if anchor.tag is not None else None
+        if isinstance(tag_id, ValueGetter):
+            return tag_id.get({**self.global_ctx, **ctx})
+        return path
+
+    def _render_anchor(
+            self, tag: Optional[Tag], body, ctx: dict, options: dict, indent: str = '', stylesheet: str = ''
+    ) -> _Anchor:
+        """Render the anchor (the whole document if `tag` is `None`) tracking nested anchors."""
+        if tag is None:
+            out = HTMLPrinter(**options)
+            tag = Template()
+            anchor = _Anchor(None, body)
+        else:
+            out = HTMLPrinter(**{**options, 'doctype': None})
+            out.cur_indent = indent
+            anchor = _Anchor(tag, body, indent)
+        tracker = _TrackingUPYTL(self, ctx)
+        tracker.scope = []
+        tracker.deferred = None
+        tracker.render_cache = {}
+        tracker.render_stylesheet = stylesheet
+        stack = [anchor]
+        try:
+            for it in tag.render(tracker, ctx, body):
+                if it is self.START_BODY:
+                    out.start_body()
+                elif it is self.END_BODY:
+                    out.end_body()
+                elif it.__class__ is _Anchor:
+                    out.close_pending()
+                    it.indent = out.cur_indent
+                    it.start = out.buf.tell()
+                    stack[-1].children.append(it)
+                    stack.append(it)
+                elif it is _ANCHOR_END:
+                    out.close_pending()
+                    stack.pop().end = out.buf.tell()
+                else:
+                    out.print(it)
+        except RenderError as exc:
+            exc.set_html_dump(out.buf.getvalue())
+            raise
+        out.close_pending()
+        html = out.buf.getvalue()
+        anchor.end = len(html)
+        anchor.split(html)
+        return anchor
+
+    def render_fragment(
+            self, template: Dict[Tag, dict], ctx, target: Union[str, Type[Tag], Tuple[str, Any]], *,
+            indent=2, debug=False
+    ) -> str:
+        """Render only the first node matching the target.
+
+        The target is one of:
+            - `id` attribute value of the node
+            - tag class, e.g. a component class
+            - marker attribute `(name, value)`, e.g. `('data-fragment', 'menu')`
+
+        Only the nodes on the path to the target are rendered (without output),
+        so `For`/`If` and slots contexts of the target are resolved as in the whole template,
+        the nodes which can't contain the target are skipped.
+        The path analysis is cached per template and target.
+        """
+        return self._render_target(template, ctx, _FragmentTarget(target), indent=indent, debug=debug)
+
+    def render_rows(
+            self, template: Dict[Tag, dict], ctx, target: Union[str, Type[Tag], Tuple[str, Any]], *,
+            offset: Optional[int] = None, limit: Optional[int] = None, indent=2, debug=False
+    ) -> str:
+        """Render only the `For` loop iterations of the first node matching the target.
+
+        The target is the same as of `render_fragment`, `offset`/`limit` (if passed)
+        override the ones of the node `Window`, e.g. to render the next page for infinite scroll:
+
+            u.render_rows(template, ctx, ('data-rows', 'items'), offset=page * 20, limit=20)
+
+        An empty string is returned if the window is empty.
+        """
+        window = None
+        if offset is not None or limit is not None:
+            window = tuple([None if v is None else ValueGetter(v) for v in (offset, limit)])
+        return self._render_target(
+            template, ctx, _FragmentTarget(target), rows_window=window, indent=indent, debug=debug
+        )
+
+    def _render_target(
+            self, template: Dict[Tag, dict], ctx, target: '_FragmentTarget', *,
+            rows_window=False, indent=2, debug=False
+    ) -> str:
+        """Render the first node matching the target or all its loop iterations if `rows_window` is not `False`."""
+        rows = rows_window is not False
+        stylesheet = self.extract_styles(template)
+        if self.default_ctx:
+            ctx = {**self.default_ctx, **ctx}
+        out = HTMLPrinter(indent, debug, doctype=None)
+        walker = _FragmentUPYTL(self, target, self._fragment_off_path(template, target), rows_window)
+        walker.scope = []
+        walker.deferred = None
+        walker.render_cache = {}
+        walker.render_stylesheet = stylesheet
+        depth = 0
+        matched = None
+        events = Template().render(walker, ctx, template)
+        try:
+            for it in events:
+                if it.__class__ is _FragmentTag:
+                    if not depth:
+                        if matched is not None and it.tag is not matched:
+                            break
+                        matched = it.tag
+                    depth += 1
+                elif it is _FRAGMENT_END:
+                    depth -= 1
+                    if not depth and not rows:
+                        break
+                elif not depth:
+                    if matched is not None or walker.rows_found:
+                        # the last iteration is rendered or the loop is empty
+                        break
+                elif it is self.START_BODY:
+                    out.start_body()
+                elif it is self.END_BODY:
+                    out.end_body()
+                else:
+                    out.print(it)
+        except RenderError as exc:
+            exc.set_html_dump(out.buf.getvalue())
+            raise
+        finally:
+            events.close()
+        if matched is None and not walker.rows_found:
+            raise LookupError(f'Fragment target is not found: {target}')
+        return out.buf.getvalue()
+
+    def _fragment_off_path(self, template: dict, target: '_FragmentTarget') -> set:
+        cache = self._fragment_paths
+        key = (id(template), target.target)
+        try:
+            # the template is kept in the cache, so its id isn't reused
+            return cache[key][1]
+        except KeyError:
+            pass
+        off_path = _off_path_nodes(template, target)
+        with self._fragment_paths_lock:
+            cache[key] = (template, off_path)
+            while len(cache) > self.FRAGMENT_PATHS_CACHE_SIZE:
+                del cache[next(iter(cache))]
+        return off_path
+
     def push_scope(self, it):
         self.scope.append(it)
 
     def pop_scope(self) -> Dict[str, Tuple[dict, Tag, Dict[Tag, dict]]]:
         return self.scope.pop()
 
-    def render(self, template: Dict[Tag, dict], ctx, *, indent=2, debug=False, doctype='html'):
-        out = HTMLPrinter(indent, debug, doctype)
+    def render_recursive(self, component: Component, ctx: dict, passed_attrs: AttrsDict, memoize: bool) -> Iterator:
+        """Render the template of the `recursive` component.
+
+        The outermost recursive component walks the nested ones iteratively (they yield `_Descend`),
+        so the depth of the data isn't limited by the recursion limit.
+        If `memoize` is `True` the output is memoized by `Component.memo_key`,
+        unless the subtree changes the render state (e.g. by `make_id`), so the replay would differ.
+        """
+        memo = None
+        if memoize and self.memo_subtrees:
+            key = component.memo_key(ctx)
+            if key is None:
+                values = tuple(ctx.values())
+                tokens = tuple([v if v.__class__ in _MEMO_BY_VALUE else id(v) for v in values])
+                # the values are kept with the output, so their ids aren't reused
+                memo = (False, ('memo', (type(component), tuple(ctx), tokens)), values)
+            else:
+                memo = (component.memo_shared, ('memo', type(component), key), None)
+            shared, key, _ = memo
+            hit = (self._memo if shared else self.render_memo).get(key)
+            if hit is not None:
+                if self.recursive_walk is None:
+                    yield from _replay_events(hit[1])
+                else:
+                    yield _Descend(None, hit[1])
+                return
+        events = component.render_template(self, ctx, passed_attrs)
+        if self.recursive_walk is None:
+            yield from self._walk_recursive(memo, events)
+        else:
+            yield _Descend(memo, events)
+
+    def _walk_recursive(self, memo: Optional[tuple], events: Iterator) -> Iterator:
+        collect = self.memo_subtrees
+        # frames: [memo, events, collected output (nested lists are the output of nested frames),
+        # the render state marker at the start (see `_render_state`)]
+        self.recursive_walk = stack = [(memo, events, [] if collect else None, memo and self._render_state())]
+        exc = None
         try:
-            self._render(template, ctx, out)
+            while stack:
+                memo, events, collected, state = stack[-1]
+                try:
+                    if exc is None:
+                        it = next(events)
+                    else:
+                        # raise in the parent where the nested component is rendered
+                        it, exc = events.throw(exc), None
+                except StopIteration:
+                    stack.pop()
+                    if memo is not None and state == self._render_state():
+                        self._memo_store(memo, collected)
+                    if stack and collect:
+                        stack[-1][2].append(collected)
+                    continue
+                except Exception as e:
+                    stack.pop()
+                    if not stack:
+                        raise
+                    exc = e
+                    continue
+                if it.__class__ is _Descend:
+                    if it.events.__class__ is list:
+                        if collect:
+                            collected.append(it.events)
+                        yield from _replay_events(it.events)
+                    else:
+                        memo = it.memo
+                        stack.append((memo, it.events, [] if collect else None, memo and self._render_state()))
+                    continue
+                if collect:
+                    collected.append(it)
+                yield it
+        finally:
+            self.recursive_walk = None
+            for _, events, _, _ in reversed(stack):
+                events.close()
+
+    def _render_state(self) -> Tuple[int, int]:
+        """Return the marker of the render state, the output of the subtree changing it isn't memoized.
+
+        E.g. the replay of the output would repeat the ids made by `make_id` or skip `defer`.
+        """
+        return self.render_effects, len(self.render_cache)
+
+    def _memo_store(self, memo: tuple, events: list):
+        shared, key, values = memo
+        if not shared:
+            self.render_memo[key] = (values, events)
+            return
+        cache = self._memo
+        with self._memo_lock:
+            cache[key] = (None, events)
+            while len(cache) > self.MEMO_CACHE_SIZE:
+                del cache[next(iter(cache))]
+
+    def render(
+            self, template: Dict[Tag, dict], ctx, *, indent=2, debug=False, doctype='html', limits: dict = None,
+            filters: Iterable[Callable[[Iterator], Iterator]] = ()
+    ):
+        """Render the template.
+
+        `limits` are the render budgets, `RenderLimitError` is raised if one is exceeded:
+            - max_nodes: max number of rendered nodes (tags, components, loop iterations)
+            - max_depth: max nesting of the nodes bodies (including components templates)
+            - max_output: max length of the output
+            - timeout: max render time in seconds
+        `filters` are applied to the structured events before printing, see `events`.
+        """
+        u = self._session(limits)
+        out = HTMLPrinter(indent, debug, doctype, max_output=u.max_output)
+        try:
+            if filters:
+                u._render_filtered(template, ctx, out, filters)
+            else:
+                u._render(template, ctx, out)
             return out.buf.getvalue()
         except RenderError as exc:
             exc.set_html_dump(out.buf.getvalue())
             raise
 
+    def events(
+            self, template: Dict[Tag, dict], ctx, *, filters: Iterable[Callable[[Iterator], Iterator]] = (),
+            debug=False, limits: dict = None
+    ) -> Iterator[Union[StartTag, EndTag, str]]:
+        """Render the template to structured events: `StartTag`, `EndTag` and `str` of html text.
+
+        The events are produced while rendering, so post-processing doesn't need to parse the html.
+        `filters` are applied in order, a filter takes the events iterator and yields the events to pass on:
+
+            def add_nonce(events):
+                for ev in events:
+                    if ev.__class__ is StartTag and ev.name in ('script', 'style'):
+                        ev.attrs['nonce'] = nonce
+                    yield ev
+
+            u.render(template, ctx, filters=[add_nonce])
+
+        The deferred content follows the page as of `render`.
+        NOTE: the attrs aren't precompiled in this mode, so the styles aren't extracted (see `extract_styles`).
+        """
+        return self._session(limits)._iter_events(template, ctx, filters, debug)
+
+    def _iter_events(self, template: Dict[Tag, dict], ctx, filters, debug: bool):
+        self.plan_attrs = False
+        # the events of the memoized output would be replayed to the filters changing them
+        self.memo_subtrees = False
+        events = _structure_events(self._iter_raw_events(template, ctx), debug)
+        for f in filters:
+            events = f(events)
+        return events
+
+    def _render_filtered(self, template: Dict[Tag, dict], ctx: dict, out: 'HTMLPrinter', filters):
+        _print_events(self._iter_events(template, ctx, filters, out.debug), out)
+
+    def _iter_raw_events(self, template: Dict[Tag, dict], ctx: dict) -> Iterator:
+        """Yield render events of the template followed by the deferred content, see `HTMLPrinter.print`."""
+        ctx = self._init_render(template, ctx)
+        yield from Template().render(self, ctx, template)
+        for i, (job, value) in enumerate(_resolve_deferred(self.deferred)):
+            # nested deferred content is rendered in place
+            self.deferred = None
+            yield from job.render(self, value, not i)
+
     def _render(self, template: Dict[Tag, dict], ctx: dict, out: 'HTMLPrinter'):
-        if self.default_ctx:
-            dctx = self.default_ctx.copy()
-            dctx.update(ctx)
-            ctx = dctx
-        self.scope = []
+        for _ in self._iter_shell(template, ctx, out):
+            pass
+        for i, (job, value) in enumerate(_resolve_deferred(self.deferred)):
+            self._print_deferred(job, value, out, not i)
+
+    def stream(
+            self, template: Dict[Tag, dict], ctx, *, indent=2, debug=False, doctype='html', chunk_size=8192,
+            limits: dict = None
+    ) -> Iterator[str]:
+        """Render the template by chunks of about `chunk_size` chars.
+
+        The page shell is flushed before waiting for `Deferred` values,
+        the deferred content is streamed in order of the values completion.
+        `limits` are the same as of `render`.
+        """
+        for chunk, _ in self._iter_stream(template, ctx, indent, debug, doctype, chunk_size, limits):
+            if chunk:
+                yield chunk
+
+    def stream_compressed(
+            self, template: Dict[Tag, dict], ctx, *, indent=2, debug=False, doctype='html', chunk_size=8192,
+            limits: dict = None, format='gzip', level=6, flush: Optional[str] = 'chunk'
+    ) -> Iterator[bytes]:
+        """Same as `stream`, but the chunks are compressed as they are rendered.
+
+        `format` is one of `gzip`, `zlib` (`Content-Encoding: deflate`), `raw`.
+        `flush` sets the points where the compressed output so far is flushed and yielded:
+            - 'chunk': after each rendered chunk
+            - 'wait': only before waiting for `Deferred` values
+            - None: the compressor decides, the least output size
+        """
+        if flush not in ('chunk', 'wait', None):
+            raise ValueError(f"Unexpected flush: {flush!r}, expected one of 'chunk', 'wait', None")
+        co = Compressor(format, level)
+        chunks = self._iter_stream(template, ctx, indent, debug, doctype, chunk_size, limits)
+        for chunk, waits in chunks:
+            data = co.compress(chunk)
+            if flush == 'chunk' or (waits and flush == 'wait'):
+                data += co.flush()
+            if data:
+                yield data
+        yield co.finish()
+
+    def render_compressed(
+            self, template: Dict[Tag, dict], ctx, *, indent=2, debug=False, doctype='html', chunk_size=8192,
+            limits: dict = None, format='gzip', level=6
+    ) -> bytes:
+        """Render the template to compressed bytes, without holding the whole uncompressed page.
+
+        The options are the same as of `stream_compressed`.
+        """
+        return b''.join(self.stream_compressed(
+            template, ctx, indent=indent, debug=debug, doctype=doctype, chunk_size=chunk_size,
+            limits=limits, format=format, level=level, flush=None
+        ))
+
+    def _iter_stream(
+            self, template: Dict[Tag, dict], ctx, indent, debug, doctype, chunk_size, limits
+    ) -> Iterator[Tuple[str, bool]]:
+        """Yield the chunks of `stream` along with a flag if the stream is going to wait for deferred values."""
+        u = self._session(limits)
+        out = HTMLPrinter(indent, debug, doctype, max_output=u.max_output)
+        try:
+            for _ in u._iter_shell(template, ctx, out, chunk_size):
+                yield out.take_output(), False
+            jobs = u.deferred
+            if jobs:
+                # flush the shell before waiting for the deferred values, even if it is already taken
+                yield out.take_output(), True
+            for i, (job, value) in enumerate(_resolve_deferred(jobs)):
+                u._print_deferred(job, value, out, not i)
+                yield out.take_output(), i < len(jobs) - 1
+        except RenderError as exc:
+            exc.set_html_dump(out.buf.getvalue())
+            raise
+        rest = out.take_output()
+        if rest:
+            yield rest, False
+
+    async def astream(
+            self, template: Dict[Tag, dict], ctx, *, indent=2, debug=False, doctype='html', chunk_size=8192,
+            limits: dict = None
+    ) -> AsyncIterator[str]:
+        """Async version of `stream`, `Deferred` values may be awaitables (e.g. asyncio tasks)."""
+        u = self._session(limits)
+        out = HTMLPrinter(indent, debug, doctype, max_output=u.max_output)
+        try:
+            for _ in u._iter_shell(template, ctx, out, chunk_size):
+                yield out.take_output()
+            jobs = u.deferred
+            if jobs and out.buf.tell():
+                # flush the shell before waiting for the deferred values
+                yield out.take_output()
+            first = True
+            async for job, value in _aresolve_deferred(jobs):
+                u._print_deferred(job, value, out, first)
+                first = False
+                yield out.take_output()
+        except RenderError as exc:
+            exc.set_html_dump(out.buf.getvalue())
+            raise
+        rest = out.take_output()
+        if rest:
+            yield rest
+
+    def _iter_shell(
+            self, template: Dict[Tag, dict], ctx: dict, out: 'HTMLPrinter', chunk_size: int = None
+    ) -> Iterator[None]:
+        """Render the template except deferred content to `out`.
+
+        Yield each time the output exceeds `chunk_size` if it is passed.
+        The deferred content jobs are collected to `self.deferred`.
+        """
+        ctx = self._init_render(template, ctx)
         # wrap in Template to ensure foo-loop/if-else will be processed properly
         template = {Template(): template}
         for k, v in template.items():
@@ -729,41 +2004,488 @@ class UPYTL:
                     out.end_body()
                 else:
                     out.print(it)
+                if chunk_size is not None and out.buf.tell() >= chunk_size:
+                    yield
+
+    def _init_render(self, template: Dict[Tag, dict], ctx: dict) -> dict:
+        """Init the state of the render session, return the context to render with."""
+        if self.default_ctx:
+            dctx = self.default_ctx.copy()
+            dctx.update(ctx)
+            ctx = dctx
+        stylesheet = self.extract_styles(template)
+        # the styles aren't extracted in the events mode
+        self.render_stylesheet = stylesheet if self.plan_attrs else ''
+        self.scope = []
+        self.deferred = []
+        self.render_cache = {}
+        self.render_memo = {}
+        return ctx
+
+    def _print_deferred(self, job, value, out: 'HTMLPrinter', first: bool):
+        # nested deferred content is rendered in place
+        self.deferred = None
+        for it in job.render(self, value, first):
+            if it is self.START_BODY:
+                out.start_body()
+            elif it is self.END_BODY:
+                out.end_body()
+            else:
+                out.print(it)
+
+    def view(self, template, *, cache: ViewCache = None, **defaults):
+        """Decorator rendering the template with the context returned by the function.
 
-    def view(self, template, **defaults):
+        With `cache` (see `upytl.caching.ViewCache`) the page is rendered once per context
+        and returned as `Rendered` string with `etag`, the wrapper also takes `if_none_match`
+        keyword (the value of `If-None-Match` request header) to return `NotModified` without rendering.
+        """
 
         from collections.abc import MutableMapping
 
         def decorator(func):
 
+            def render(tplvars: dict, if_none_match: str = None):
+                if cache is None:
+                    return self.render(template, tplvars)
+                return cache.render(self, template, tplvars, view_key, if_none_match)
+
             @functools.wraps(func)
             def wrapper(*args, **kwargs):
+                if_none_match = None if cache is None else kwargs.pop('if_none_match', None)
                 result = func(*args, **kwargs)
                 if isinstance(result, (dict, MutableMapping)):
                     tplvars = defaults.copy()
                     tplvars.update(result)
-                    return self.render(template, tplvars)
+                    return render(tplvars, if_none_match)
                 elif result is None:
-                    return self.render(template, defaults)
+                    return render(defaults, if_none_match)
                 return result
 
+            view_key = None if cache is None else cache.view_key(f'{func.__module__}.{func.__qualname__}', template)
             return wrapper
 
         return decorator
 
 
+def _text_body_source(body: str, delimiters: Tuple[str, str], escape: bool = False) -> Optional[str]:
+    """Return f-string source of the text body with `[[ ]]` code, `None` if there is no code.
+
+    With `escape` the static text is escaped and the values are wrapped in `_upytl_escape`,
+    the static text with something to escape is returned as a string literal.
+    """
+    body_split = _delimiters_split_re(*delimiters).split(body)
+    if len(body_split) == 1:
+        if not escape:
+            return None
+        escaped = escape_str(body)
+        return None if escaped == body else repr(escaped)
+
+    iter_body = iter(body_split)
+    fstr = []
+    while True:
+        s = next(iter_body, None)
+        if s:
+            if escape:
+                s = escape_str(s)
+            s = s.replace('{', '{{').replace('}', '}}')
+            fstr.append(s)
+        code = next(iter_body, None)
+        if code is None:
+            break
+        # remove delimiters [2:-2]
+        code = code[2:-2]
+        if not escape:
+            fstr.append(f'{{ {code} }}')
+            continue
+        try:
+            compile(code.strip(), '<string>', 'eval')
+        except SyntaxError:
+            # f-string specific code, e.g. `value:.2f`
+            fstr.append(f'{{_upytl_escape(f"""{{ {code} }}""")}}')
+        else:
+            fstr.append(f'{{_upytl_escape(( {code} ))}}')
+    fstr = ''.join(fstr)
+    return f"f'''{fstr}'''"
+
+
+class _TrackingUPYTL(UPYTL):
+    """UPYTL of `UPYTL.render_tracked`, it wraps the body tags to mark the anchors of re-rendering."""
+
+    memo_subtrees = False
+
+    def __init__(self, u: UPYTL, root_ctx: dict):
+        self.__dict__.update(u.__dict__)
+        self.root_ctx = root_ctx
+
+    def iter_body(self, body: Dict[Tag, dict], ctx: dict) -> Iterable[Tuple[Tag, dict, dict]]:
+        for tag, tag_body, loop_vars in super().iter_body(body, ctx):
+            yield _TrackedTag(tag), tag_body, loop_vars
+
+
+class _LimitedUPYTL(UPYTL):
+    """UPYTL of a render with limits, it counts the rendered nodes and checks the deadline."""
+
+    # the deadline is checked once per this number of nodes
+    DEADLINE_CHECK_NODES = 32
+
+    memo_subtrees = False
+
+    def __init__(
+            self, u: UPYTL, *,
+            max_nodes: int = None, max_depth: int = None, max_output: int = None, timeout: float = None
+    ):
+        self.__dict__.update(u.__dict__)
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.max_output = max_output
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.nodes = 0
+        self.depth = 0
+        self.tag = None  # the last started node
+
+    def iter_body(self, body: Dict[Tag, dict], ctx: dict) -> Iterable[Tuple[Tag, dict, dict]]:
+        max_nodes = self.max_nodes
+        deadline = self.deadline
+        self.depth += 1
+        try:
+            if self.max_depth is not None and self.depth > self.max_depth:
+                raise RenderLimitError(self.tag, 'max_depth', self.max_depth)
+            for tag, tag_body, loop_vars in super().iter_body(body, ctx):
+                self.nodes = nodes = self.nodes + 1
+                self.tag = tag
+                if max_nodes is not None and nodes > max_nodes:
+                    raise RenderLimitError(tag, 'max_nodes', max_nodes)
+                if deadline is not None and not nodes % self.DEADLINE_CHECK_NODES and time.monotonic() > deadline:
+                    raise RenderLimitError(tag, 'timeout', self.timeout)
+                yield tag, tag_body, loop_vars
+        finally:
+            self.depth -= 1
+
+    def _iter_shell(self, *args, **kw) -> Iterator[None]:
+        try:
+            yield from super()._iter_shell(*args, **kw)
+        except RenderLimitError as exc:
+            self._set_component(exc)
+            raise
+
+    def _print_deferred(self, *args, **kw):
+        try:
+            super()._print_deferred(*args, **kw)
+        except RenderLimitError as exc:
+            self._set_component(exc)
+            raise
+
+    def _render_filtered(self, *args, **kw):
+        try:
+            super()._render_filtered(*args, **kw)
+        except RenderLimitError as exc:
+            self._set_component(exc)
+            raise
+
+    def _set_component(self, exc: RenderLimitError):
+        # the output limit is detected by the printer which doesn't know the node
+        if exc.component is None:
+            exc.component = self.tag
+
+
+class _FragmentTarget:
+    """Target of `UPYTL.render_fragment`."""
+
+    def __init__(self, target: Union[str, Type[Tag], Tuple[str, Any]]):
+        self.target = target
+        self.tag_class = self.attr = self.value = None
+        if isinstance(target, type):
+            self.tag_class = target
+        elif isinstance(target, str):
+            self.attr, self.value = 'id', target
+        elif isinstance(target, tuple) and len(target) == 2:
+            self.attr, self.value = target
+        else:
+            raise TypeError(f'Unexpected fragment target: {target!r}')
+
+    def __str__(self):
+        return repr(self.target)
+
+    def is_candidate(self, tag: Tag) -> bool:
+        """Return `True` if the tag may match the target depending on the context."""
+        if self.tag_class is not None:
+            return isinstance(tag, self.tag_class)
+        v = tag.attrs.get(self.attr)
+        if v is None:
+            return False
+        return not isinstance(v, ValueGetter) or not v.is_static or v.get(None) == self.value
+
+    def matches(self, tag: Tag, ctx: dict) -> bool:
+        if self.tag_class is not None:
+            return True
+        v = tag.attrs[self.attr]
+        return isinstance(v, ValueGetter) and v.get(ctx) == self.value
+
+
+_FRAGMENT_END = object()
+
+
+class _FragmentTag:
+    """Proxy of the tag yielded by `_FragmentUPYTL.iter_body`, marks the tag output if the tag matches the target.
+
+    The output starts with the proxy itself and ends with `_FRAGMENT_END`.
+    """
+    __slots__ = ('tag',)
+
+    def __init__(self, tag: Tag):
+        self.tag = tag
+
+    def __getattr__(self, name: str):
+        return getattr(self.tag, name)
+
+    def render(self, u: '_FragmentUPYTL', ctx: dict, body, *args, **kw):
+        if not u.target.matches(self.tag, {**u.global_ctx, **ctx}):
+            yield from self.tag.render(u, ctx, body, *args, **kw)
+            return
+        yield self
+        # render the target body as is
+        skip_tags = u.skip_tags
+        u.skip_tags = None
+        try:
+            yield from self.tag.render(u, ctx, body, *args, **kw)
+        finally:
+            u.skip_tags = skip_tags
+        yield _FRAGMENT_END
+
+
+class _FragmentUPYTL(UPYTL):
+    """UPYTL of `UPYTL.render_fragment`, it skips the nodes off the path to the target."""
+
+    memo_subtrees = False
+
+    def __init__(self, u: UPYTL, target: _FragmentTarget, skip_tags: set, rows_window=False):
+        self.__dict__.update(u.__dict__)
+        self.target = target
+        self.skip_tags = skip_tags
+        # `(offset, limit)` to override the window of the target loop (`None` items are of the loop own window),
+        # `None` - don't override
+        self.rows_window = rows_window
+        self.rows_found = False  # the target loop is iterated, so the empty output is not a miss
+
+    def _iter_for_loop(self, tag: Tag, ctx, window=None) -> Iterator[dict]:
+        target = self.target
+        if (
+            self.rows_window is not False and not self.rows_found
+            and target.is_candidate(tag) and target.matches(tag, {**self.global_ctx, **ctx})
+        ):
+            self.rows_found = True
+            window = self.rows_window
+            if window is not None and tag.for_window is not None:
+                window = tuple([v if v is not None else own for v, own in zip(window, tag.for_window)])
+        return super()._iter_for_loop(tag, ctx, window)
+
+    def iter_body(self, body: Dict[Tag, dict], ctx: dict) -> Iterable[Tuple[Tag, dict, dict]]:
+        is_candidate = self.target.is_candidate
+        for tag, tag_body, loop_vars in super().iter_body(body, ctx):
+            yield (_FragmentTag(tag) if is_candidate(tag) else tag), tag_body, loop_vars
+
+
+def _off_path_nodes(template: dict, target: _FragmentTarget) -> set:
+    """Return the nodes of the template and used components templates which can't lead to the target.
+
+    A node leads to the target if the target may be in its body/template or if its body has a `Slot`
+    (i.e. it may lead to the slots content which has the target).
+    """
+    off_path = set()
+    templates = {}  # {id(component template): has target}
+    # result of the previous pass, it is assumed for recursive templates while they are in progress
+    prev_templates = {}
+
+    def walk_body(body) -> Tuple[bool, bool]:
+        """Return (has target, has slot)."""
+        has_target = has_slot = False
+        if isinstance(body, dict):
+            for tag, tag_body in body.items():
+                t, s = walk_node(tag, tag_body)
+                has_target = has_target or t
+                has_slot = has_slot or s
+        return has_target, has_slot
+
+    def walk_node(tag: Tag, body) -> Tuple[bool, bool]:
+        if isinstance(tag, Template) and 'Is' in tag.attrs and isinstance(body, dict):
+            bodies = [walk_body(it) for it in body.values()]
+            has_target, has_slot = any(t for t, _ in bodies), any(s for _, s in bodies)
+        else:
+            has_target, has_slot = walk_body(body)
+
+        if isinstance(tag, Slot):
+            has_slot = True
+        elif isinstance(tag, GenericComponent):
+            # the component is unknown until render
+            has_target = True
+        elif isinstance(tag, Component):
+            component_template = type(tag).template
+            key = id(component_template)
+            if key not in templates:
+                templates[key] = prev_templates.get(key, False)
+                templates[key] = walk_body(component_template)[0]
+            has_target = has_target or templates[key]
+        has_target = has_target or target.is_candidate(tag)
+
+        if not has_target and not has_slot:
+            off_path.add(tag)
+        return has_target, has_slot
+
+    while True:
+        walk_body(template)
+        if templates == prev_templates:
+            return off_path
+        prev_templates, templates = templates, {}
+        off_path.clear()
+
+
+def _anchor_children(anchor: _Anchor, deps: dict) -> List[_Anchor]:
+    """Return nested anchors of the template nodes, anchors of implicit nodes are unfolded."""
+    ret = []
+    for ch in anchor.anchors():
+        if ch.tag in deps:
+            ret.append(ch)
+        else:
+            # e.g. implicit `SlotTemplate` of a component body
+            ret.extend(_anchor_children(ch, deps))
+    return ret
+
+
+def _replace_anchor(part: Union[str, _Anchor], replaced: Dict[_Anchor, _Anchor], deps: dict):
+    if part.__class__ is str:
+        return part
+    new = replaced.get(part)
+    if new is not None:
+        return new
+    if part.tag in deps:
+        return part
+    # implicit anchor, replaced anchors may be nested in it
+    parts = [_replace_anchor(p, replaced, deps) for p in part.parts]
+    if all(a is b for a, b in zip(parts, part.parts)):
+        return part
+    new = _Anchor(part.tag, part.body, part.indent)
+    new.parts = parts
+    return new
+
+
+class _Descend:
+    """Yielded by a nested recursive component to the walk, see `UPYTL.render_recursive`.
+
+    The `events` are the template render events or the memoized output (list).
+    """
+    __slots__ = ('memo', 'events')
+
+    def __init__(self, memo: Optional[tuple], events: Union[Iterator, list]):
+        self.memo = memo
+        self.events = events
+
+
+# context values memoized by value rather than by identity
+_MEMO_BY_VALUE = frozenset([str, int, float, bool, type(None)])
+
+
+def _replay_events(events: list) -> Iterator:
+    """Yield the memoized output, the nested lists are the output of nested recursive components."""
+    stack = [iter(events)]
+    while stack:
+        for it in stack[-1]:
+            if it.__class__ is list:
+                stack.append(iter(it))
+                break
+            yield it
+        else:
+            stack.pop()
+
+
+def _resolve_now(value):
+    from concurrent.futures import Future
+
+    if isinstance(value, Future):
+        return value.result()
+    if inspect.isawaitable(value):
+        raise TypeError('Awaitable deferred value can be rendered only by `UPYTL.astream`')
+    if callable(value):
+        return value()
+    return value
+
+
+def _resolve_deferred(jobs: Optional[list]) -> Iterator[Tuple[Any, Any]]:
+    """Yield (job, resolved value) in order of the values completion.
+
+    A value is a `concurrent.futures.Future`, a callable to be called or the value itself.
+    The values completed at the same time are yielded in order of the jobs.
+    """
+    if not jobs:
+        return
+    # imported on demand, since these are rarely used and slow down the import of upytl
+    from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+    pending = {}
+    for job in jobs:
+        if isinstance(job.value, Future):
+            pending.setdefault(job.value, []).append(job)
+        else:
+            yield job, _resolve_now(job.value)
+    while pending:
+        done = [fut for fut in pending if fut.done()]
+        if not done:
+            wait(pending, return_when=FIRST_COMPLETED)
+            continue
+        for fut in done:
+            for job in pending.pop(fut):
+                yield job, fut.result()
+
+
+async def _aresolve_deferred(jobs: Optional[list]) -> AsyncIterator[Tuple[Any, Any]]:
+    """Async version of `_resolve_deferred`, the value may also be an awaitable."""
+    if not jobs:
+        return
+    import asyncio
+    from concurrent.futures import Future
+
+    pending = {}
+    for job in jobs:
+        value = job.value
+        if isinstance(value, Future):
+            value = asyncio.wrap_future(value)
+        if inspect.isawaitable(value):
+            # the same awaitable may be deferred multiple times, but can be awaited only once
+            key = id(value)
+            if key not in pending:
+                pending[key] = (asyncio.ensure_future(value), [])
+            pending[key][1].append(job)
+        else:
+            yield job, _resolve_now(value)
+    tasks = {task: jobs for task, jobs in pending.values()}
+    while tasks:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in [task for task in tasks if task in done]:
+            for job in tasks.pop(task):
+                yield job, task.result()
+
+
+@functools.lru_cache(maxsize=None)
+def _delimiters_split_re(dleft: str, dright: str):
+    dleft, dright = [re.escape(d) for d in [dleft, dright]]
+    return re.compile(f'({dleft}.*?{dright})')
+
+
 class HTMLPrinter:
 
-    def __init__(self, indent=0, debug=False, doctype='html'):
+    def __init__(self, indent=0, debug=False, doctype='html', max_output: int = None):
         self.indent = ' ' * indent
         self.cur_indent = ''
         self.debug = debug
         self.buf = io.StringIO()
+        self.max_output = max_output
+        self.taken_size = 0  # length of the output taken by `take_output`
         if doctype:
             self.buf.write(f'<!DOCTYPE {doctype}>')
 
-        self.prev_tag = None
-        self.stack = []
+        self.indent_body = False  # if the body of the last printed tag should be indented
+        self.stack = []  # close-tags and `None` as body start marks
 
     def indent_inc(self):
         if self.indent:
@@ -775,26 +2497,44 @@ class HTMLPrinter:
             self.cur_indent = self.cur_indent[:-step]
 
     def start_body(self):
-        assert isinstance(self.prev_tag, RenderedTag)
-        self.stack.append(Punc.START)
-        if self.debug or not self.prev_tag.tag_class.is_meta_tag:
+        self.stack.append(None)
+        if self.indent_body:
             self.indent_inc()
 
     def end_body(self):
+        stack = self.stack
         # it can be prev close-tag
-        it = self.stack.pop()
-        if isinstance(it, str):
+        it = stack.pop()
+        if it is not None:
             self._print(it)
-            it = self.stack.pop()
-        assert it is Punc.START
-        close_tag = self.stack.pop()
+            it = stack.pop()
+        assert it is None
+        close_tag = stack.pop()
         if close_tag:
             self.indent_dec()
             self._print_with_indent(close_tag)
 
+    def take_output(self) -> str:
+        """Return the output printed so far and clear the buffer."""
+        buf = self.buf
+        ret = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        self.taken_size += len(ret)
+        return ret
+
+    def close_pending(self):
+        """Print the close-tag of the last printed tag if it's pending (i.e. the next sibling isn't printed yet)."""
+        stack = self.stack
+        if stack and stack[-1] is not None:
+            self._print(stack.pop())
+
     def _print(self, s):
         if s:
             self.buf.write(s)
+            if self.max_output is not None and self.buf.tell() + self.taken_size > self.max_output:
+                # the component is set by the render
+                raise RenderLimitError(None, 'max_output', self.max_output)
 
     def _print_with_indent(self, s: str):
         if not s:
@@ -803,33 +2543,130 @@ class HTMLPrinter:
             s = f'\n{self.cur_indent}{s}'
         self._print(s)
 
-    def print(self, it: Union[RenderedTag, str]):
-        if isinstance(it, str):
+    def print_tag(self, tag_def: Optional[str], close_tag: str, indent_body: bool):
+        stack = self.stack
+        if stack and stack[-1] is not None:
+            # close-tag of the previous sibling
+            self._print(stack.pop())
+        self._print_with_indent(tag_def)
+        stack.append(close_tag)
+        self.indent_body = indent_body
+
+    def print(self, it: Union[Tuple[str, str], RenderedTag, str]):
+        """Print render event.
+
+        The event is one of:
+            - (open-tag, close-tag) of a regular tag
+            - RenderedTag, mostly a meta tag or a tag with customized rendering
+            - text body
+        """
+        cls = it.__class__
+        if cls is tuple:
+            self.print_tag(it[0], it[1], True)
+        elif cls is RenderedTag:
+            tag_class = it.tag_class
+            if tag_class.is_meta_tag and not self.debug:
+                self.print_tag(None, '', False)
+                return
+            attrs = it.attrs_str
+            if attrs is None:
+                attrs = attrs_to_str(it.attrs)
+            tag_def, close_tag = format_tag(resolve_tag_name(tag_class, it.tag), attrs, tag_class.is_body_allowed)
+            self.print_tag(tag_def, close_tag, True)
+        else:
             # this is text-body
             self.start_body()
             self._print_with_indent(it)
             self.end_body()
+
+
+# top-level public class with base classes, see `UPYTL.register_package`
+_CLASS_DEF_RE = re.compile(r'^class\s+([A-Za-z]\w*)\s*\(([^)]*)\)', re.M)
+_OPEN_TAG_RE = re.compile(r'<([^\s/>]+)(.*?)\s*/?>$', re.S)
+
+
+def _start_tag(it: Union[Tuple[str, str], RenderedTag], debug: bool) -> Optional[StartTag]:
+    """Return `StartTag` of the render event, `None` if the tag isn't printed (i.e. a meta tag)."""
+    if it.__class__ is tuple:
+        # fixed markup, e.g. of `Deferred` or `html.DataTable`
+        open_tag, close_tag = it
+        name, attrs_str = _OPEN_TAG_RE.match(open_tag).groups()
+        return StartTag(name, parse_attrs_str(attrs_str), not close_tag)
+    tag_class = it.tag_class
+    if tag_class.is_meta_tag and not debug:
+        return None
+    # the attrs dict is made by the render, so filters may change it
+    attrs = parse_attrs_str(it.attrs_str) if it.attrs is None else it.attrs
+    return StartTag(resolve_tag_name(tag_class, it.tag), attrs, not tag_class.is_body_allowed)
+
+
+def _structure_events(events: Iterable, debug: bool) -> Iterator[Union[StartTag, EndTag, str]]:
+    """Convert render events (see `HTMLPrinter.print`) to `StartTag`, `EndTag` and text.
+
+    The started but empty body (e.g. of not printed tags only) is marked by empty text to keep the indentation.
+    """
+    stack = []  # (name, number of the events before the body) of the elements with the body started
+    last = None  # name of the last started element until its body is started, '' if it isn't printed
+    n = 0  # number of the yielded events
+    for it in events:
+        if it is UPYTL.START_BODY:
+            stack.append((last, n))
+            last = None
+        elif it is UPYTL.END_BODY:
+            if last:
+                n += 1
+                yield EndTag(last)
+            last = None
+            name, body_start = stack.pop()
+            if name:
+                if n == body_start:
+                    yield ''
+                n += 1
+                yield EndTag(name)
+        elif isinstance(it, str):
+            # text body of the last started element
+            n += 1
+            yield it
+            if last:
+                yield EndTag(last)
+            last = None
         else:
-            stack = self.stack
-            close_tag = stack[-1] if len(stack) else None
-            if isinstance(close_tag, str):
-                stack.pop()
-                self._print(close_tag)
-            if not self.debug and it.tag_class.is_meta_tag:
-                tag_def = None
-                close_tag = ''
+            if last:
+                # the previous sibling has no body
+                n += 1
+                yield EndTag(last)
+            start = _start_tag(it, debug)
+            if start is None or start.void:
+                last = ''
             else:
-                tag_name = it.tag_name
-                attrs = ' '.join([
-                    f'''{aname}{'' if v is True else f'="{str(v)}"' }'''
-                    for aname, v in it.attrs.items() if v is not False
-                ])
-                sep = ' ' if attrs else ''
-                end_tag_def, close_tag = ['', f'</{tag_name}>'] if it.is_body_allowed else [' /', '']
-                tag_def = f'<{tag_name}{sep}{attrs}{end_tag_def}>'
-            self._print_with_indent(tag_def)
-            stack.append(close_tag)
-        self.prev_tag = it
+                last = start.name
+            if start is not None:
+                n += 1
+                yield start
+    if last:
+        yield EndTag(last)
+
+
+def _print_events(events: Iterable[Union[StartTag, EndTag, str]], out: HTMLPrinter):
+    """Print structured events as `HTMLPrinter.print` would print the render events they are made of."""
+    bodies = []  # if the body of an open element is started
+    for ev in events:
+        cls = ev.__class__
+        if cls is EndTag:
+            if bodies.pop():
+                out.end_body()
+            else:
+                out.close_pending()
+            continue
+        if bodies and not bodies[-1]:
+            out.start_body()
+            bodies[-1] = True
+        if cls is StartTag:
+            out.print_tag(*format_tag(ev.name, attrs_to_str(ev.attrs), not ev.void), True)
+            if not ev.void:
+                bodies.append(False)
+        else:
+            out._print_with_indent(ev)
 
 
 class UHelper:
@@ -0,0 +1,93 @@
+from typing import Any, List, Tuple
+
+from . import html as h
+from .core import Component, Slot, SlotTemplate, UPYTL, _resolve_now
+
+# replaces the placeholder with the content of `<template id="{id}-content">`,
+# it is the only definition of `upytl.swap` (it isn't in `upytl.js`), so the streamed page needs no scripts
+SWAP_SCRIPT = (
+    '(window.upytl=window.upytl||{}).swap=function(id){'
+    'var t=document.getElementById(id+"-content");'
+    'document.getElementById(id).replaceWith(t.content);t.remove()}'
+)
+
+
+class DeferredJob:
+    """Deferred slot content to be rendered once the value is resolved."""
+
+    __slots__ = ('id', 'value', 'name', 'ctx', 'slot_template', 'body', 'scope')
+
+    def __init__(self, id: str, value, name: str, ctx: dict, slot_template: SlotTemplate, body, scope: List[dict]):
+        self.id = id
+        self.value = value
+        self.name = name
+        self.ctx = ctx
+        self.slot_template = slot_template
+        self.body = body
+        self.scope = scope
+
+    def render(self, u: UPYTL, value: Any, with_script: bool = True):
+        """Yield render events of the content and the swap call."""
+        if with_script:
+            yield ('<script>', '</script>')
+            yield SWAP_SCRIPT
+        u.scope = [*self.scope]
+        yield (f'<template id="{self.id}-content">', '</template>')
+        yield u.START_BODY
+        yield from self.slot_template.render(u, {**self.ctx, self.name: value}, self.body)
+        yield u.END_BODY
+        yield ('<script>', '</script>')
+        yield f'upytl.swap("{self.id}")'
+
+
+class DeferredSlot(Slot):
+    """Slot of `Deferred`, it defers the content to the end of the stream."""
+    __slots__ = ()
+
+    def render(self, u: UPYTL, ctx: dict, body, passed_attrs=None):
+        self_ctx = dict(u.global_ctx, **ctx)
+        slots_content_map = u.scope[-1]
+        to_slot: Tuple[dict, SlotTemplate, dict] = slots_content_map.get(self.SlotName.get(self_ctx))
+        if to_slot is None:
+            return
+        job = DeferredJob(self_ctx['id'], self_ctx['value'], self_ctx['name'], *to_slot, u.scope[:-1])
+        if u.defer(job):
+            return
+        # deferring isn't supported by the render (e.g. `UPYTL.render_fragment`)
+        yield from job.render(u, _resolve_now(job.value))
+        u.scope.append(slots_content_map)
+
+
+class Deferred(Component):
+    """Render the placeholder in place and the content at the end of the stream (see `UPYTL.stream`).
+
+    The `value` is a `concurrent.futures.Future`, an awaitable (`UPYTL.astream` only),
+    a callable to be called or just a value, the content is rendered with the resolved value
+    available as `name` in the context. E.g.:
+
+        Deferred(value={'user_future'}, name='user'): {
+            SlotTemplate(Slot='placeholder'): 'Loading...',
+            SlotTemplate(): {
+                h.Div(): 'Hello [[ user.name ]]!'
+            }
+        }
+
+    The placeholder `id` is made by `UPYTL.make_id` if not passed, so it is unique within the render,
+    the separately rendered (e.g. cached) fragments of a page should be given explicit ids.
+    """
+
+    def __init__(self, value=None, name: str = 'value', id: str = '', **kw):
+        super().__init__(value=value, name=name, id=id, **kw)
+
+    def make_context(self, u: UPYTL, props_rendered: dict) -> dict:
+        if not props_rendered['id']:
+            # numbered in order of the render, so the markup is deterministic
+            props_rendered['id'] = u.make_id(f'Deferred:{props_rendered["name"]}')
+        return self.get_context(props_rendered)
+
+    template = {
+        h.Div(id='{id}'): {
+            Slot(SlotName='placeholder'): ''
+        },
+        DeferredSlot(): None,
+    }
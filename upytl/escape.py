@@ -0,0 +1,66 @@
+"""HTML escaping of the rendered values.
+
+Attribute values and text bodies of the tags with `escape_body` (e.g. `html.Text`)
+are escaped by the render, `Markup` (or any object with `__html__`) is trusted as is.
+"""
+
+
+class Markup(str):
+    """Safe html string, it isn't escaped by the render.
+
+        h.Text(): '[[ user_name ]] wrote: [[ Markup(comment_html) ]]'
+    """
+    __slots__ = ()
+
+    def __html__(self) -> 'Markup':
+        return self
+
+    def __format__(self, spec: str) -> 'Markup':
+        # keep it safe in `[[ value ]]` of the text bodies
+        return Markup(super().__format__(spec)) if spec else self
+
+    def __add__(self, other) -> 'Markup':
+        return Markup(super().__add__(escape_value(other)))
+
+    def __radd__(self, other) -> 'Markup':
+        return Markup(str.__add__(escape_value(other), self))
+
+    def __repr__(self):
+        return f'Markup({super().__repr__()})'
+
+
+def escape_str(s: str) -> str:
+    """Escape `& < > " '`, the string is returned as is if there is nothing to escape."""
+    if '&' in s:
+        s = s.replace('&', '&amp;')
+    if '<' in s:
+        s = s.replace('<', '&lt;')
+    if '>' in s:
+        s = s.replace('>', '&gt;')
+    if '"' in s:
+        s = s.replace('"', '&quot;')
+    if "'" in s:
+        s = s.replace("'", '&#x27;')
+    return s
+
+
+def escape_value(value) -> str:
+    """Return html of the value: `Markup`/`__html__` as is, anything else is escaped."""
+    cls = value.__class__
+    if cls is str:
+        return escape_str(value)
+    if cls is Markup:
+        return value
+    if cls is int or cls is float:
+        return str(value)
+    html = getattr(value, '__html__', None)
+    if html is not None:
+        return html()
+    return escape_str(str(value))
+
+
+def escape(value) -> Markup:
+    """Return escaped value as `Markup`, so it won't be escaped again."""
+    if isinstance(value, Markup):
+        return value
+    return Markup(escape_value(value))
@@ -0,0 +1,47 @@
+"""Structured render events, see `UPYTL.events`.
+
+The events are `StartTag`, `EndTag` and `str` of html text.
+"""
+import re
+from typing import Dict
+
+from upytl.escape import Markup
+
+# ' name="value"' or ' name'
+_ATTR_RE = re.compile(r'\s([^\s="/>]+)(?:(=)"([^"]*)")?')
+
+
+class StartTag:
+    """Start of an element.
+
+    `attrs` values are not escaped yet except `Markup`, so filters may change them as is.
+    Void elements (e.g. `<input />`) have no `EndTag`.
+    """
+    __slots__ = ('name', 'attrs', 'void')
+
+    def __init__(self, name: str, attrs: Dict[str, object], void: bool = False):
+        self.name = name
+        self.attrs = attrs
+        self.void = void
+
+    def __repr__(self):
+        return f'StartTag({self.name!r}, {self.attrs!r}{", void=True" if self.void else ""})'
+
+
+class EndTag:
+    """End of an element."""
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f'EndTag({self.name!r})'
+
+
+def parse_attrs_str(attrs_str: str) -> Dict[str, object]:
+    """Return attrs of the rendered attributes string, the values are `Markup` as they are escaped already."""
+    return {
+        name: Markup(value) if eq else True
+        for name, eq, value in _ATTR_RE.findall(attrs_str)
+    }
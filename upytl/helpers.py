@@ -1,15 +1,48 @@
-from typing import Union, Callable, Dict, Any
+from typing import Union, Callable, Dict, Any, List, Optional, Tuple, TypeVar, FrozenSet, Iterable
+import ast
 import itertools
+import operator
+import re
+import string
+import sys
+import threading
+
+from upytl.escape import escape_value
+
+T = TypeVar('T')
+
+
+def attr_to_str(name: str, value) -> str:
+    """Return html attribute definition with leading space.
+
+    `True` is rendered as a bare attribute name, `False` is not rendered at all,
+    the value is escaped unless it is `Markup`.
+    """
+    if value is False:
+        return ''
+    if value is True:
+        return f' {name}'
+    return f' {name}="{escape_value(value)}"'
+
+
+def attrs_to_str(attrs: dict) -> str:
+    return ''.join([attr_to_str(name, v) for name, v in attrs.items()])
 
 
 class AttrsDict(dict):
     extendables = ('Class', 'Style', 'Data')
     extendables_sources = tuple([f'x{_}' for _ in extendables])
+    # (name, eXtend source, rendered attribute name)
+    extendables_spec = (
+        ('Class', 'xClass', 'class'),
+        ('Style', 'xStyle', 'style'),
+        ('Data', 'xData', None),
+    )
 
     def extend(self, other: dict):
-        self_xsources = {k: self.pop(k, None) for k in self.extendables_sources}
+        self_xsources = [(k, self.pop(k)) for k in self.extendables_sources if k in self]
         self.update(other)
-        for k, v in self_xsources.items():
+        for k, v in self_xsources:
             if v is None:
                 continue
             oth_v = self.get(k)
@@ -48,10 +81,13 @@ class AttrsDict(dict):
         self.render_values(ctx)
         self._merge_extendables(ctx)
 
-    def _process_extendable(self, name: str, dict_mapper: Callable[[dict], Any], ctx: dict):
-        extra = self.pop(f'x{name}', None)
-        attr = self.pop(name, None)
+    @classmethod
+    def merge_extendable(cls, name: str, attr, extra, ctx: dict):
+        """Merge extendable attribute (e.g. `Class`) with its eXtend source (e.g. `xClass`).
 
+        Return rendered attribute string or dict of `data-*` attributes for `Data`.
+        """
+        dict_mapper = cls.extendables_mappers[name]
         if isinstance(attr, dict):
             if isinstance(extra, dict):
                 attr = attr.copy()
@@ -67,7 +103,18 @@ class AttrsDict(dict):
         if attr is None:
             attr = extra
             extra = None
-        return attr, extra
+
+        if name == 'Data':
+            if extra is not None:
+                raise TypeError('Data, xData attrs must be type of dict')
+            return attr
+
+        sep = ';' if name == 'Style' else ' '
+        attr = cls._make_str(attr, sep)
+        if extra:
+            extra = cls._make_str(extra, sep)
+            attr = f'{attr}{sep}{extra}'
+        return attr
 
     @staticmethod
     def _make_str(it: Union[dict, list, Any], sep: str):
@@ -78,40 +125,176 @@ class AttrsDict(dict):
         return str(it)
 
     def _merge_extendables(self, ctx: dict):
-        for name in self.extendables:
-            name_lower = name.lower()
-            attr, extra = self._process_extendable(name, getattr(self, f'_{name_lower}_render'), ctx)
-            if attr is None:
+        for name, xname, attr_name in self.extendables_spec:
+            extra = self.pop(xname, None)
+            attr = self.pop(name, None)
+            if attr is None and extra is None:
                 continue
-
-            if name == 'Data':
-                if extra is not None:
-                    raise TypeError('Data, xData attrs must be type of dict')
+            attr = self.merge_extendable(name, attr, extra, ctx)
+            if attr_name is None:
                 self.update(attr)
             else:
-                sep = ';' if name == 'Style' else ' '
-                attr = self._make_str(attr, sep)
-                if extra:
-                    extra = self._make_str(extra, sep)
-                    attr = f'{attr}{sep}{extra}'
-                self[name_lower] = attr
-
-    def _data_render(self, dct: dict):
+                self[attr_name] = attr
+
+    @staticmethod
+    def _data_render(dct: dict):
         return {f'data-{k}': v for k, v in dct.items() if v is not None}
 
-    def _class_render(self, dct: dict):
+    @staticmethod
+    def _class_render(dct: dict):
         """Render html class of a tag."""
         return [klass for klass, enabled in dct.items() if enabled]
 
-    def _style_render(cls, dct: dict):
+    @staticmethod
+    def _style_render(dct: dict):
         """Render html style of a tag."""
         return [f'{prop}:{value}' for prop, value in dct.items() if value]
 
 
+AttrsDict.extendables_mappers = {
+    'Class': AttrsDict._class_render,
+    'Style': AttrsDict._style_render,
+    'Data': AttrsDict._data_render,
+}
+
+
+class AttrsPlan:
+    """Attributes of a tag precompiled to the final attributes string.
+
+    Static attributes (including static Class/Style/Data) are rendered once at construction,
+    only dynamic ones are evaluated per render.
+    The plan covers the case when the tag attributes are not merged with
+    passed/assigned ones at render time.
+    """
+    __slots__ = ('tag', 'parts', 'is_static', 'static_str')
+
+    tag: Optional['ValueGetter']  # ValueGetter of the `Tag` special attribute
+    parts: Tuple[Union[str, Callable[[dict], str]], ...]
+    static_str: Optional[str]
+
+    def __init__(self, parts: List[Union[str, Callable[[dict], str]]], tag: 'ValueGetter' = None):
+        self.tag = tag
+        # join adjacent static parts
+        joined = []
+        for p in parts:
+            if isinstance(p, str) and joined and isinstance(joined[-1], str):
+                joined[-1] += p
+            elif p != '':
+                joined.append(p)
+        # the same attrs strings are usual for many tags
+        self.parts = tuple([sys.intern(p) if isinstance(p, str) else p for p in joined])
+        self.is_static = all(isinstance(p, str) for p in joined)
+        self.static_str = ''.join(self.parts) if self.is_static else None
+
+    def render(self, ctx: dict) -> str:
+        if self.is_static:
+            return self.static_str
+        return ''.join([p if isinstance(p, str) else p(ctx) for p in self.parts])
+
+    @classmethod
+    def build(cls, attrs: dict, ident_class: str = None) -> Optional['AttrsPlan']:
+        """Return the plan or `None` if the attributes can't be planned (i.e. should be rendered as usual)."""
+        tag = attrs.get('Tag')
+        if tag is not None and not isinstance(tag, ValueGetter):
+            return None
+        if 'xData' in attrs:
+            return None
+        has_class = 'Class' in attrs or 'xClass' in attrs
+        if 'class' in attrs and (has_class or ident_class):
+            return None
+        if 'style' in attrs and ('Style' in attrs or 'xStyle' in attrs):
+            return None
+        if 'Data' in attrs and any(k.startswith('data-') for k in attrs):
+            return None
+
+        skip = ('Tag', *AttrsDict.extendables, *AttrsDict.extendables_sources)
+        parts = [cls._plan_attr(k, v) for k, v in attrs.items() if k not in skip]
+
+        for name, xname, attr_name in AttrsDict.extendables_spec:
+            attr = attrs.get(name)
+            extra = attrs.get(xname)
+            if attr is None and extra is None:
+                continue
+            if attr_name == 'class':
+                to_str = cls._class_to_str(ident_class)
+            elif attr_name == 'style':
+                to_str = cls._style_to_str
+            else:
+                to_str = cls._data_to_str
+            parts.append(cls._plan_extendable(name, attr, extra, to_str))
+
+        if ident_class and not has_class:
+            parts.append(attr_to_str('class', ident_class))
+        return cls(parts, tag)
+
+    @staticmethod
+    def _plan_attr(name: str, v) -> Union[str, Callable[[dict], str]]:
+        if isinstance(v, ValueGetter):
+            if v.is_static:
+                return attr_to_str(name, v.get(None))
+            get = v.get
+            return lambda ctx: attr_to_str(name, get(ctx))
+        if isinstance(v, ValueGettersDict):
+            if v.is_static:
+                return attr_to_str(name, v.render({}))
+            return lambda ctx: attr_to_str(name, v.render(ctx))
+        return attr_to_str(name, v)
+
+    @staticmethod
+    def _plan_extendable(name: str, attr, extra, to_str: Callable) -> Union[str, Callable[[dict], str]]:
+        is_static = all(v is None or v.is_static for v in (attr, extra))
+
+        def render(ctx: dict):
+            # see `AttrsDict.render_values`: eXtend source is rendered before merging
+            a = attr.get(ctx) if isinstance(attr, ValueGetter) else attr
+            x = (
+                extra.get(ctx) if isinstance(extra, ValueGetter)
+                else extra.render(ctx) if isinstance(extra, ValueGettersDict)
+                else extra
+            )
+            if a is None and x is None:
+                return to_str(None)
+            return to_str(AttrsDict.merge_extendable(name, a, x, ctx))
+
+        if is_static:
+            return render({})
+        return render
+
+    @staticmethod
+    def _class_to_str(ident_class: Optional[str]) -> Callable[[Any], str]:
+        def to_str(klass):
+            if ident_class:
+                klass = f'{ident_class} {klass}' if klass else ident_class
+            elif klass is None:
+                return ''
+            return attr_to_str('class', klass)
+        return to_str
+
+    @staticmethod
+    def _style_to_str(style) -> str:
+        if style is None:
+            return ''
+        return attr_to_str('style', style)
+
+    @staticmethod
+    def _data_to_str(data) -> str:
+        if data is None:
+            return ''
+        dct = {}
+        dct.update(data)
+        return attrs_to_str(dct)
+
+
 class ValueGetter:
-    is_static = True
+    __slots__ = ('_value_gtter', 'get', 'is_static', '_src')
+
+    # instance attributes
+    get: Callable[[dict], Any]  # see `__init__`
+    is_static: bool
+    _src: Optional[Tuple[str, str]]  # ('expr' | 'format', source) of the compiled getter
 
     def __init__(self, value, *, force_compile=False, is_static=False):
+        self._src = None
         if is_static:
             self._value_gtter = value
             assert not callable(value)
@@ -123,23 +306,26 @@ class ValueGetter:
             self.is_static = False
         else:
             self.get = self._get_static_value_method
-
-    def get(self, ctx):
-        '''See `__init__`'''
-        pass
+            self.is_static = True
 
     def _get_static_value_method(self, ctx: dict):
         return self._value_gtter
 
-    @staticmethod
-    def _make_value_getter(v, force_compile) -> Union[str, Callable[[dict], Any]]:
+    @property
+    def names(self) -> Optional[FrozenSet[str]]:
+        """Return context names the getter reads, `None` if unknown (e.g. the value is a custom callable)."""
+        if self.is_static:
+            return frozenset()
+        if self._src is None:
+            return None
+        kind, src = self._src
+        return expr_names(src) if kind == 'expr' else format_names(src)
+
+    def _make_value_getter(self, v, force_compile) -> Union[str, Callable[[dict], Any]]:
         if force_compile:
             if isinstance(v, str):
-                code_obj = compile(v, '<string>', 'eval')
-
-                def render(ctx: dict):
-                    return eval(code_obj, None, ctx)
-                return render
+                self._src = ('expr', v)
+                return compile_expr(v)
             elif isinstance(v, bytes):
                 return v.decode()
             return v
@@ -154,29 +340,441 @@ class ValueGetter:
                 # if we're here it is just string
                 # do nothing
             except KeyError:
-                render = v.format_map
+                self._src = ('format', v)
+                render = compile_format(v)
 
         elif isinstance(v, set):
             assert len(v) == 1
             v = [*v][0]
-            code_obj = compile(v, '<string>', 'eval')
-
-            def render(ctx: dict):
-                return eval(code_obj, None, ctx)
+            self._src = ('expr', v)
+            render = compile_expr(v)
 
         return render
 
 
 class ValueGettersDict(dict):
+    """Dict of ValueGetters (e.g. Class/Style/Data) with keys rendered by `str.format`.
+
+    The keys are precompiled at construction: static ones are rendered once,
+    so only the keys with replacement fields (e.g. 'is-{size}') are formatted per render.
+    The keys added later (e.g. merged `xClass` at render) are just formatted.
+    """
+
+    __slots__ = ('_keys',)
+
+    # {key: rendered static key | `key.format_map`}, shared between copies, so it isn't changed after construction
+    _keys: Dict[str, Union[str, Callable[[dict], str]]]
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        keys = self._keys = {}
+        for k in self:
+            rk = compile_format(k)
+            keys[k] = rk if rk.__class__ is str else k.format_map
+
+    @property
+    def names(self) -> Optional[FrozenSet[str]]:
+        """Return context names the keys and values read, `None` if unknown."""
+        return union_names(itertools.chain(
+            [format_names(k) for k in self],
+            [v.names if isinstance(v, ValueGetter) else frozenset() for v in self.values()],
+        ))
+
+    @property
+    def is_static(self) -> bool:
+        """Return `True` if neither keys nor values depend on the context."""
+        keys = self._keys
+        return all(
+            isinstance(keys.get(k), str) and (not isinstance(v, ValueGetter) or v.is_static)
+            for k, v in self.items()
+        )
 
     def render(self: Dict[str, ValueGetter], ctx: dict):
+        keys = self._keys
+        ret = {}
+        for k, v in self.items():
+            rk = keys.get(k)
+            if rk is None:
+                rk = k.format_map(ctx)
+            elif rk.__class__ is not str:
+                rk = rk(ctx)
+            ret[rk] = v.get(ctx) if isinstance(v, ValueGetter) else v
+        return ret
+
+    def copy(self):
+        ret = ValueGettersDict.__new__(ValueGettersDict)
+        dict.update(ret, self)
+        ret._keys = self._keys
+        return ret
+
+
+class CodeCache:
+    """Process-wide bounded cache of compiled expressions and format templates.
+
+    Identical sources are compiled once and share the same code object/getter,
+    least recently used entries are evicted when `maxsize` is exceeded.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, src: str, factory: Callable[[str], T]) -> T:
+        """Return cached `factory(src)`, `kind` distinguishes factories of the same source."""
+        key = (kind, src)
+        data = self._data
+        with self._lock:
+            try:
+                ret = data.pop(key)
+            except KeyError:
+                pass
+            else:
+                self.hits += 1
+                data[key] = ret
+                return ret
+
+        # the factory may use the cache itself, so it's called without the lock
+        src = sys.intern(src)
+        ret = factory(src)
+        with self._lock:
+            self.misses += 1
+            # keep the entry created by a concurrent thread if any
+            ret = data.setdefault((kind, src), ret)
+            while len(data) > self.maxsize:
+                del data[next(iter(data))]
+        return ret
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Return cache counters.
+
+        `dedup_ratio` is the average number of requests of the same source.
+        """
+        requests = self.hits + self.misses
         return {
-            k.format_map(ctx): v.get(ctx) if isinstance(v, ValueGetter) else v
-            for k, v in self.items()
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'dedup_ratio': requests / self.misses if self.misses else 1.0,
         }
 
-    def copy(self):
-        return ValueGettersDict(self)
+
+code_cache = CodeCache()
+
+
+_formatter = string.Formatter()
+_CONVERSIONS = {'r': repr, 's': str, 'a': ascii}
+_field_name_re = re.compile(r'\.([^.[]+)|\[([^]]+)\]')
+
+
+def _compile_field_name(field_name: str) -> Optional[Callable[[dict], Any]]:
+    """Return `str.format_map` compatible lookup of the field, e.g. `it[name].title`."""
+    m = re.match(r'[^.[]+', field_name)
+    if m is None or m.group().isdigit():
+        # positional field
+        return None
+    pos = m.end()
+    getters = [operator.itemgetter(m.group())]
+    while pos < len(field_name):
+        m = _field_name_re.match(field_name, pos)
+        if m is None:
+            return None
+        attr, key = m.groups()
+        if attr is not None:
+            getters.append(operator.attrgetter(attr))
+        else:
+            getters.append(operator.itemgetter(int(key) if key.isdigit() else key))
+        pos = m.end()
+
+    if len(getters) == 1:
+        return getters[0]
+
+    def get(ctx: dict):
+        v = ctx
+        for g in getters:
+            v = g(v)
+        return v
+    return get
+
+
+def _compile_field(field_name: str, format_spec: str, conversion: Optional[str]):
+    get = _compile_field_name(field_name)
+    if get is None or '{' in format_spec:
+        return None
+    convert = _CONVERSIONS[conversion] if conversion else None
+    if convert is None and not format_spec:
+        return lambda ctx: format(get(ctx))
+    if convert is None:
+        return lambda ctx: format(get(ctx), format_spec)
+    return lambda ctx: format(convert(get(ctx)), format_spec)
+
+
+def compile_format(s: str) -> Union[str, Callable[[dict], str]]:
+    """Compile `str.format_map` template.
+
+    Return the rendered string if there are no replacement fields,
+    otherwise return a callable that takes a context and does the same as `s.format_map`.
+    """
+    if '{' not in s and '}' not in s:
+        return s
+    return code_cache.get('format', s, _compile_format)
+
+
+def _compile_format(s: str) -> Union[str, Callable[[dict], str]]:
+    parts = []
+    try:
+        parsed = [*_formatter.parse(s)]
+    except ValueError:
+        # malformed template, let it fail on render
+        return s.format_map
+    for literal, field_name, format_spec, conversion in parsed:
+        if literal:
+            parts.append(literal)
+        if field_name is None:
+            continue
+        field = _compile_field(field_name, format_spec, conversion)
+        if field is None:
+            return s.format_map
+        parts.append(field)
+
+    if all(p.__class__ is str for p in parts):
+        return ''.join(parts)
+    if len(parts) == 1:
+        return parts[0]
+
+    def render(ctx: dict):
+        return ''.join([p if p.__class__ is str else p(ctx) for p in parts])
+    return render
+
+
+_CMP_OPS = {
+    ast.Eq: '==',
+    ast.NotEq: '!=',
+    ast.Lt: '<',
+    ast.LtE: '<=',
+    ast.Gt: '>',
+    ast.GtE: '>=',
+    ast.Is: 'is',
+    ast.IsNot: 'is not',
+    ast.In: 'in',
+    ast.NotIn: 'not in',
+}
+
+
+def _literal(node: ast.AST):
+    """Return `(True, value)` if the node is a literal, otherwise `(False, None)`."""
+    try:
+        return True, ast.literal_eval(node)
+    except (ValueError, TypeError):
+        return False, None
+
+
+class _SimpleExprCompiler:
+    """Translate trivial expression to the source of direct context lookups.
+
+    `it.get("icon") == value` => `_n0.get(_c[0]) == _n1`, where `_n0 = ctx['it']`, `_n1 = ctx['value']`
+    """
+
+    def __init__(self):
+        self.consts = []
+        self.names = {}  # {name: local variable}
+
+    def name(self, name: str) -> str:
+        var = self.names.get(name)
+        if var is None:
+            var = self.names[name] = f'_n{len(self.names)}'
+        return var
+
+    def const(self, value) -> str:
+        self.consts.append(value)
+        return f'_c[{len(self.consts) - 1}]'
+
+    def operand(self, node: ast.AST, allow_mutable=False) -> Optional[str]:
+        """Translate a literal or a name followed by attribute/item/method-call chain."""
+        is_literal, value = _literal(node)
+        if is_literal:
+            if not allow_mutable and isinstance(value, (list, dict, set)):
+                # must be a new object on each evaluation
+                return None
+            return self.const(value)
+
+        if isinstance(node, ast.Name):
+            return self.name(node.id)
+
+        if isinstance(node, ast.Attribute):
+            value = self.operand(node.value)
+            return value and f'{value}.{node.attr}'
+
+        if isinstance(node, ast.Subscript):
+            key_node = node.slice
+            if isinstance(key_node, getattr(ast, 'Index', ())):
+                # Python < 3.9
+                key_node = key_node.value
+            is_literal, key = _literal(key_node)
+            value = self.operand(node.value)
+            return value and is_literal and f'{value}[{self.const(key)}]' or None
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and not node.keywords:
+            args = [_literal(arg) for arg in node.args]
+            if not all(is_literal for is_literal, _ in args):
+                return None
+            meth = self.operand(node.func)
+            args_s = ', '.join([self.const(arg) for _, arg in args])
+            return meth and f'{meth}({args_s})'
+        return None
+
+    def expr(self, node: ast.AST) -> Optional[str]:
+        """Translate `operand`, `not operand` or `operand <cmp> operand`."""
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            operand = self.operand(node.operand)
+            return operand and f'not {operand}'
+
+        if isinstance(node, ast.Compare):
+            if len(node.ops) != 1:
+                return None
+            op = _CMP_OPS.get(type(node.ops[0]))
+            left = self.operand(node.left, allow_mutable=True)
+            right = self.operand(node.comparators[0], allow_mutable=True)
+            return op and left and right and f'{left} {op} {right}'
+
+        return self.operand(node)
+
+
+def compile_simple_expr(src: str, fallback: Callable[[dict], Any]) -> Optional[Callable[[dict], Any]]:
+    """Compile trivial expression (a name, attribute/item chain, `not name`, simple comparison)
+    to a function of direct context lookups.
+
+    Return `None` if the expression is not trivial.
+    The names are looked up before anything is evaluated, the function falls back to `fallback`
+    if a name is missing in the context, so it is resolved as usual (i.e. from globals and builtins)
+    by `eval`-based fallback.
+    """
+    try:
+        tree = ast.parse(src, mode='eval')
+    except SyntaxError:
+        return None
+    compiler = _SimpleExprCompiler()
+    expr = compiler.expr(tree.body)
+    if expr is None:
+        return None
+
+    lookups = ''.join([f'        {var} = ctx[{name!r}]\n' for name, var in compiler.names.items()]) or '        pass\n'
+    fun_src = (
+        'def get_value(ctx):\n'
+        '    try:\n'
+        f'{lookups}'
+        '    except KeyError:\n'
+        '        return _fallback(ctx)\n'
+        f'    return {expr}\n'
+    )
+    ns = {'_c': tuple(compiler.consts), '_fallback': fallback}
+    exec(compile(fun_src, f'<upytl: {src}>', 'exec'), ns)
+    return ns['get_value']
+
+
+def compile_expr(src: str, eval_globals: dict = None) -> Callable[[dict], Any]:
+    """Compile python expression to a callable that takes a context.
+
+    See `compile_simple_expr`, `eval` is used for non-trivial expressions.
+    The result is shared via `code_cache` if `eval_globals` is not passed.
+    """
+    if eval_globals is None:
+        return code_cache.get('expr', src, _compile_expr)
+    return _compile_expr(src, eval_globals)
+
+
+def _compile_expr(src: str, eval_globals: dict = None) -> Callable[[dict], Any]:
+    code_obj = compile(src, '<string>', 'eval')
+
+    def eval_expr(ctx: dict):
+        return eval(code_obj, eval_globals, ctx)
+
+    return compile_simple_expr(src, eval_expr) or eval_expr
+
+
+def expr_names(src: str) -> FrozenSet[str]:
+    """Return free names of python expression, i.e. the names it reads from the context.
+
+    Unlike `co_names` of the compiled code, attribute names and names bound
+    by comprehensions/lambdas inside the expression are not included.
+    """
+    return code_cache.get('names', src, _expr_names)
+
+
+def _expr_names(src: str) -> FrozenSet[str]:
+    return frozenset(_free_names(ast.parse(src.strip(), mode='eval').body, frozenset()))
+
+
+def _free_names(node: ast.AST, bound: FrozenSet[str]) -> set:
+    if isinstance(node, ast.Name):
+        return {node.id} if isinstance(node.ctx, ast.Load) and node.id not in bound else set()
+
+    ret = set()
+    if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+        for gen in node.generators:
+            # the iterable is evaluated before the target is bound
+            ret |= _free_names(gen.iter, bound)
+            bound = bound.union([n.id for n in ast.walk(gen.target) if isinstance(n, ast.Name)])
+            for cond in gen.ifs:
+                ret |= _free_names(cond, bound)
+        elts = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+        for elt in elts:
+            ret |= _free_names(elt, bound)
+        return ret
+
+    if isinstance(node, ast.Lambda):
+        args = node.args
+        for default in [*args.defaults, *args.kw_defaults]:
+            if default is not None:
+                ret |= _free_names(default, bound)
+        arg_names = [
+            a.arg for a in [
+                *getattr(args, 'posonlyargs', ()), *args.args, args.vararg, *args.kwonlyargs, args.kwarg
+            ]
+            if a is not None
+        ]
+        return ret | _free_names(node.body, bound.union(arg_names))
+
+    for child in ast.iter_child_nodes(node):
+        ret |= _free_names(child, bound)
+    return ret
+
+
+def format_names(s: str) -> FrozenSet[str]:
+    """Return context names `str.format_map` template reads, e.g. `{'it'}` for 'is-{it[size]}'."""
+    if '{' not in s:
+        return frozenset()
+    try:
+        parsed = [*_formatter.parse(s)]
+    except ValueError:
+        return frozenset()
+    names = set()
+    for _, field_name, format_spec, _ in parsed:
+        m = field_name and re.match(r'[^.[]+', field_name)
+        if m and not m.group().isdigit():
+            names.add(m.group())
+        if format_spec:
+            # nested replacement fields, e.g. '{value:{width}}'
+            names |= format_names(format_spec)
+    return frozenset(names)
+
+
+def union_names(names: Iterable[Optional[FrozenSet[str]]]) -> Optional[FrozenSet[str]]:
+    """Return union of the name sets, `None` if any of them is unknown (`None`)."""
+    ret = set()
+    for it in names:
+        if it is None:
+            return None
+        ret |= it
+    return frozenset(ret)
 
 
 def islice_dict(dct: dict, start: Union[str, int] = None, stop: Union[str, int] = None):
@@ -190,3 +788,12 @@ def islice_dict(dct: dict, start: Union[str, int] = None, stop: Union[str, int]
         stop = keys.index(stop)
 
     return itertools.islice(dct.items(), start, stop)
+
+
+def islice_window(iterable: Iterable, offset: Optional[int] = None, limit: Optional[int] = None) -> Iterable:
+    """Return the items `[offset:offset + limit]` of the iterable, sequences are sliced without iterating."""
+    start = offset or 0
+    stop = None if limit is None else start + limit
+    if isinstance(iterable, (list, tuple, range)):
+        return iterable[start:stop]
+    return itertools.islice(iterable, start, stop)
@@ -1,94 +1,239 @@
-import html
+from typing import Any, Callable, Dict, Iterator, List
 
-from .core import Tag, MetaTag, VoidTag, Template
+from .core import Tag, MetaTag, VoidTag, Template, RenderedTag, catch_errors
+from .escape import escape_str, escape_value
+from .helpers import AttrsDict, ValueGetter, attr_to_str, union_names
 
 
 # flake8: noqa E701
 
-class HTMLText(MetaTag): ...
+class HTMLText(MetaTag): __slots__ = ()
 class Text(MetaTag):
-    def format_text_body(self, body: str) -> str:
-        return html.escape(body, quote=True)
-
-
-class Figure(Tag): ...
-class Small(Tag): ...
-
-class Html(Tag): ...
-class Head(Tag): ...
-class Meta(VoidTag): ...
-class Title(Tag): ...
-class Style(Tag): ...
-class Link(VoidTag): ...
-class Script(Tag): ...
-
-
-class Body(Tag): ...
-
-class Article(Tag): ...
-class Aside(Tag): ...
-class Header(Tag): ...
-class Main(Tag): ...
-class Nav(Tag): ...
-class Section(Tag): ...
-class Footer(Tag): ...
-
-class H1(Tag): ...
-class H2(Tag): ...
-class H3(Tag): ...
-class H4(Tag): ...
-class H5(Tag): ...
-class H6(Tag): ...
-
-
-class A(Tag): ...
-class B(Tag): ...
-class P(Tag): ...
-class I(Tag): ...
-class Hr(Tag): ...
-
-class Div(Tag): ...
-class Span(Tag): ...
-class Em(Tag): ...
-class Img(VoidTag): ...
-
-
-class Pre(Tag): ...
-class Code(Tag): ...
-
-
-class Form(Tag): ...
-class Fieldset(Tag): ...
-class Legend(Tag): ...
-class Label(Tag): ...
-class Input(VoidTag): ...
-class Datalist(Tag): ...
-class Select(Tag): ...
-class Option(Tag): ...
-class Optgroup(Tag): ...
-class Textarea(Tag): ...
-class Progress(Tag): ...
-class Meter(Tag): ...
-class Button(Tag): ...
-
-
-class OL(Tag): ...
-class UL(Tag): ...
-class LI(Tag): ...
-
-
-class Table(Tag): ...
-class Caption(Tag): ...
-class Colgroup(Tag): ...
-class Col(Tag): ...
-class THead(Tag): ...
-class TBody(Tag): ...
-class TFoot(Tag): ...
-class TH(Tag): ...
-class TR(Tag): ...
-class TD(Tag): ...
-
-
-class Frame(Tag): ...
-class Canvas(Tag): ...
+    __slots__ = ()
+    escape_body = True
+
+
+class Figure(Tag): __slots__ = ()
+class Small(Tag): __slots__ = ()
+
+class Html(Tag): __slots__ = ()
+class Head(Tag): __slots__ = ()
+class Meta(VoidTag): __slots__ = ()
+class Title(Tag): __slots__ = ()
+class Style(Tag): __slots__ = ()
+class Link(VoidTag): __slots__ = ()
+class Script(Tag): __slots__ = ()
+
+
+class Body(Tag): __slots__ = ()
+
+class Article(Tag): __slots__ = ()
+class Aside(Tag): __slots__ = ()
+class Header(Tag): __slots__ = ()
+class Main(Tag): __slots__ = ()
+class Nav(Tag): __slots__ = ()
+class Section(Tag): __slots__ = ()
+class Footer(Tag): __slots__ = ()
+
+class H1(Tag): __slots__ = ()
+class H2(Tag): __slots__ = ()
+class H3(Tag): __slots__ = ()
+class H4(Tag): __slots__ = ()
+class H5(Tag): __slots__ = ()
+class H6(Tag): __slots__ = ()
+
+
+class A(Tag): __slots__ = ()
+class B(Tag): __slots__ = ()
+class P(Tag): __slots__ = ()
+class I(Tag): __slots__ = ()
+class Hr(Tag): __slots__ = ()
+
+class Div(Tag): __slots__ = ()
+class Span(Tag): __slots__ = ()
+class Em(Tag): __slots__ = ()
+class Img(VoidTag): __slots__ = ()
+
+
+class Pre(Tag): __slots__ = ()
+class Code(Tag): __slots__ = ()
+
+
+class Form(Tag): __slots__ = ()
+class Fieldset(Tag): __slots__ = ()
+class Legend(Tag): __slots__ = ()
+class Label(Tag): __slots__ = ()
+class Input(VoidTag): __slots__ = ()
+class Datalist(Tag): __slots__ = ()
+class Select(Tag): __slots__ = ()
+class Option(Tag): __slots__ = ()
+class Optgroup(Tag): __slots__ = ()
+class Textarea(Tag): __slots__ = ()
+class Progress(Tag): __slots__ = ()
+class Meter(Tag): __slots__ = ()
+class Button(Tag): __slots__ = ()
+
+
+class OL(Tag): __slots__ = ()
+class UL(Tag): __slots__ = ()
+class LI(Tag): __slots__ = ()
+
+
+class Table(Tag): __slots__ = ()
+class Caption(Tag): __slots__ = ()
+class Colgroup(Tag): __slots__ = ()
+class Col(Tag): __slots__ = ()
+class THead(Tag): __slots__ = ()
+class TBody(Tag): __slots__ = ()
+class TFoot(Tag): __slots__ = ()
+class TH(Tag): __slots__ = ()
+class TR(Tag): __slots__ = ()
+class TD(Tag): __slots__ = ()
+
+
+class DataTable(Tag):
+    """Table of columnar data, rows are rendered in batches bypassing per-cell tags.
+
+        h.DataTable(data={'data'}, Class='table', columns=[
+            {'name': 'title'},
+            {'name': 'price', 'title': 'Price, $', 'format': '{:.2f}', 'Class': 'num'},
+            {'name': 'delta', 'format': '{:+d}', 'Class': lambda v: 'neg' if v < 0 else None},
+        ]): None
+
+    `data` is a mapping of equal-sized column arrays (lists, `array.array`, NumPy arrays etc.),
+    `columns` is a list of column specs:
+        - name: key of the column in `data`
+        - title: header cell text, default `name`
+        - format: format string (e.g. `'{:.2f}'`) or callable, default `str`
+        - escape: if the formatted cells should be escaped, default `True`
+        - Class, Style: cells class/style as of a tag or a hook `value -> class/style`
+    The dict body (e.g. `h.Caption()`) is rendered before the rows.
+    """
+    __slots__ = ('data', 'columns', 'batch_size')
+
+    tag_name = 'table'
+
+    data: ValueGetter
+    columns: ValueGetter
+    batch_size: ValueGetter
+
+    def _parse_attrs(self, attrs: dict):
+        # columns list shouldn't be treated as `Class`-like list
+        self.data = ValueGetter(attrs.pop('data'))
+        self.columns = ValueGetter(attrs.pop('columns'))
+        self.batch_size = ValueGetter(attrs.pop('batch_size', 1000))
+        return super()._parse_attrs(attrs)
+
+    def attrs_names(self):
+        return union_names([super().attrs_names(), self.data.names, self.columns.names, self.batch_size.names])
+
+    @catch_errors
+    def render(self, u, ctx: dict, body, passed_attrs: dict = None, passed_defaults: dict = None):
+        # render the table tag only
+        yield from super().render(u, ctx, None, passed_attrs, passed_defaults)
+        self_ctx = dict(u.global_ctx, **ctx)
+        columns = [_DataColumn(spec) for spec in self.columns.get(self_ctx)]
+        yield u.START_BODY
+        if isinstance(body, dict):
+            for ch, ch_body, loop_vars in u.iter_body(body, self_ctx):
+                ch_ctx = ctx if loop_vars is None else dict(ctx, **loop_vars)
+                yield from ch.render(u, ch_ctx, ch_body)
+        yield ('<thead>', '</thead>')
+        yield f'<tr>{"".join([c.th for c in columns])}</tr>'
+        yield ('<tbody>', '</tbody>')
+        yield u.START_BODY
+        raw_text = RenderedTag(HTMLText, None, None, '')
+        for rows in _iter_rows(self.data.get(self_ctx), columns, self.batch_size.get(self_ctx)):
+            yield raw_text
+            yield rows
+        yield u.END_BODY
+        yield u.END_BODY
+
+
+class _DataColumn:
+    """Column spec of `DataTable`."""
+    __slots__ = ('name', 'format', 'escape', 'th', 'td', 'hooks', 'static')
+
+    def __init__(self, spec: dict):
+        self.name = spec['name']
+        fmt = spec.get('format', str)
+        self.format: Callable = fmt.format if isinstance(fmt, str) else fmt
+        self.escape: bool = spec.get('escape', True)
+        self.hooks: Dict[str, Callable] = {}
+        self.static: Dict[str, Any] = {}  # the hooked values are merged to these ones
+        attrs = ''
+        for name, attr_name in _CELL_ATTRS:
+            v = spec.get(name)
+            if callable(v):
+                self.hooks[name] = v
+            elif v:
+                self.static[name] = v
+                attrs += attr_to_str(attr_name, AttrsDict.merge_extendable(name, v, None, None))
+        title = spec.get('title', self.name)
+        self.th = f'<th{attrs}>{escape_value(title)}</th>'
+        # `%s` is the cell content or the whole cell if the cell attrs are hooked
+        self.td = '%s' if self.hooks else f'<td{attrs.replace("%", "%%")}>%s</td>'
+
+    def render_cells(self, values) -> List[str]:
+        """Return the formatted cells of the batch."""
+        if hasattr(values, 'tolist'):
+            # array.array, NumPy array - convert to python objects at once
+            values = values.tolist()
+        cells = [*map(self.format, values)]
+        if self.escape:
+            # check the batch at once, usually there is nothing to escape
+            text = ''.join(cells)
+            if '&' in text or '<' in text or '>' in text or '"' in text or "'" in text:
+                # as the text bodies, `Markup` values are trusted
+                cells = [c if hasattr(v, '__html__') else escape_str(c) for v, c in zip(values, cells)]
+        if self.hooks:
+            cells = [f'<td{self._hooked_attrs(v)}>{c}</td>' for v, c in zip(values, cells)]
+        return cells
+
+    def _hooked_attrs(self, value) -> str:
+        ret = ''
+        static = self.static
+        hooks = self.hooks
+        for name, attr_name in _CELL_ATTRS:
+            hook = hooks.get(name)
+            v = hook(value) if hook is not None else None
+            if v or name in static:
+                ret += attr_to_str(attr_name, AttrsDict.merge_extendable(name, static.get(name), v or None, None))
+        return ret
+
+
+_CELL_ATTRS = [('Class', 'class'), ('Style', 'style')]
+
+
+def _iter_rows(data: dict, columns: List[_DataColumn], batch_size: int) -> Iterator[str]:
+    """Yield html of `DataTable` rows by batches."""
+    if not columns:
+        return
+    arrays = [data[c.name] for c in columns]
+    size = len(arrays[0])
+    row = f'<tr>{"".join([c.td for c in columns])}</tr>'.__mod__
+    for start in range(0, size, batch_size):
+        stop = start + batch_size
+        cells = [c.render_cells(a[start:stop]) for c, a in zip(columns, arrays)]
+        yield ''.join(map(row, zip(*cells)))
+
+
+class ExtractedStyles(Tag):
+    """`<style>` of the classes extracted from static `Style` attrs, see `UPYTL.extract_styles`.
+
+    Nothing is rendered if there is nothing extracted.
+    """
+    __slots__ = ()
+    tag_name = 'style'
+
+    @catch_errors
+    def render(self, u, ctx: dict, body, passed_attrs: dict = None, passed_defaults: dict = None):
+        css = u.stylesheet()
+        if css:
+            yield from super().render(u, ctx, None, passed_attrs, passed_defaults)
+            yield css
+
+
+class Frame(Tag): __slots__ = ()
+class Canvas(Tag): __slots__ = ()
 
@@ -1,24 +1,61 @@
-import uuid
-from typing import TypeVar, Type, Union
 import json
+from typing import Any, Callable, Union
 
 from . import html as h
-from .core import Component, Slot, Tag
+from .core import Component, Slot, UPYTL
+
+try:
+    import orjson
+except ImportError:  # optional, faster serialization
+    orjson = None
+
+
+if orjson is not None:
+    # datetimes and dataclasses are converted by `str` as by stdlib `json`
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def json_dumps(data: Any) -> str:
+    """Return compact json of the data, not serializable values are converted by `str`.
+
+    orjson is used if it is installed, its output is the same as of stdlib `json` except for
+    NaN/Infinity which are `null` and `Enum` members which are their values (stdlib gives `str(member)`).
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=str, option=ORJSON_OPTIONS).decode()
+        except TypeError:
+            # not supported by orjson, e.g. integers out of 64-bit range
+            pass
+    return json.dumps(data, ensure_ascii=False, default=str, separators=(',', ':'))
 
 
 class XTemplate(Component):
+    """Vue.js x-template mounted with the data, see `upytl.js`.
+
+    The same data object is serialized once per render (e.g. in a loop),
+    the id (if not passed) is made of the data by `UPYTL.make_id`, so the same input gives the same html.
+    """
+
+    # serializer of the data, e.g. `XTemplate.serializer = staticmethod(my_dumps)`
+    serializer: Callable[[Any], str] = staticmethod(json_dumps)
 
     def __init__(self, data: Union[dict, str] = b'{}', id: str = '', **kw):
         super().__init__(data=data, id=id, **kw)
 
-    def get_context(self, props_rendered: dict) -> dict:
-
-        if not props_rendered['id']:
-            props_rendered['id'] = f'_{uuid.uuid4()}'
+    def make_context(self, u: UPYTL, props_rendered: dict) -> dict:
         data = props_rendered['data']
-        if isinstance(data, dict):
-            props_rendered['data'] = json.dumps(data, ensure_ascii=False, default=str, separators=(',', ':'))
-        return props_rendered
+        if isinstance(data, (dict, list)):
+            cache = u.render_cache
+            cache_key = ('XTemplate', id(data))
+            cached = cache.get(cache_key)
+            if cached is None or cached[0] is not data:
+                # the data is kept, so its id isn't reused during the render
+                cached = cache[cache_key] = (data, self.serializer(data))
+            props_rendered['data'] = data = cached[1]
+        if not props_rendered['id']:
+            props_rendered['id'] = u.make_id(str(data))
+        return self.get_context(props_rendered)
 
     template = {
         h.Script(type='text/x-template', id='{id}'): {